@@ -0,0 +1,348 @@
+"""
+Serveurs locaux qui imitent les API utilisées par les connecteurs, pour le bench (bench/run.py).
+
+Une seule application sert GitHub, Notion, Discord, Twitter, OpenAI et les webhooks Discord ;
+elle écoute sur un port par service (les limites par hôte du client restent réalistes),
+plus un puits SMTP minimal. Les données évoluent toutes les BENCH_UPDATE_INTERVAL secondes :
+un commit (un fichier modifié), une page Notion éditée, de nouveaux messages et tweets.
+
+Réglages (variables d'environnement) :
+    BENCH_LATENCY_MS       latence ajoutée à chaque réponse (±20 %)
+    BENCH_LLM_LATENCY_MS   latence d'un appel chat.completions
+    BENCH_ITEMS            fichiers par dépôt, pages Notion, messages / tweets initiaux
+    BENCH_PAYLOAD_BYTES    taille d'un fichier, du texte d'une page, d'un message
+    BENCH_429_RATE         part des requêtes refusées en 429 (avec Retry-After court)
+    BENCH_UPDATE_INTERVAL  secondes entre deux évolutions des données
+    BENCH_NEW_PER_UPDATE   messages / tweets ajoutés à chaque évolution
+
+Lancement : python -m bench.mock_api --ports '{"github": 9101, ...}'
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import io
+import json
+import os
+import random
+import re
+import tarfile
+import time
+from collections import Counter, OrderedDict
+from datetime import datetime, timezone
+
+import uvicorn
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse
+from starlette.requests import ClientDisconnect
+
+LATENCY = float(os.environ.get("BENCH_LATENCY_MS", 50)) / 1000
+LLM_LATENCY = float(os.environ.get("BENCH_LLM_LATENCY_MS", 400)) / 1000
+ITEMS = int(os.environ.get("BENCH_ITEMS", 100))
+PAYLOAD_BYTES = int(os.environ.get("BENCH_PAYLOAD_BYTES", 2000))
+RATE_429 = float(os.environ.get("BENCH_429_RATE", 0))
+UPDATE_INTERVAL = float(os.environ.get("BENCH_UPDATE_INTERVAL", 5))
+NEW_PER_UPDATE = int(os.environ.get("BENCH_NEW_PER_UPDATE", 5))
+RETRY_AFTER = 0.2
+
+START = time.time()
+WORDS = "alpha beta gamma delta epsilon signal latency throughput cache index agent report".split()
+
+app = FastAPI()
+requests = Counter()  # service -> requêtes reçues
+throttled = Counter()  # service -> réponses 429
+bytes_sent = Counter()
+emails = Counter()
+
+def generation() -> int:
+    """Nombre d'évolutions des données depuis le démarrage"""
+    return int((time.time() - START) / UPDATE_INTERVAL)
+
+def filler(seed: str, size: int) -> str:
+    rng = random.Random(seed)
+    out, total = [], 0
+    while total < size:
+        word = rng.choice(WORDS)
+        out.append(word)
+        total += len(word) + 1
+    return " ".join(out)[:size]
+
+def service_of(path: str) -> str:
+    if path.startswith("/repos/"): return "github"
+    if path.startswith("/v1/chat/"): return "openai"
+    if path.startswith("/v1/"): return "notion"
+    if path.startswith("/api/webhooks/"): return "webhook"
+    if path.startswith("/api/v10/"): return "discord"
+    if path.startswith("/2/"): return "twitter"
+    return "bench"
+
+def throttle_response(service: str):
+    if service == "webhook":
+        return JSONResponse({"message": "You are being rate limited.", "retry_after": RETRY_AFTER, "global": False}, status_code=429,
+                            headers={"Retry-After": str(RETRY_AFTER), "X-RateLimit-Remaining": "0", "X-RateLimit-Reset-After": str(RETRY_AFTER)})
+    if service == "openai":
+        return JSONResponse({"error": {"message": "Rate limit reached", "type": "requests"}}, status_code=429,
+                            headers={"retry-after-ms": str(int(RETRY_AFTER * 1000))})
+    return JSONResponse({"message": "rate limited"}, status_code=429, headers={"Retry-After": str(RETRY_AFTER)})
+
+@app.middleware("http")
+async def simulate(request: Request, call_next):
+    service = service_of(request.url.path)
+    if service == "bench": return await call_next(request)
+    requests[service] += 1
+    latency = LLM_LATENCY if service == "openai" else LATENCY
+    await asyncio.sleep(latency * random.uniform(0.8, 1.2))
+    if RATE_429 and random.random() < RATE_429:
+        throttled[service] += 1
+        return throttle_response(service)
+    try: response = await call_next(request)
+    except ClientDisconnect: return Response(status_code=499)  # Client arrêté pendant la latence simulée
+    bytes_sent[service] += int(response.headers.get("content-length", 0))
+    return response
+
+@app.get("/_bench/stats")
+async def stats():
+    return {"requests": dict(requests), "throttled": dict(throttled), "bytes": dict(bytes_sent), "emails": emails["sent"], "generation": generation()}
+
+# --- GITHUB ---
+# Au commit k (k >= 1), le fichier (k-1) % ITEMS est modifié
+def file_version(i: int, g: int) -> int:
+    return 0 if g <= i else (g - i - 1) // ITEMS + 1
+
+def file_content(repo: str, i: int, version: int) -> str:
+    return f"# {repo} module {i} v{version}\n" + filler(f"{repo}:{i}:{version}", PAYLOAD_BYTES)
+
+def git_sha(content: str) -> str:
+    data = content.encode("utf-8")
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+def head_sha(repo: str, g: int) -> str:
+    return hashlib.sha1(f"{repo}:commit:{g}".encode()).hexdigest()
+
+_heads = {}  # sha -> (repo, génération)
+_blobs = {}  # sha -> (repo, fichier, version)
+_tarballs = OrderedDict()
+
+def resolve(repo: str, ref: str):
+    if ref == "HEAD": return generation()
+    found = _heads.get(ref)
+    return found[1] if found and found[0] == repo else None
+
+def tree_entry(repo: str, i: int, g: int, base_url: str) -> dict:
+    version = file_version(i, g)
+    content = file_content(repo, i, version)
+    sha = git_sha(content)
+    _blobs[sha] = (repo, i, version)
+    return {"path": f"src/module_{i}.py", "type": "blob", "sha": sha, "size": len(content.encode("utf-8")), "url": f"{base_url}repos/{repo}/git/blobs/{sha}"}
+
+@app.get("/repos/{owner}/{name}/commits/HEAD")
+async def github_head(owner: str, name: str, request: Request):
+    repo = f"{owner}/{name}"
+    g = generation()
+    sha = head_sha(repo, g)
+    _heads[sha] = (repo, g)
+    etag = f'"{sha}"'
+    if request.headers.get("if-none-match") == etag: return Response(status_code=304, headers={"ETag": etag})
+    return PlainTextResponse(sha, headers={"ETag": etag})
+
+@app.get("/repos/{owner}/{name}/commits")
+async def github_commits(owner: str, name: str, request: Request):
+    repo = f"{owner}/{name}"
+    g = generation()
+    etag = f'"{head_sha(repo, g)}"'
+    if request.headers.get("if-none-match") == etag: return Response(status_code=304, headers={"ETag": etag})
+    commits = [{"sha": head_sha(repo, k), "html_url": f"https://github.com/{repo}/commit/{head_sha(repo, k)}",
+                "commit": {"message": f"Update module {(k - 1) % ITEMS}", "author": {"name": "bench"}}} for k in range(g, max(-1, g - 20), -1)]
+    return JSONResponse(commits, headers={"ETag": etag})
+
+@app.get("/repos/{owner}/{name}/compare/{spec}")
+async def github_compare(owner: str, name: str, spec: str, request: Request):
+    repo = f"{owner}/{name}"
+    base, _, head = spec.partition("...")
+    gb, gh = resolve(repo, base), resolve(repo, head)
+    if gb is None or gh is None: return JSONResponse({"message": "Not Found"}, status_code=404)
+    changed = sorted({(k - 1) % ITEMS for k in range(gb + 1, gh + 1)})
+    files = []
+    for i in changed:
+        entry = tree_entry(repo, i, gh, str(request.base_url))
+        files.append({"filename": entry["path"], "status": "modified", "sha": entry["sha"]})
+    return {"files": files}
+
+@app.get("/repos/{owner}/{name}/git/trees/{ref}")
+async def github_tree(owner: str, name: str, ref: str, request: Request):
+    repo = f"{owner}/{name}"
+    g = resolve(repo, ref)
+    if g is None: return JSONResponse({"message": "Not Found"}, status_code=404)
+    return {"sha": ref, "tree": [tree_entry(repo, i, g, str(request.base_url)) for i in range(ITEMS)], "truncated": False}
+
+@app.get("/repos/{owner}/{name}/git/blobs/{sha}")
+async def github_blob(owner: str, name: str, sha: str):
+    found = _blobs.get(sha)
+    if not found: return JSONResponse({"message": "Not Found"}, status_code=404)
+    content = file_content(*found)
+    return {"sha": sha, "encoding": "base64", "content": base64.b64encode(content.encode("utf-8")).decode("ascii")}
+
+@app.get("/repos/{owner}/{name}/tarball/{ref}")
+async def github_tarball(owner: str, name: str, ref: str):
+    repo = f"{owner}/{name}"
+    g = resolve(repo, ref)
+    if g is None: return JSONResponse({"message": "Not Found"}, status_code=404)
+    key = (repo, g)
+    if key not in _tarballs:
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode="w:gz") as tar:
+            for i in range(ITEMS):
+                data = file_content(repo, i, file_version(i, g)).encode("utf-8")
+                info = tarfile.TarInfo(f"{name}-{ref[:7]}/src/module_{i}.py")
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+        _tarballs[key] = buffer.getvalue()
+        while len(_tarballs) > 32: _tarballs.popitem(last=False)
+    return Response(_tarballs[key], media_type="application/x-gzip")
+
+# --- NOTION ---
+# À chaque évolution, la page (k-1) % ITEMS est éditée ; les dates sont décalées de 2 minutes
+# pour que les pages soient considérées comme stables par le connecteur.
+def page_edited_at(i: int, g: int) -> float:
+    version = file_version(i, g)
+    if version == 0: return START - 3600 - i
+    k = i + 1 + (version - 1) * ITEMS
+    return START + k * UPDATE_INTERVAL - 120
+
+def iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+def page_text(i: int, version: int) -> str:
+    keyword = " benchmark" if i % 3 == 0 else ""
+    return f"Page {i} revision {version}{keyword} " + filler(f"page:{i}:{version}", PAYLOAD_BYTES)
+
+@app.post("/v1/search")
+async def notion_search(request: Request):
+    body = await request.json()
+    g = generation()
+    pages = sorted(range(ITEMS), key=lambda i: page_edited_at(i, g), reverse=True)
+    start = int(body.get("start_cursor") or 0)
+    size = min(int(body.get("page_size", 100)), 100)
+    results = [{"object": "page", "id": f"page-{i}", "url": f"https://www.notion.so/page-{i}", "last_edited_time": iso(page_edited_at(i, g)),
+                "properties": {"title": {"id": "title", "title": [{"plain_text": f"Bench page {i}"}]}}} for i in pages[start:start + size]]
+    has_more = start + size < len(pages)
+    return {"object": "list", "results": results, "has_more": has_more, "next_cursor": str(start + size) if has_more else None}
+
+def paragraph(block_id: str, text: str, has_children: bool = False, kind: str = "paragraph") -> dict:
+    return {"object": "block", "id": block_id, "type": kind, "has_children": has_children, kind: {"rich_text": [{"plain_text": text}]}}
+
+@app.get("/v1/blocks/{block_id}/children")
+async def notion_blocks(block_id: str):
+    g = generation()
+    if block_id.startswith("page-"):
+        i = int(block_id[5:])
+        text = page_text(i, file_version(i, g))
+        blocks = [paragraph(f"{block_id}-p", text), paragraph(f"toggle-{i}", "Details", has_children=True, kind="toggle")]
+    elif block_id.startswith("toggle-"):
+        blocks = [paragraph(f"{block_id}-c", filler(block_id, 200))]
+    else:
+        return JSONResponse({"object": "error", "status": 404}, status_code=404)
+    return {"object": "list", "results": blocks, "has_more": False, "next_cursor": None}
+
+# --- DISCORD / TWITTER : fils de messages qui grandissent de NEW_PER_UPDATE à chaque évolution ---
+FEED_BASE_ID = 1_000_000
+
+def feed_size() -> int:
+    return ITEMS + generation() * NEW_PER_UPDATE
+
+def message_text(feed: str, n: int) -> str:
+    return f"Message {n} about benchmark " + filler(f"{feed}:{n}", max(0, PAYLOAD_BYTES // 10))
+
+@app.get("/api/v10/channels/{channel_id}/messages")
+async def discord_messages(channel_id: str, limit: int = 50, after: str = None):
+    total, limit = feed_size(), min(limit, 100)
+    if after:
+        first = max(0, int(after) - FEED_BASE_ID + 1)
+        numbers = range(first, min(total, first + limit))
+    else:
+        numbers = range(max(0, total - limit), total)
+    messages = [{"id": str(FEED_BASE_ID + n), "content": message_text(channel_id, n), "timestamp": iso(START + n),
+                 "author": {"username": f"user{n % 7}"}} for n in reversed(numbers)]
+    return messages
+
+@app.get("/2/tweets/search/recent")
+async def twitter_search(request: Request):
+    params = request.query_params
+    total = feed_size()
+    since = int(params["since_id"]) - FEED_BASE_ID + 1 if params.get("since_id") else max(0, total - 100)
+    size = min(int(params.get("max_results", 10)), 100)
+    top = min(total, int(params["until_id"]) - FEED_BASE_ID) if params.get("until_id") else total
+    offset = int(params.get("next_token") or 0)
+    numbers = list(range(top - 1, since - 1, -1))[offset:offset + size]
+    meta = {"result_count": len(numbers)}
+    if numbers: meta["newest_id"], meta["oldest_id"] = str(FEED_BASE_ID + numbers[0]), str(FEED_BASE_ID + numbers[-1])
+    if offset + size < top - since: meta["next_token"] = str(offset + size)
+    data = [{"id": str(FEED_BASE_ID + n), "text": message_text(params.get("query", ""), n), "created_at": iso(START + n)} for n in numbers]
+    return {"data": data, "meta": meta} if data else {"meta": meta}
+
+# --- OPENAI ---
+@app.post("/v1/chat/completions")
+async def openai_chat(request: Request):
+    body = await request.json()
+    prompt = "\n".join(str(m.get("content", "")) for m in body.get("messages", []))
+    if (body.get("response_format") or {}).get("type") == "json_object":
+        sources = re.findall(r"SOURCE \[(\d+)\]", prompt)
+        content = json.dumps({n: f"- finding for source {n}: {filler(n, 120)}" for n in sources})
+    else:
+        content = "- " + filler(prompt[-64:], min(2000, max(200, len(prompt) // 10)))
+    usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4}
+    usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+    headers = {"x-ratelimit-remaining-requests": "10000", "x-ratelimit-reset-requests": "1s",
+               "x-ratelimit-remaining-tokens": "2000000", "x-ratelimit-reset-tokens": "1s"}
+    return JSONResponse({"id": "chatcmpl-bench", "object": "chat.completion", "created": int(time.time()), "model": body.get("model"),
+                         "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                         "usage": usage}, headers=headers)
+
+# --- WEBHOOKS DISCORD ---
+@app.post("/api/webhooks/{hook_id}/{token}")
+async def webhook(hook_id: str, token: str):
+    return Response(status_code=204)
+
+# --- SMTP (puits : accepte tout, sans TLS ni authentification) ---
+async def smtp_session(reader, writer):
+    writer.write(b"220 bench ESMTP\r\n")
+    in_data = False
+    try:
+        while True:
+            line = await reader.readline()
+            if not line: break
+            if in_data:
+                if line in (b".\r\n", b".\n"):
+                    in_data = False
+                    emails["sent"] += 1
+                    writer.write(b"250 OK\r\n")
+                continue
+            command = line[:4].upper()
+            if command in (b"EHLO", b"HELO"): writer.write(b"250 bench\r\n")
+            elif command == b"DATA":
+                in_data = True
+                writer.write(b"354 End data with <CR><LF>.<CR><LF>\r\n")
+            elif command == b"QUIT":
+                writer.write(b"221 Bye\r\n")
+                break
+            else: writer.write(b"250 OK\r\n")
+            await writer.drain()
+    finally:
+        writer.close()
+
+async def serve(ports: dict):
+    servers = []
+    for service, port in ports.items():
+        if service == "smtp": continue
+        config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", access_log=False)
+        servers.append(uvicorn.Server(config))
+    smtp = await asyncio.start_server(smtp_session, "127.0.0.1", ports["smtp"]) if "smtp" in ports else None
+    try:
+        await asyncio.gather(*(server.serve() for server in servers))
+    finally:
+        if smtp: smtp.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock APIs for the AutoNexus benchmark")
+    parser.add_argument("--ports", required=True, help='JSON object, e.g. {"github": 9101, "smtp": 9107}')
+    asyncio.run(serve(json.loads(parser.parse_args().ports)))
@@ -0,0 +1,272 @@
+"""
+Bench hors ligne : lance les serveurs imités (bench/mock_api.py) dans un processus séparé,
+pointe les connecteurs, OpenAI, les webhooks et le SMTP dessus, puis fait tourner le vrai
+backend (main.py : scheduler, connecteurs, IA, envois) sur N agents.
+
+    python -m bench.run --agents 50 --items 200 --duration 60 --ai
+    python -m bench.run --mode ai --agents 8 --items 300           # process_data_with_ai seul
+    python -m bench.run ... --json after.json --baseline before.json
+
+Mesures : cycles/s, latence p50/p99 d'un cycle, retard de la boucle asyncio,
+mémoire, requêtes par cycle (par service) et appels / tokens LLM.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVICES = ["github", "notion", "discord", "twitter", "openai", "webhook", "smtp"]
+SOURCES = ["github", "notion", "discord", "twitter"]
+LAG_TICK = 0.05
+
+def free_ports(count: int) -> list:
+    sockets = [socket.socket() for _ in range(count)]
+    for s in sockets: s.bind(("127.0.0.1", 0))
+    ports = [s.getsockname()[1] for s in sockets]
+    for s in sockets: s.close()
+    return ports
+
+def percentile(values: list, q: float):
+    if not values: return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def start_mocks(args, ports: dict):
+    env = dict(os.environ,
+               BENCH_LATENCY_MS=str(args.latency_ms), BENCH_LLM_LATENCY_MS=str(args.llm_latency_ms),
+               BENCH_ITEMS=str(args.items), BENCH_PAYLOAD_BYTES=str(args.payload_bytes),
+               BENCH_429_RATE=str(args.rate_429), BENCH_UPDATE_INTERVAL=str(args.update_interval),
+               BENCH_NEW_PER_UPDATE=str(args.new_per_update))
+    process = subprocess.Popen([sys.executable, "-m", "bench.mock_api", "--ports", json.dumps(ports)], cwd=BACKEND_DIR, env=env)
+    deadline = time.time() + 15
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", ports["github"]), timeout=0.2): return process
+        except OSError: time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("Mock servers did not start")
+
+def point_backend_at(ports: dict, workdir: str):
+    """À faire avant d'importer main : les URL de base sont lues à l'import des modules"""
+    base = "http://127.0.0.1"
+    os.environ.update({
+        "AUTONEXUS_GITHUB_API_URL": f"{base}:{ports['github']}",
+        "AUTONEXUS_NOTION_API_URL": f"{base}:{ports['notion']}/v1",
+        "AUTONEXUS_DISCORD_API_URL": f"{base}:{ports['discord']}/api/v10",
+        "AUTONEXUS_TWITTER_API_URL": f"{base}:{ports['twitter']}/2",
+        "OPENAI_BASE_URL": f"{base}:{ports['openai']}/v1",
+        "AUTONEXUS_SMTP_HOST": "127.0.0.1",
+        "AUTONEXUS_SMTP_PORT": str(ports["smtp"]),
+        "AUTONEXUS_SMTP_STARTTLS": "0",  # Le puits SMTP local ne parle pas TLS
+        "AUTONEXUS_CACHE_DIR": os.path.join(workdir, "cache"),
+    })
+    os.chdir(workdir)  # autonexus_data.db est créé dans le dossier courant
+    sys.path.insert(0, BACKEND_DIR)
+
+async def mock_stats(ports: dict) -> dict:
+    import httpx
+    async with httpx.AsyncClient() as client:
+        return (await client.get(f"http://127.0.0.1:{ports['github']}/_bench/stats", timeout=10)).json()
+
+def workflow(i: int, source: str, args, ports: dict) -> dict:
+    settings = {"bot_name": f"bench-{i}", "refresh_interval": args.refresh, "agent_language": "en",
+                "webhook": f"http://127.0.0.1:{ports['webhook']}/api/webhooks/{i}/token"}
+    group = i // args.share  # args.share agents consécutifs surveillent la même cible
+    if source == "github": settings["query"] = f"bench/repo-{group}"
+    elif source == "notion": settings["query"] = "benchmark"
+    elif source == "discord": settings.update(channel_id=str(100 + group), query="")
+    elif source == "twitter": settings["query"] = f"benchmark {group}"
+    if args.ai: settings["custom_prompt"] = "List the most interesting findings."
+    if args.email: settings["recipient_email"] = f"agent{i}@bench.local"
+    return {"id": f"bench{i:05d}", "name": settings["bot_name"], "source": source, "settings": settings, "status": "active"}
+
+async def monitor_loop(samples: list, stop: asyncio.Event):
+    """Retard de la boucle : écart entre le réveil demandé et le réveil réel"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + LAG_TICK
+        await asyncio.sleep(LAG_TICK)
+        samples.append((time.time(), max(0.0, loop.time() - expected)))
+
+async def monitor_memory(metrics, samples: list, stop: asyncio.Event):
+    while not stop.is_set():
+        samples.append(metrics.process_stats().get("rss_bytes") or 0)
+        await asyncio.sleep(1)
+
+def _window(samples: list, start: float) -> list:
+    return [value for ts, value in samples if ts >= start]
+
+async def run_cycles(args, ports: dict) -> dict:
+    import main
+    from core import metrics
+
+    sources = [s.strip() for s in args.sources.split(",") if s.strip()]
+    cycles = []  # (fin, durée)
+    original = main.scheduler.run_cycle
+
+    async def timed_cycle(w_id):
+        started = time.perf_counter()
+        try: return await original(w_id)
+        finally: cycles.append((time.time(), time.perf_counter() - started))
+    main.scheduler.run_cycle = timed_cycle
+
+    lag, memory, stop = [], [], asyncio.Event()
+    async with main.lifespan(main.app):
+        for key, value in [("github", "bench-token"), ("notion", "bench-token"), ("discord", "bench-token"),
+                           ("twitter", "bench-token"), ("openai", "sk-bench"), ("gmail", "bench@bench.local:password")]:
+            main.db["credentials"][key] = value
+        for i in range(args.agents):
+            wf = workflow(i, sources[i % len(sources)], args, ports)
+            main.db["workflows"].append(wf)
+            main.scheduler.schedule(wf["id"], random.uniform(0, main.STARTUP_SPREAD), jitter=False)
+        main.save_db()
+
+        monitors = [asyncio.create_task(monitor_loop(lag, stop)), asyncio.create_task(monitor_memory(metrics, memory, stop))]
+        await asyncio.sleep(args.warmup)
+        window_start, before = time.time(), await mock_stats(ports)
+        http_before = metrics.HTTP_REQUESTS.total()
+        await asyncio.sleep(args.duration)
+        window_end, after = time.time(), await mock_stats(ports)
+        http_after = metrics.HTTP_REQUESTS.total()
+        stop.set()
+        await asyncio.gather(*monitors)
+
+    durations = [d for end, d in cycles if window_start <= end <= window_end]
+    report = {
+        "mode": "cycles", "agents": args.agents, "sources": sources, "items": args.items, "duration_s": args.duration,
+        "cycles": len(durations),
+        "cycles_per_s": round(len(durations) / (window_end - window_start), 2),
+        "cycle_p50_ms": _ms(percentile(durations, 0.5)),
+        "cycle_p99_ms": _ms(percentile(durations, 0.99)),
+    }
+    report.update(_common(lag, memory, before, after, window_start, len(durations)))
+    report["client_requests_per_cycle"] = round((http_after - http_before) / max(1, len(durations)), 2)
+    report["llm_tokens"] = int(metrics.LLM_TOKENS.total())
+    report["fetch_coalescing"] = {"hits": main.coalescer.hits, "misses": main.coalescer.misses}
+    # Les récapitulatifs email partent par fenêtres (et au plus tard à l'arrêt) : compte final
+    report["emails"] = (await mock_stats(ports))["emails"]
+    return report
+
+async def run_ai(args, ports: dict) -> dict:
+    """process_data_with_ai seul : --agents exécutions simultanées de --items items, --runs fois"""
+    import main
+    from core import metrics
+
+    lag, memory, stop = [], [], asyncio.Event()
+    monitors = [asyncio.create_task(monitor_loop(lag, stop)), asyncio.create_task(monitor_memory(metrics, memory, stop))]
+    start, before = time.time(), await mock_stats(ports)
+    durations = []
+
+    async def one(agent: int, run: int):
+        # Empreintes uniques par exécution : le cache d'extractions ne court-circuite pas l'IA (sauf --warm-cache)
+        tag = "warm" if args.warm_cache else f"{run}"
+        items = [{"unique_key": f"bench:{agent}:{n}", "fingerprint": tag, "link": f"https://bench.local/{agent}/{n}",
+                  "content": f"Item {n}\n" + "lorem ipsum dolor sit amet " * (args.payload_bytes // 27 + 1), "is_update": False}
+                 for n in range(args.items)]
+        started = time.perf_counter()
+        await main.process_data_with_ai(items, "List the most interesting findings.", "sk-bench")
+        durations.append(time.perf_counter() - started)
+
+    started_at = time.time()
+    for run in range(args.runs):
+        await asyncio.gather(*(one(agent, run) for agent in range(args.agents)))
+    elapsed = time.time() - started_at
+    after = await mock_stats(ports)
+    stop.set()
+    await asyncio.gather(*monitors)
+
+    report = {
+        "mode": "ai", "agents": args.agents, "items": args.items, "runs": args.runs,
+        "pipelines": len(durations),
+        "pipelines_per_s": round(len(durations) / elapsed, 2),
+        "pipeline_p50_ms": _ms(percentile(durations, 0.5)),
+        "pipeline_p99_ms": _ms(percentile(durations, 0.99)),
+    }
+    report.update(_common(lag, memory, before, after, start, len(durations)))
+    report["llm_tokens"] = int(metrics.LLM_TOKENS.total())
+    return report
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 1)
+
+def _common(lag: list, memory: list, before: dict, after: dict, window_start: float, units: int) -> dict:
+    lags = _window(lag, window_start)
+    requests = {s: after["requests"].get(s, 0) - before["requests"].get(s, 0) for s in after["requests"]}
+    return {
+        "loop_lag_p50_ms": _ms(percentile(lags, 0.5)),
+        "loop_lag_p99_ms": _ms(percentile(lags, 0.99)),
+        "loop_lag_max_ms": _ms(max(lags) if lags else None),
+        "rss_peak_mb": round(max(memory) / 1_048_576, 1) if memory else None,
+        "requests_per_unit": round(sum(requests.values()) / max(1, units), 2),
+        "requests": requests,
+        "throttled": {s: after["throttled"].get(s, 0) - before["throttled"].get(s, 0) for s in after["throttled"]},
+        "emails": after["emails"] - before["emails"],
+    }
+
+def print_report(report: dict, baseline: dict = None):
+    print("\n=== AutoNexus benchmark ===")
+    for key, value in report.items():
+        line = f"{key:28} {value}"
+        old = (baseline or {}).get(key)
+        if isinstance(value, (int, float)) and isinstance(old, (int, float)) and old and not isinstance(value, bool):
+            line += f"   (baseline {old}, {100 * (value - old) / old:+.1f}%)"
+        print(line)
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Offline AutoNexus benchmark against local mock APIs")
+    parser.add_argument("--mode", choices=["cycles", "ai"], default="cycles")
+    parser.add_argument("--agents", type=int, default=20)
+    parser.add_argument("--sources", default=",".join(SOURCES), help="comma-separated, agents are spread round-robin")
+    parser.add_argument("--share", type=int, default=1, help="consecutive agents watching the same repo / channel / query")
+    parser.add_argument("--items", type=int, default=100, help="files per repo, Notion pages, initial messages / items per AI run")
+    parser.add_argument("--payload-bytes", type=int, default=2000)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--llm-latency-ms", type=float, default=400)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--update-interval", type=float, default=5, help="seconds between data changes on the mocks")
+    parser.add_argument("--new-per-update", type=int, default=5)
+    parser.add_argument("--refresh", type=int, default=5, help="agents' refresh_interval (s)")
+    parser.add_argument("--ai", action="store_true", help="give every agent a custom prompt (map-reduce on each batch)")
+    parser.add_argument("--email", action="store_true", help="also send email notifications to the SMTP sink")
+    parser.add_argument("--warmup", type=float, default=15, help="seconds excluded from the measurements")
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--runs", type=int, default=3, help="--mode ai: successive waves of --agents pipelines")
+    parser.add_argument("--warm-cache", action="store_true", help="--mode ai: reuse extractions between runs")
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--baseline", help="previous --json report to compare against")
+    parser.add_argument("--verbose", action="store_true", help="keep the backend's logs")
+    args = parser.parse_args()
+    # Le backend tourne dans un dossier temporaire : chemins résolus avant le chdir
+    if args.json: args.json = os.path.abspath(args.json)
+    if args.baseline: args.baseline = os.path.abspath(args.baseline)
+
+    ports = dict(zip(SERVICES, free_ports(len(SERVICES))))
+    mocks = start_mocks(args, ports)
+    workdir = tempfile.mkdtemp(prefix="autonexus_bench_")
+    try:
+        point_backend_at(ports, workdir)
+        runner = run_ai if args.mode == "ai" else run_cycles
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(sys.stdout if args.verbose else devnull):
+            report = asyncio.run(runner(args, ports))
+    finally:
+        mocks.terminate()
+        mocks.wait()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f: baseline = json.load(f)
+    print_report(report, baseline)
+    if args.json:
+        with open(args.json, "w") as f: json.dump(report, f, indent=2)
+    print(f"(work dir: {workdir})")
+
+if __name__ == "__main__":
+    main_cli()
@@ -1,63 +1,94 @@
+import os
 import httpx
 from datetime import datetime, timedelta, timezone
+from core.http_pool import get_client
 
-async def fetch(settings: dict, token: str):
+API_URL = os.environ.get("AUTONEXUS_DISCORD_API_URL", "https://discord.com/api/v10")
+PAGE_SIZE = 100  # Maximum accepted by Discord
+MAX_PAGES = 20  # Per poll; the cursor resumes from there on the next one
+
+def fetch_key(settings: dict):
+    """Settings that determine fetch() output (agents sharing a key share one fetch)"""
+    return [settings.get("channel_id"), settings.get("query", "").strip().lower()]
+
+async def fetch(settings: dict, token: str, state: dict = None, client: httpx.AsyncClient = None):
+    """
+    Reads the channel forward from state["after"] (highest message snowflake already seen),
+    page by page until exhausted. The first poll only reads the latest page.
+    Returns None when there is no new message.
+    """
     channel_id = settings.get("channel_id")
     query = settings.get("query", "").strip().lower()
+    if state is None: state = {}
     
     if not token or not channel_id: 
         return []
     
-    url = f"https://discord.com/api/v10/channels/{channel_id}/messages"
+    url = f"{API_URL}/channels/{channel_id}/messages"
     headers = {
         "Authorization": f"Bot {token}",
         "Content-Type": "application/json"
     }
-    
-    params = {"limit": 50}
+    client = client or get_client()
     
     try:
-        async with httpx.AsyncClient() as client:
+        messages = []
+        after = state.get("after")
+        for page in range(MAX_PAGES):
+            params = {"limit": PAGE_SIZE}
+            if after: params["after"] = after
             res = await client.get(url, headers=headers, params=params)
             
             if res.status_code == 403:
                 print(f"[DISCORD ERROR] Error 403: Bot lacks access to this channel. Verify it's invited to the server.")
-                return []
+                break
             if res.status_code != 200:
                 print(f"[DISCORD API ERROR] {res.status_code} - {res.text}")
-                return []
+                break
             
-            messages = res.json()
-            results = []
-            now = datetime.now(timezone.utc)
+            page_messages = res.json()
+            if not page_messages: break
+            messages.extend(page_messages)
+            after = str(max(int(m["id"]) for m in page_messages))
+            state["after"] = after
+            # Without a cursor (first poll) only the latest page is read
+            if len(page_messages) < PAGE_SIZE or "after" not in params: break
+        else:
+            print(f"[DISCORD] {channel_id}: more than {MAX_PAGES} pages of new messages, resuming next poll.")
+
+        if not messages: return None if state.get("after") else []
+        results = []
+        now = datetime.now(timezone.utc)
             
-            for msg in messages:
-                if msg.get("author", {}).get("bot"):
-                    continue
+        for msg in messages:
+            if msg.get("author", {}).get("bot"):
+                continue
                 
-                content = msg.get("content", "")
+            content = msg.get("content", "")
                 
-                if query and query not in content.lower():
-                    continue
+            if query and query not in content.lower():
+                continue
                 
-                msg_date_str = msg["timestamp"]
-                msg_date = datetime.fromisoformat(msg_date_str)
+            msg_date_str = msg["timestamp"]
+            msg_date = datetime.fromisoformat(msg_date_str)
                 
-                link = f"https://discord.com/channels/@me/{channel_id}/{msg['id']}"
+            link = f"https://discord.com/channels/@me/{channel_id}/{msg['id']}"
                 
-                author = msg.get("author", {}).get("username", "Unknown")
+            author = msg.get("author", {}).get("username", "Unknown")
                 
-                results.append({
-                    "unique_key": f"discord:{msg['id']}",
-                    "fingerprint": msg_date_str,
-                    "content": f"💬 **{author} said:**\n{content}",
-                    "link": link,
-                    "is_ready": True,
-                    "is_update": False 
-                })
+            results.append({
+                "unique_key": f"discord:{msg['id']}",
+                "fingerprint": msg_date_str,
+                "content": f"💬 **{author} said:**\n{content}",
+                "body": content,
+                "timestamp": msg_date_str,
+                "link": link,
+                "is_ready": True,
+                "is_update": False 
+            })
                 
-            return results
+        return results
 
     except Exception as e:
         print(f"[DISCORD READ ERROR] {e}")
-        return []
\ No newline at end of file
+        return []
@@ -1,15 +1,136 @@
 import httpx
 import asyncio
 import base64
+import hashlib
+import concurrent.futures
+import io
+import queue
+import tarfile
+import os
+import time
+from contextlib import aclosing
+from core.cache import DiskCache
+from core.coalesce import COALESCE_WINDOW, SharedCalls
+from core.http_pool import get_client
+from core.conditional import with_validators, not_modified, forget
+
+# Surchargeable pour pointer vers un serveur de test (bench/)
+API_URL = os.environ.get("AUTONEXUS_GITHUB_API_URL", "https://api.github.com")
 
 # Fichiers à ignorer pour ne pas polluer l'IA avec du bruit
 IGNORED_EXTS = ['.png', '.jpg', '.jpeg', '.gif', '.svg', '.ico', '.lock', '.pdf', '.zip', '.tar', '.gz', '.mp4', '.exe', '.bin']
 IGNORED_DIRS = ['.git', 'node_modules', 'vendor', 'dist', 'build', '__pycache__']
 
+# Téléchargement concurrent (surchargeable via settings: max_concurrency, max_files, max_bytes)
+MAX_CONCURRENT_DOWNLOADS = 8
+DEFAULT_MAX_FILES = 500
+DEFAULT_MAX_BYTES = 5_000_000
+MAX_RETRIES = 3
+SECONDARY_LIMIT_WAIT = 60  # GitHub recommande au moins 1 minute sans Retry-After
+COMPARE_MAX_FILES = 300  # L'API compare tronque la liste au-delà : on repasse en snapshot complet
+
+# Mode archive : morceaux du tarball en attente de décompression, fichiers décompressés en attente de l'aval (contre-pression)
+ARCHIVE_QUEUE_CHUNKS = 16
+ARCHIVE_QUEUE_FILES = 8
+
+# Cache des blobs adressé par SHA : partagé entre agents et persistant entre redémarrages
+BLOB_CACHE_MAX_BYTES = 200_000_000
+BLOB_CACHE = DiskCache("github_blobs", BLOB_CACHE_MAX_BYTES)
+
+# Les agents d'un même dépôt partagent leurs appels : HEAD / compare / arbre (même URL, jeton et
+# validateurs -> même réponse), et chaque blob n'est téléchargé qu'une fois même demandé par plusieurs agents
+_shared_gets = SharedCalls(COALESCE_WINDOW)
+_shared_blobs = SharedCalls()
+
+# Partagé par toutes les requêtes : quand GitHub nous limite, tout le monde attend
+_rate_limited_until = 0.0
+
+def _int_setting(settings: dict, key: str, default: int) -> int:
+    try: return int(settings.get(key) or default)
+    except: return default
+
+def _is_relevant(path: str) -> bool:
+    """Filtre extensions et dossiers inutiles"""
+    if any(path.endswith(ext) for ext in IGNORED_EXTS): return False
+    if any(bad_dir in path for bad_dir in IGNORED_DIRS): return False
+    return True
+
+def _git_blob_sha(data: bytes) -> str:
+    """SHA identique à celui de l'arbre Git (en-tête 'blob <taille>\\0' + contenu)"""
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+def _file_item(repo_name: str, path: str, sha: str, content: str, changes: int = None) -> dict:
+    item = {
+        "unique_key": f"github_file:{sha}", # Le SHA change si le fichier change
+        "fingerprint": sha, 
+        "content": f"📄 FICHIER: {path}\n\n{content}",
+        "body": content,  # Sans l'en-tête : deux copies du même fichier ont le même body
+        "link": f"https://github.com/{repo_name}/blob/main/{path}",
+        "is_ready": True,
+        "is_update": False 
+    }
+    if changes is not None: item["changes"] = changes  # Lignes modifiées depuis le dernier commit traité
+    return item
+
+def _removed_item(repo_name: str, path: str, head: str) -> dict:
+    return {
+        "unique_key": f"github_removed:{path}:{head}",
+        "fingerprint": head,
+        "content": f"🗑️ FICHIER SUPPRIMÉ: {path}",
+        "link": f"https://github.com/{repo_name}/commit/{head}",
+        "is_ready": True,
+        "is_update": False
+    }
+
+def _repo_name(raw_query: str) -> str:
+    # Nettoyage URL
+    repo_name = raw_query.strip().replace("https://github.com/", "").replace("http://github.com/", "")
+    if repo_name.endswith("/"): repo_name = repo_name[:-1]
+    return repo_name
+
+def fetch_key(settings: dict):
+    """Réglages qui déterminent le résultat de fetch() (agents partageant la même clé = un seul fetch)"""
+    return [_repo_name(settings.get("query", "")).lower(), bool(settings.get("custom_prompt")),
+            settings.get("snapshot_mode"), settings.get("max_files"), settings.get("max_bytes")]
+
+def _rate_limit_delay(res) -> float:
+    """Renvoie le temps d'attente demandé par GitHub (0 si la réponse n'est pas une limitation)"""
+    if res.status_code not in (403, 429): return 0
+    retry_after = res.headers.get("Retry-After")
+    if retry_after:
+        try: return float(retry_after)
+        except: return SECONDARY_LIMIT_WAIT
+    if res.headers.get("X-RateLimit-Remaining") == "0":
+        try: return max(1.0, float(res.headers.get("X-RateLimit-Reset", 0)) - time.time())
+        except: return SECONDARY_LIMIT_WAIT
+    if res.status_code == 429 or "secondary rate limit" in res.text.lower():
+        return SECONDARY_LIMIT_WAIT
+    return 0
+
+async def github_get(client, url, headers, **kwargs):
+    """GET avec respect des limites primaires (X-RateLimit-*) et secondaires (Retry-After)"""
+    global _rate_limited_until
+    for attempt in range(MAX_RETRIES + 1):
+        wait = _rate_limited_until - time.time()
+        if wait > 0: await asyncio.sleep(wait)
+
+        res = await client.get(url, headers=headers, **kwargs)
+        delay = _rate_limit_delay(res)
+        if not delay or attempt == MAX_RETRIES: return res
+
+        print(f"[GITHUB] Rate limit atteint, pause de {delay:.0f}s ({attempt+1}/{MAX_RETRIES})")
+        _rate_limited_until = max(_rate_limited_until, time.time() + delay)
+    return res
+
+async def shared_get(client, url, headers, **kwargs):
+    """github_get partagé entre agents (la réponse n'est que lue : chaque agent en tire son propre état)"""
+    key = hashlib.sha256(repr((url, sorted(headers.items()), sorted((kwargs.get("params") or {}).items()))).encode("utf-8")).hexdigest()
+    return await _shared_gets.run(key, lambda: github_get(client, url, headers, **kwargs))
+
 async def get_file_content(client, url, headers):
-    """Télécharge et décode un fichier depuis GitHub API"""
+    """Télécharge et décode un fichier depuis GitHub API ; None si le téléchargement a échoué ("" = fichier vide)"""
     try:
-        res = await client.get(url, headers=headers)
+        res = await github_get(client, url, headers)
         if res.status_code == 200:
             data = res.json()
             # GitHub renvoie souvent en base64
@@ -17,103 +138,367 @@ async def get_file_content(client, url, headers):
                 content = base64.b64decode(data["content"]).decode('utf-8', errors='ignore')
                 return content
             return data.get("content", "") # Cas rare brut
-    except:
-        return ""
-    return ""
+        print(f"[GITHUB ERROR] Blob illisible ({res.status_code}): {url}")
+    except Exception as e:
+        print(f"[GITHUB ERROR] Blob illisible ({e}): {url}")
+    return None
+
+def _apply_budget(files: list, settings: dict) -> list:
+    """Budget du snapshot (nombre de fichiers + octets), au lieu d'une limite fixe"""
+    max_files = _int_setting(settings, "max_files", DEFAULT_MAX_FILES)
+    max_bytes = _int_setting(settings, "max_bytes", DEFAULT_MAX_BYTES)
+    budgeted, total_bytes = [], 0
+    for f in files:
+        if len(budgeted) >= max_files: break
+        size = f.get("size", 0)
+        if total_bytes + size > max_bytes: continue
+        budgeted.append(f)
+        total_bytes += size
+    if len(budgeted) < len(files):
+        print(f"[GITHUB] Budget atteint : {len(budgeted)}/{len(files)} fichiers retenus ({total_bytes} octets)")
+    return budgeted
+
+async def iter_blobs(client, headers: dict, settings: dict, files: list, complete: dict = None):
+    """
+    Télécharge en parallèle les blobs absents du cache et émet chaque (path, sha, content) dès qu'il est prêt.
+    Au plus max_concurrency téléchargements en vol, et aucun nouveau tant que l'aval n'a pas repris le précédent.
+    Un téléchargement en échec passe complete["ok"] à False : le commit n'est pas marqué traité et
+    le fichier est retenté au prochain passage.
+    """
+    limit = _int_setting(settings, "max_concurrency", MAX_CONCURRENT_DOWNLOADS)
+
+    async def fetch_blob(f):
+        content = await get_file_content(client, f["url"], headers)
+        if content: await BLOB_CACHE.aput_text(f["sha"], content)
+        return content
+
+    async def download(f):
+        # Un blob est immuable pour un SHA donné : aucun appel réseau si déjà en cache (ou déjà en cours)
+        content = await BLOB_CACHE.aget_text(f["sha"])
+        if content is None: content = await _shared_blobs.run(f["sha"], lambda: fetch_blob(f))
+        return f, content
+
+    remaining = iter(files)
+    in_flight = set()
+    try:
+        while True:
+            while len(in_flight) < limit:
+                f = next(remaining, None)
+                if f is None: break
+                in_flight.add(asyncio.ensure_future(download(f)))
+            if not in_flight: return
+            done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                f, content = task.result()
+                if content is None and complete is not None: complete["ok"] = False
+                if content: yield f["path"], f["sha"], content
+    finally:
+        for task in in_flight: task.cancel()
+
+async def get_head_sha(client, repo_name: str, headers: dict, state: dict):
+    """
+    SHA du dernier commit de la branche par défaut (réponse texte brute, très légère).
+    Requête conditionnelle : un 304 (gratuit côté rate limit) renvoie le dernier SHA traité.
+    """
+    url = f"{API_URL}/repos/{repo_name}/commits/HEAD"
+    key = f"head:{repo_name}"
+    if not state.get("head_sha"): forget(state, key)
+    res = await shared_get(client, url, with_validators(state, key, {**headers, "Accept": "application/vnd.github.sha"}))
+    if not_modified(state, key, res): return state["head_sha"]
+    if res.status_code != 200:
+        print(f"[GITHUB ERROR] Impossible de lire le commit HEAD: {res.status_code}")
+        return None
+    return res.text.strip()
 
-async def fetch(settings: dict, token: str):
+async def changes_since(client, repo_name: str, headers: dict, settings: dict, base: str, head: str):
+    """
+    Fichiers modifiés entre deux commits (API compare) -> (fichiers à télécharger, chemins supprimés).
+    Renvoie None si la comparaison est impossible (historique réécrit, diff trop gros...).
+    """
+    url = f"{API_URL}/repos/{repo_name}/compare/{base}...{head}"
+    res = await shared_get(client, url, headers, params={"per_page": 1})
+    if res.status_code != 200:
+        print(f"[GITHUB] Comparaison {base[:7]}...{head[:7]} impossible ({res.status_code}), snapshot complet.")
+        return None
+
+    changed = res.json().get("files", [])
+    if len(changed) >= COMPARE_MAX_FILES: return None
+
+    to_fetch, removed = [], []
+    for f in changed:
+        path = f["filename"]
+        # Un fichier renommé disparaît de son ancien chemin
+        previous = f.get("previous_filename")
+        if f["status"] == "renamed" and previous and _is_relevant(previous): removed.append(previous)
+        if not _is_relevant(path): continue
+        if f["status"] == "removed":
+            removed.append(path)
+        else:
+            blob_url = f"{API_URL}/repos/{repo_name}/git/blobs/{f['sha']}"
+            to_fetch.append({"path": path, "sha": f["sha"], "url": blob_url, "changes": f.get("changes")})
+    return _apply_budget(to_fetch, settings), removed
+
+async def list_snapshot(client, repo_name: str, headers: dict, settings: dict, ref: str):
+    """Fichiers du snapshot d'après l'arbre Git (un appel 'blob' chacun s'il n'est pas en cache) -> [{path, sha, url}]"""
+    # 1. Récupérer l'arbre des fichiers (Recursive)
+    tree_url = f"{API_URL}/repos/{repo_name}/git/trees/{ref}?recursive=1"
+    res = await shared_get(client, tree_url, headers)
+    
+    if res.status_code != 200:
+        print(f"[GITHUB ERROR] Impossible de lire l'arborescence: {res.status_code}")
+        return None
+
+    tree = res.json().get("tree", [])
+    
+    # 2. Filtrer les fichiers pertinents
+    files_to_scan = [item for item in tree if item["type"] == "blob" and _is_relevant(item["path"])]
+
+    files_to_scan = _apply_budget(files_to_scan, settings)
+    print(f"[GITHUB] {len(files_to_scan)} fichiers pertinents identifiés. Téléchargement...")
+    return files_to_scan
+
+class _ChunkReader(io.RawIOBase):
+    """Fichier en lecture seule alimenté morceau par morceau depuis la boucle asyncio"""
+
+    def __init__(self):
+        self._queue = queue.Queue(maxsize=ARCHIVE_QUEUE_CHUNKS)
+        self._buffer = b""
+        self.done = False  # Le lecteur a fini (ou abandonné) : inutile de continuer à télécharger
+        self.aborted = False
+
+    def readable(self): return True
+
+    def readinto(self, b):
+        while not self._buffer:
+            chunk = self._queue.get()
+            if chunk is None: return 0
+            self._buffer = chunk
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+    def feed(self, chunk):
+        """Bloquant (à appeler hors boucle) tant que le lecteur n'a pas consommé"""
+        while not self.done:
+            try:
+                self._queue.put(chunk, timeout=0.5)
+                return
+            except queue.Full: continue
+
+    def abort(self):
+        """Arrête la lecture (téléchargement interrompu ou aval parti) : débloque le lecteur en attente"""
+        self.aborted = self.done = True
+        while True:
+            try:
+                self._queue.put_nowait(None)
+                return
+            except queue.Full:
+                try: self._queue.get_nowait()
+                except queue.Empty: pass
+
+def _extract_archive(reader: _ChunkReader, max_files: int, max_bytes: int, emit):
+    """Décompresse le tarball au fil de l'eau, en ne lisant que les fichiers pertinents ; emit(path, sha, content) par fichier"""
+    count, total_bytes = 0, 0
+    try:
+        with tarfile.open(fileobj=reader, mode="r|gz") as tar:
+            for member in tar:
+                if reader.aborted: break
+                if not member.isfile(): continue
+                # Les chemins sont préfixés par '<owner>-<repo>-<sha>/'
+                path = member.name.split("/", 1)[1] if "/" in member.name else member.name
+                if not _is_relevant(path): continue
+                if total_bytes + member.size > max_bytes: continue
+
+                data = tar.extractfile(member).read()
+                content = data.decode('utf-8', errors='ignore')
+                if not content: continue
+                emit((path, _git_blob_sha(data), content))
+                count += 1
+                total_bytes += member.size
+                if count >= max_files: break
+    except (tarfile.TarError, EOFError, OSError) as e:
+        if not reader.aborted: print(f"[GITHUB ERROR] Archive illisible: {e}")
+    finally:
+        reader.done = True
+    return count
+
+async def _feed_archive(client, url: str, headers: dict, reader: _ChunkReader):
+    """Télécharge le tarball vers le lecteur ; False si GitHub l'a refusé"""
+    try:
+        async with client.stream("GET", url, headers=headers, follow_redirects=True) as res:
+            if res.status_code != 200:
+                print(f"[GITHUB ERROR] Impossible de télécharger l'archive: {res.status_code}")
+                reader.abort()
+                return False
+            async for chunk in res.aiter_bytes():
+                if reader.done: break
+                await asyncio.to_thread(reader.feed, chunk)
+        await asyncio.to_thread(reader.feed, None)
+        return True
+    except BaseException:
+        reader.abort()
+        raise
+
+async def iter_archive(client, repo_name: str, headers: dict, settings: dict, ref: str, complete: dict):
+    """
+    Snapshot via un seul tarball streamé (nombre constant de requêtes) : chaque (path, sha, content)
+    est émis dès sa décompression. La décompression (thread) attend quand ARCHIVE_QUEUE_FILES fichiers
+    n'ont pas encore été repris par l'aval. complete["ok"] indique si l'archive a été lue en entier.
+    """
+    max_files = _int_setting(settings, "max_files", DEFAULT_MAX_FILES)
+    max_bytes = _int_setting(settings, "max_bytes", DEFAULT_MAX_BYTES)
+    url = f"{API_URL}/repos/{repo_name}/tarball/{ref}"
+    loop = asyncio.get_running_loop()
+    files = asyncio.Queue(maxsize=ARCHIVE_QUEUE_FILES)
+    reader = _ChunkReader()
+
+    def emit(entry):
+        # Appelé depuis le thread de décompression
+        pending = asyncio.run_coroutine_threadsafe(files.put(entry), loop)
+        while not reader.aborted:
+            try: return pending.result(timeout=0.5)
+            except concurrent.futures.TimeoutError: continue
+        pending.cancel()
+
+    extraction = asyncio.ensure_future(asyncio.to_thread(_extract_archive, reader, max_files, max_bytes, emit))
+    download = asyncio.ensure_future(_feed_archive(client, url, headers, reader))
+    count = 0
+    try:
+        while not (extraction.done() and files.empty()):
+            get = asyncio.ensure_future(files.get())
+            await asyncio.wait({get, extraction}, return_when=asyncio.FIRST_COMPLETED)
+            if not get.done():
+                get.cancel()
+                continue
+            path, sha, content = get.result()
+            await BLOB_CACHE.aput_text(sha, content)
+            count += 1
+            yield path, sha, content
+        complete["ok"] = await download and not reader.aborted
+    finally:
+        if not download.done(): download.cancel()
+        reader.abort()
+        await asyncio.gather(download, extraction, return_exceptions=True)
+    print(f"[GITHUB] Archive décompressée : {count} fichiers pertinents.")
+
+def streaming(settings: dict) -> bool:
+    """Le mode code (snapshot) est diffusé fichier par fichier ; le mode commits reste une liste"""
+    return bool(settings.get("custom_prompt"))
+
+async def stream(settings: dict, token: str, state: dict = None, client: httpx.AsyncClient = None):
+    """
+    Mode code en flux : chaque fichier est émis dès qu'il est téléchargé (ou décompressé en mode archive),
+    donc seule la fenêtre en cours de traitement est en mémoire, jamais tout le dépôt.
+    state["head_sha"] n'avance qu'une fois le snapshot lu en entier : un flux interrompu reprend au
+    prochain passage (les fichiers déjà émis sont alors écartés par item_states).
+    """
+    if state is None: state = {}
+    raw_query = settings.get("query", "").strip()
+    if not token or not raw_query: return
+
+    repo_name = _repo_name(raw_query)
+    headers = {"Authorization": f"Bearer {token}", "Accept": "application/vnd.github.v3+json"}
+    client = client or get_client()
+
+    finished = False
+    try:
+        print(f"[GITHUB] Mode Analyse de Code activé pour {repo_name}")
+        head = await get_head_sha(client, repo_name, headers, state)
+        if not head: return
+
+        last_head = state.get("head_sha")
+        if last_head == head:
+            print(f"[GITHUB] Aucun nouveau commit depuis {head[:7]}.")
+            finished = True
+            return
+
+        diff = None
+        if last_head:
+            diff = await changes_since(client, repo_name, headers, settings, last_head, head)
+
+        complete = {"ok": True}
+        changes = {}
+        if diff is not None:
+            # Incrémental : seuls les fichiers ajoutés / modifiés / supprimés
+            to_fetch, removed = diff
+            print(f"[GITHUB] {last_head[:7]}...{head[:7]} : {len(to_fetch)} fichiers modifiés, {len(removed)} supprimés.")
+            changes = {f["path"]: f["changes"] for f in to_fetch}
+            for path in removed:
+                yield _removed_item(repo_name, path, head)
+            files = iter_blobs(client, headers, settings, to_fetch, complete)
+        elif settings.get("snapshot_mode") == "archive":
+            complete["ok"] = False
+            files = iter_archive(client, repo_name, headers, settings, head, complete)
+        else:
+            to_fetch = await list_snapshot(client, repo_name, headers, settings, head)
+            if to_fetch is None: return
+            files = iter_blobs(client, headers, settings, to_fetch, complete)
+
+        # On crée un item "Code" par fichier
+        async with aclosing(files):
+            async for path, sha, content in files:
+                yield _file_item(repo_name, path, sha, content, changes.get(path))
+        if complete["ok"]:
+            state["head_sha"] = head
+            finished = True
+        else:
+            print(f"[GITHUB] Snapshot {head[:7]} incomplet, nouvel essai au prochain passage.")
+
+    except Exception as e:
+        print(f"[GITHUB CRITICAL ERROR] {e}")
+    finally:
+        # Snapshot incomplet : HEAD ne doit pas répondre 304 au prochain passage sur un commit jamais traité
+        if not finished: forget(state, f"head:{repo_name}")
+
+async def fetch(settings: dict, token: str, state: dict = None, client: httpx.AsyncClient = None):
     """
     Mode Hybride :
     - Si 'custom_prompt' présent : Scan des FICHIERS (Snapshot du code actuel).
+      'snapshot_mode' = "archive" télécharge un seul tarball au lieu d'un appel par fichier.
+      Ensuite, seuls les fichiers modifiés depuis le dernier commit traité (state["head_sha"]) sont renvoyés.
     - Sinon : Scan des COMMITS (Surveillance d'activité).
+    Renvoie None si rien n'a changé depuis le dernier appel (304).
     """
+    if state is None: state = {}
+    client = client or get_client()
     raw_query = settings.get("query", "").strip()
     has_prompt = bool(settings.get("custom_prompt"))
     
     if not token or not raw_query: return []
     
-    # Nettoyage URL
-    repo_name = raw_query.replace("https://github.com/", "").replace("http://github.com/", "")
-    if repo_name.endswith("/"): repo_name = repo_name[:-1]
+    repo_name = _repo_name(raw_query)
     
     headers = {"Authorization": f"Bearer {token}", "Accept": "application/vnd.github.v3+json"}
     
     results = []
 
     try:
-        async with httpx.AsyncClient() as client:
-            
-            # --- MODE 1 : ANALYSE DU CODE (SNAPSHOT) ---
-            if has_prompt:
-                print(f"[GITHUB] Mode Analyse de Code activé pour {repo_name}")
-                
-                # 1. Récupérer l'arbre des fichiers (Recursive)
-                tree_url = f"https://api.github.com/repos/{repo_name}/git/trees/main?recursive=1"
-                # Fallback sur 'master' si 'main' n'existe pas (gestion d'erreur basique)
-                res = await client.get(tree_url, headers=headers)
-                if res.status_code == 404:
-                    tree_url = f"https://api.github.com/repos/{repo_name}/git/trees/master?recursive=1"
-                    res = await client.get(tree_url, headers=headers)
-                
-                if res.status_code != 200:
-                    print(f"[GITHUB ERROR] Impossible de lire l'arborescence: {res.status_code}")
-                    return []
-
-                tree = res.json().get("tree", [])
-                
-                # 2. Filtrer les fichiers pertinents
-                files_to_scan = []
-                for item in tree:
-                    if item["type"] == "blob": # C'est un fichier
-                        path = item["path"]
-                        # Filtre extensions et dossiers inutiles
-                        if any(path.endswith(ext) for ext in IGNORED_EXTS): continue
-                        if any(bad_dir in path for bad_dir in IGNORED_DIRS): continue
-                        
-                        files_to_scan.append(item)
-
-                # Limite de sécurité : on ne lit que les 60 premiers fichiers pour l'instant
-                # (suffisant pour votre cas "Semaine 1")
-                files_to_scan = files_to_scan[:60]
-                
-                print(f"[GITHUB] {len(files_to_scan)} fichiers pertinents identifiés. Téléchargement...")
-
-                # 3. Télécharger le contenu
-                for f in files_to_scan:
-                    content = await get_file_content(client, f["url"], headers)
-                    if not content: continue
-                    
-                    # On crée un item "Code"
+        # --- MODE 1 : ANALYSE DU CODE (SNAPSHOT) ---
+        if has_prompt:
+            return [item async for item in stream(settings, token, state, client)]
+
+        # --- MODE 2 : SURVEILLANCE COMMITS (Classique) ---
+        else:
+            print(f"[GITHUB] Mode Surveillance Commits pour {repo_name}")
+            url = f"{API_URL}/repos/{repo_name}/commits"
+            key = f"commits:{repo_name}"
+            res = await github_get(client, url, with_validators(state, key, headers), params={"per_page": 20})
+            if not_modified(state, key, res): return None
+            if res.status_code == 200:
+                for commit in res.json():
+                    msg = commit.get("commit", {}).get("message", "")
+                    author = commit.get("commit", {}).get("author", {}).get("name", "")
                     results.append({
-                        "unique_key": f"github_file:{f['sha']}", # Le SHA change si le fichier change
-                        "fingerprint": f["sha"], 
-                        "content": f"📄 FICHIER: {f['path']}\n\n{content}",
-                        "link": f"https://github.com/{repo_name}/blob/main/{f['path']}",
+                        "unique_key": f"github:{commit['sha']}",
+                        "fingerprint": commit['sha'],
+                        "content": f"Commit: {msg} (par {author})",
+                        "link": commit.get("html_url"),
                         "is_ready": True,
-                        "is_update": False 
+                        "is_update": False
                     })
-                    # Petite pause
-                    await asyncio.sleep(0.1)
-
-            # --- MODE 2 : SURVEILLANCE COMMITS (Classique) ---
-            else:
-                print(f"[GITHUB] Mode Surveillance Commits pour {repo_name}")
-                url = f"https://api.github.com/repos/{repo_name}/commits"
-                res = await client.get(url, headers=headers, params={"per_page": 20})
-                if res.status_code == 200:
-                    for commit in res.json():
-                        msg = commit.get("commit", {}).get("message", "")
-                        author = commit.get("commit", {}).get("author", {}).get("name", "")
-                        results.append({
-                            "unique_key": f"github:{commit['sha']}",
-                            "fingerprint": commit['sha'],
-                            "content": f"Commit: {msg} (par {author})",
-                            "link": commit.get("html_url"),
-                            "is_ready": True,
-                            "is_update": False
-                        })
-
-            return results
+
+        return results
 
     except Exception as e:
         print(f"[GITHUB CRITICAL ERROR] {e}")
@@ -1,7 +1,12 @@
+import asyncio
+import os
 import smtplib
+import threading
+import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime
+from core import metrics
 
 TEXTS = {
     "en": {
@@ -16,31 +21,33 @@ TEXTS = {
     }
 }
 
-async def send_notification(settings: dict, items: list, credentials_str: str, lang: str = "en"):
+# Surchargeables pour tester contre un serveur SMTP local (ex: python -m aiosmtpd -n -l localhost:1025, avec AUTONEXUS_SMTP_STARTTLS=0)
+SMTP_HOST = os.environ.get("AUTONEXUS_SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.environ.get("AUTONEXUS_SMTP_PORT", 587))
+SMTP_TIMEOUT = 30
+# STARTTLS obligatoire : le mot de passe d'application ne part jamais en clair.
+# Seul un serveur local de test peut s'en passer, explicitement (AUTONEXUS_SMTP_STARTTLS=0).
+SMTP_STARTTLS = os.environ.get("AUTONEXUS_SMTP_STARTTLS", "1") != "0"
+
+POOL_SIZE = 2  # Connexions SMTP ouvertes max par expéditeur
+IDLE_TIMEOUT = 120  # Au-delà, une connexion inactive est refermée (les serveurs coupent les sessions muettes)
+DIGEST_WINDOW = 30  # Secondes pendant lesquelles les alertes vers un même destinataire sont regroupées
+
+def _parse_credentials(credentials_str: str):
     # LOG D'ERREUR AJOUTÉ ICI
     if not credentials_str or ":" not in credentials_str: 
-        print(f"[GMAIL ERROR] Invalid credential format. Expected 'email:password', got: '{credentials_str[:5]}...'")
-        return
+        print(f"[GMAIL ERROR] Invalid credential format. Expected 'email:password', got: '{(credentials_str or '')[:5]}...'")
+        return None
     
     parts = credentials_str.split(":")
     sender_email = parts[0].strip()
     # Double sécurité : on nettoie aussi ici au cas où
     app_password = parts[1].replace(" ", "").strip()
-    
-    recipient_email = settings.get("recipient_email") or sender_email 
-    
-    if not items: return
+    return sender_email, app_password
 
-    t = TEXTS.get(lang, TEXTS["en"])
-
-    subject = f"{t['subject_prefix']} {len(items)} {t['updates_for']} '{settings.get('query')}'"
-
-    html_body = f"""
-    <html>
-      <body style="font-family: Arial, sans-serif; color: #333;">
-        <div style="background-color: #f4f4f4; padding: 20px;">
-          <div style="background-color: white; padding: 20px; border-radius: 8px; max-width: 600px; margin: auto;">
-            <h2 style="color: #2c3e50;">{t['report_title']}: {settings.get('query')}</h2>
+def _render_section(query, items: list, t: dict) -> str:
+    html = f"""
+            <h2 style="color: #2c3e50;">{t['report_title']}: {query}</h2>
             <p>{t['intro']}</p>
             <hr style="border: 0; border-top: 1px solid #eee;">
     """
@@ -49,14 +56,30 @@ async def send_notification(settings: dict, items: list, credentials_str: str, l
         status_color = "#e67e22" if item.get("is_update") else "#27ae60"
         status_text = t["updated"] if item.get("is_update") else t["new"]
         
-        html_body += f"""
+        html += f"""
             <div style="margin-bottom: 15px; padding: 10px; border-left: 4px solid {status_color}; background: #fafafa;">
                 <div style="font-size: 12px; font-weight: bold; color: {status_color}; margin-bottom: 5px;">{status_text}</div>
                 <div style="font-size: 16px; margin-bottom: 5px;">{item['content'].replace(chr(10), '<br>')}</div>
                 <a href="{item['link']}" style="display: inline-block; background: #3498db; color: white; text-decoration: none; padding: 5px 10px; border-radius: 4px; font-size: 12px;">{t['open_link']}</a>
             </div>
         """
+    return html
+
+def build_message(sender_email: str, recipient_email: str, sections: list, lang: str = "en"):
+    """sections = [(query, items)] : une section par agent (plusieurs = e-mail récapitulatif)"""
+    t = TEXTS.get(lang, TEXTS["en"])
+    total = sum(len(items) for _, items in sections)
+    queries = ", ".join(f"'{query}'" for query, _ in sections)
 
+    subject = f"{t['subject_prefix']} {total} {t['updates_for']} {queries}"
+
+    html_body = """
+    <html>
+      <body style="font-family: Arial, sans-serif; color: #333;">
+        <div style="background-color: #f4f4f4; padding: 20px;">
+          <div style="background-color: white; padding: 20px; border-radius: 8px; max-width: 600px; margin: auto;">
+    """
+    for query, items in sections: html_body += _render_section(query, items, t)
     html_body += f"""
             <hr style="border: 0; border-top: 1px solid #eee;">
             <p style="font-size: 12px; color: #999; text-align: center;">{t['generated_by']} {datetime.now().strftime('%Y-%m-%d %H:%M')}</p>
@@ -71,18 +94,143 @@ async def send_notification(settings: dict, items: list, credentials_str: str, l
     msg['To'] = recipient_email
     msg['Subject'] = subject
     msg.attach(MIMEText(html_body, 'html'))
+    return msg
+
+class SMTPPool:
+    """
+    Connexions SMTP persistantes par expéditeur (STARTTLS + login une seule fois).
+    Les appels smtplib (bloquants) tournent dans des threads : la boucle asyncio n'attend jamais le réseau.
+    """
 
-    smtp_address = "smtp.gmail.com"
-    smtp_port = 587
+    def __init__(self, host: str, port: int, size: int = POOL_SIZE):
+        self.host = host
+        self.port = port
+        self.size = size
+        self._idle = {}  # expéditeur -> [(connexion, dernière utilisation)]
+        self._lock = threading.Lock()
+        self._semaphores = {}
+
+    def _connect(self, sender_email: str, app_password: str):
+        server = smtplib.SMTP(self.host, self.port, timeout=SMTP_TIMEOUT)
+        try:
+            server.ehlo()
+            if SMTP_STARTTLS:
+                # Lève SMTPNotSupportedError si le serveur (ou un intermédiaire) n'annonce pas STARTTLS
+                server.starttls()
+                server.ehlo()
+            if server.has_extn("auth"): server.login(sender_email, app_password)
+        except Exception:
+            self._discard(server)
+            raise
+        return server
+
+    def _checkout(self, sender_email: str, app_password: str):
+        while True:
+            with self._lock:
+                idle = self._idle.get(sender_email)
+                if not idle: break
+                server, last_used = idle.pop()
+            if time.monotonic() - last_used < IDLE_TIMEOUT:
+                try:
+                    if server.noop()[0] == 250: return server
+                except (smtplib.SMTPException, OSError): pass
+            self._discard(server)
+        return self._connect(sender_email, app_password)
+
+    @staticmethod
+    def _discard(server):
+        try: server.quit()
+        except Exception:
+            try: server.close()
+            except Exception: pass
+
+    def _send_sync(self, sender_email: str, app_password: str, recipient_email: str, text: str):
+        server = self._checkout(sender_email, app_password)
+        try:
+            server.sendmail(sender_email, recipient_email, text)
+        except (smtplib.SMTPServerDisconnected, smtplib.SMTPSenderRefused, OSError):
+            # Session expirée côté serveur : nouvelle connexion + ré-authentification, un seul essai
+            self._discard(server)
+            server = self._connect(sender_email, app_password)
+            try: server.sendmail(sender_email, recipient_email, text)
+            except Exception:
+                self._discard(server)
+                raise
+        with self._lock: self._idle.setdefault(sender_email, []).append((server, time.monotonic()))
+
+    async def send(self, sender_email: str, app_password: str, recipient_email: str, msg):
+        semaphore = self._semaphores.setdefault(sender_email, asyncio.Semaphore(self.size))
+        async with semaphore:
+            try:
+                with metrics.EMAIL_SECONDS.time():
+                    await asyncio.to_thread(self._send_sync, sender_email, app_password, recipient_email, msg.as_string())
+            except Exception:
+                metrics.EMAIL_SENDS.inc(outcome="error")
+                raise
+            metrics.EMAIL_SENDS.inc(outcome="sent")
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for servers in idle.values():
+            for server, _ in servers: self._discard(server)
+
+pool = SMTPPool(SMTP_HOST, SMTP_PORT)
+
+async def send_notification(settings: dict, items: list, credentials_str: str, lang: str = "en"):
+    creds = _parse_credentials(credentials_str)
+    if not creds: return
+    sender_email, app_password = creds
+    
+    recipient_email = settings.get("recipient_email") or sender_email 
+    
+    if not items: return
+
+    msg = build_message(sender_email, recipient_email, [(settings.get("query"), items)], lang)
 
     try:
-        server = smtplib.SMTP(smtp_address, smtp_port)
-        server.starttls()
-        server.login(sender_email, app_password)
-        text = msg.as_string()
-        server.sendmail(sender_email, recipient_email, text)
-        server.quit()
-        
+        await pool.send(sender_email, app_password, recipient_email, msg)
         print(f"[GMAIL] Sent to {recipient_email} ({lang})")
     except Exception as e:
-        print(f"[GMAIL ERROR] {e}")
\ No newline at end of file
+        print(f"[GMAIL ERROR] {e}")
+
+# --- FILE D'ENVOI (RÉCAPITULATIFS) ---
+_pending = {}  # (expéditeur, destinataire, langue) -> {"creds": ..., "sections": [(query, items)]}
+_flush_tasks = {}
+
+async def _flush(key, delay: float):
+    await asyncio.sleep(delay)
+    _flush_tasks.pop(key, None)
+    entry = _pending.pop(key, None)
+    if not entry: return
+    sender_email, recipient_email, lang = key
+    msg = build_message(sender_email, recipient_email, entry["sections"], lang)
+    try:
+        await pool.send(sender_email, entry["password"], recipient_email, msg)
+        print(f"[GMAIL] Digest sent to {recipient_email} ({len(entry['sections'])} agents, {lang})")
+    except Exception as e:
+        print(f"[GMAIL ERROR] {e}")
+
+def queue_notification(settings: dict, items: list, credentials_str: str, lang: str = "en", window: float = DIGEST_WINDOW):
+    """
+    Met l'alerte en file sans bloquer l'agent. Les alertes vers un même destinataire arrivées
+    pendant 'window' secondes partent ensemble dans un seul e-mail récapitulatif.
+    """
+    creds = _parse_credentials(credentials_str)
+    if not creds or not items: return
+    sender_email, app_password = creds
+    recipient_email = settings.get("recipient_email") or sender_email
+
+    key = (sender_email, recipient_email, lang)
+    entry = _pending.setdefault(key, {"password": app_password, "sections": []})
+    entry["sections"].append((settings.get("query"), items))
+    if key not in _flush_tasks:
+        _flush_tasks[key] = asyncio.create_task(_flush(key, window))
+
+async def flush_all():
+    """Envoie immédiatement les récapitulatifs en attente (arrêt du serveur)"""
+    tasks = list(_flush_tasks.values())
+    for task in tasks: task.cancel()
+    _flush_tasks.clear()
+    await asyncio.gather(*(_flush(key, 0) for key in list(_pending)), return_exceptions=True)
+    await asyncio.to_thread(pool.close)
@@ -1,6 +1,13 @@
+import os
+import time
 import httpx
 import asyncio
+import hashlib
 from datetime import datetime, timedelta, timezone
+from core.http_pool import get_client
+from core.conditional import with_validators, not_modified, forget
+from core.cache import DiskCache
+from core.text_index import TextIndex
 
 # Snippets translation
 SNIPPETS = {
@@ -9,80 +16,214 @@ SNIPPETS = {
     "es": {"title_found": "📍 Encontrado en el título"}
 }
 
-async def get_page_content(page_id: str, token: str) -> str:
-    url = f"https://api.notion.com/v1/blocks/{page_id}/children"
-    headers = {"Authorization": f"Bearer {token}", "Notion-Version": "2022-06-28"}
+API_URL = os.environ.get("AUTONEXUS_NOTION_API_URL", "https://api.notion.com/v1")
+NOTION_VERSION = "2022-06-28"
+MAX_CONCURRENT_REQUESTS = 8
+MAX_BLOCK_DEPTH = 5
+MAX_BLOCKS_PER_PAGE = 2000
+MAX_RETRIES = 3
+TEXT_BLOCKS = ["paragraph", "heading_1", "heading_2", "heading_3", "bulleted_list_item", "numbered_list_item", "to_do", "toggle", "quote", "callout", "code"]
+# Sub-pages and databases are search results of their own, never inlined into their parent
+SKIP_CHILDREN = ["child_page", "child_database"]
+
+# Extracted page text keyed by page id + last_edited_time: an unchanged page is never downloaded again
+PAGE_CACHE_MAX_BYTES = 50_000_000
+PAGE_CACHE = DiskCache("notion_pages", PAGE_CACHE_MAX_BYTES)
+
+async def notion_get(client: httpx.AsyncClient, url: str, headers: dict, semaphore: asyncio.Semaphore, **kwargs):
+    """GET bounded by the semaphore, honouring Retry-After on 429"""
+    for attempt in range(MAX_RETRIES + 1):
+        async with semaphore:
+            res = await client.get(url, headers=headers, **kwargs)
+        if res.status_code != 429 or attempt == MAX_RETRIES: return res
+        try: delay = float(res.headers.get("Retry-After", 1))
+        except ValueError: delay = 1.0
+        print(f"[NOTION] Rate limited, retrying in {delay:.0f}s.")
+        await asyncio.sleep(delay)
+    return res
+
+async def get_block_text(client: httpx.AsyncClient, block_id: str, headers: dict, semaphore: asyncio.Semaphore, budget: list, depth: int = 0) -> str:
+    """Text of every block under block_id, nested blocks included, in document order"""
+    url = f"{API_URL}/blocks/{block_id}/children"
+    params = {"page_size": 100}
+    parts = []
+    while budget[0] > 0:
+        res = await notion_get(client, url, headers, semaphore, params=params)
+        res.raise_for_status()
+        data = res.json()
+        blocks = data.get("results", [])[:budget[0]]
+        budget[0] -= len(blocks)
+
+        for block in blocks:
+            b_type = block.get("type")
+            if b_type in TEXT_BLOCKS:
+                rich_text = block.get(b_type, {}).get("rich_text", [])
+                parts.append(" ".join(rt.get("plain_text", "") for rt in rich_text))
+            # Nested blocks are fetched concurrently, their text is put back in place below
+            if block.get("has_children") and b_type not in SKIP_CHILDREN and depth < MAX_BLOCK_DEPTH:
+                parts.append(asyncio.ensure_future(get_block_text(client, block["id"], headers, semaphore, budget, depth + 1)))
+
+        if not data.get("has_more") or not data.get("next_cursor"): break
+        params = {"page_size": 100, "start_cursor": data["next_cursor"]}
+
+    texts = [p if isinstance(p, str) else await p for p in parts]
+    return " ".join(t for t in texts if t)
+
+async def get_page_content(page_id: str, token: str, client: httpx.AsyncClient = None, last_edited: str = None, semaphore: asyncio.Semaphore = None) -> str:
+    cache_key = f"{page_id}:{last_edited}" if last_edited else None
+    if cache_key:
+        cached = await PAGE_CACHE.aget_text(cache_key)
+        if cached is not None: return cached
+
+    client = client or get_client()
+    semaphore = semaphore or asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    headers = {"Authorization": f"Bearer {token}", "Notion-Version": NOTION_VERSION}
     try:
-        async with httpx.AsyncClient() as client:
-            res = await client.get(url, headers=headers, params={"page_size": 100})
-            if res.status_code != 200: return ""
-            data = res.json()
-            text_content = []
-            text_blocks = ["paragraph", "heading_1", "heading_2", "heading_3", "bulleted_list_item", "numbered_list_item", "to_do", "toggle", "quote", "callout"]
-            for block in data.get("results", []):
-                b_type = block.get("type")
-                if b_type in text_blocks:
-                    rich_text = block.get(b_type, {}).get("rich_text", [])
-                    for rt in rich_text: text_content.append(rt.get("plain_text", ""))
-            return " ".join(text_content)
-    except: return ""
-
-async def fetch(settings: dict, token: str):
+        content = await get_block_text(client, page_id, headers, semaphore, [MAX_BLOCKS_PER_PAGE])
+    except Exception as e:
+        # Not cached: the page is read again next time
+        print(f"[NOTION] Could not read page {page_id}: {e}")
+        return None
+    if cache_key: await PAGE_CACHE.aput_text(cache_key, content)
+    return content
+
+# Workspace index: one per token, shared by every workflow that uses it
+SEARCH_PAGE_SIZE = 100
+MAX_SEARCH_PAGES = 10
+SYNC_INTERVAL = 20
+MAX_RESULTS = 50
+
+class Workspace:
+    """Local full-text index of the pages a token can see, kept current from last_edited_time"""
+
+    def __init__(self, token: str):
+        self.token = token
+        self.index = TextIndex()
+        # Generations restart from zero with the process: the epoch keeps persisted stamps from matching by chance
+        self.epoch = int(time.time() * 1000)
+        self.watermark = None  # newest last_edited_time fully indexed
+        self.state = {}  # validators of the first search page
+        self.last_sync = 0.0
+        self.lock = asyncio.Lock()
+
+    async def sync(self, client: httpx.AsyncClient):
+        """Walks the search results from the most recently edited page down to the watermark, indexing changed pages"""
+        async with self.lock:
+            if time.monotonic() - self.last_sync < SYNC_INTERVAL: return
+            headers = {"Authorization": f"Bearer {self.token}", "Notion-Version": NOTION_VERSION, "Content-Type": "application/json"}
+            payload = {"page_size": SEARCH_PAGE_SIZE, "sort": {"direction": "descending", "timestamp": "last_edited_time"}}
+            changed, newest, complete = [], None, False
+
+            for n in range(MAX_SEARCH_PAGES):
+                res = await client.post(f"{API_URL}/search", json=payload, headers=with_validators(self.state, "search", headers) if n == 0 else headers)
+                if n == 0 and not_modified(self.state, "search", res):
+                    complete = True
+                    break
+                if res.status_code != 200: break
+                data = res.json()
+
+                reached = False
+                for item in data.get("results", []):
+                    page_id, edited = item["id"], item["last_edited_time"]
+                    newest = max(newest or edited, edited)
+                    # Sorted newest first: everything older than the watermark is already indexed
+                    if self.watermark and edited < self.watermark:
+                        reached = True
+                        break
+                    if item.get("archived") or item.get("in_trash"):
+                        self.index.remove(page_id)
+                    elif self.index.version(page_id) != edited:
+                        changed.append(item)
+
+                if reached or not data.get("has_more") or not data.get("next_cursor"):
+                    complete = True
+                    break
+                payload = {**payload, "start_cursor": data["next_cursor"]}
+            else:
+                print(f"[NOTION] Workspace larger than {MAX_SEARCH_PAGES * SEARCH_PAGE_SIZE} pages, older ones not indexed.")
+                complete = True
+
+            semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+            async def body(item):
+                # A database has no block children: only its title is indexed
+                if item["object"] != "page": return ""
+                return await get_page_content(item["id"], self.token, client, item["last_edited_time"], semaphore)
+            contents = await asyncio.gather(*(body(item) for item in changed))
+
+            failed = False
+            for item, content in zip(changed, contents):
+                if content is None:
+                    failed = True
+                    continue
+                meta = {"url": item.get("url"), "last_edited_time": item["last_edited_time"]}
+                self.index.update(item["id"], item["last_edited_time"], _title(item), content, meta)
+
+            if complete and not failed:
+                if newest: self.watermark = max(self.watermark or newest, newest)
+            else:
+                # Pages left unread must be walked again next time
+                forget(self.state, "search")
+            if changed: print(f"[NOTION] Indexed {len(changed)} changed pages ({len(self.index.docs)} total).")
+            self.last_sync = time.monotonic()
+
+_workspaces = {}
+
+def get_workspace(token: str) -> Workspace:
+    token_hash = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    if token_hash not in _workspaces: _workspaces[token_hash] = Workspace(token)
+    return _workspaces[token_hash]
+
+def _title(item: dict) -> str:
+    if item["object"] == "page" and "properties" in item:
+        for prop in item["properties"].values():
+            if prop["id"] == "title" and prop["title"]: return prop["title"][0]["plain_text"]
+    elif item["object"] == "database" and "title" in item:
+        if item["title"]: return item["title"][0]["plain_text"]
+    return "Untitled"
+
+def fetch_key(settings: dict):
+    """Settings that determine fetch() output (agents sharing a key share one fetch)"""
+    return [settings.get("query", "").strip().lower(), settings.get("agent_language", "en")]
+
+async def fetch(settings: dict, token: str, state: dict = None, client: httpx.AsyncClient = None):
     query = settings.get("query", "").strip().lower()
     lang = settings.get("agent_language", "en")
     t = SNIPPETS.get(lang, SNIPPETS["en"])
 
     if not token or not query: return []
-    
-    headers = {"Authorization": f"Bearer {token}", "Notion-Version": "2022-06-28", "Content-Type": "application/json"}
-    payload = {"page_size": 50, "sort": {"direction": "descending", "timestamp": "last_edited_time"}}
-    
+
     try:
-        async with httpx.AsyncClient() as client:
-            res = await client.post("https://api.notion.com/v1/search", json=payload, headers=headers)
-            if res.status_code != 200: return []
-            data = res.json()
-            results = []
-            now = datetime.now(timezone.utc)
-            
-            for item in data.get("results", []):
-                page_id = item["id"]
-                title = "Untitled"
-                if item["object"] == "page" and "properties" in item:
-                    for prop in item["properties"].values():
-                        if prop["id"] == "title" and prop["title"]: title = prop["title"][0]["plain_text"]
-                elif item["object"] == "database" and "title" in item:
-                    if item["title"]: title = item["title"][0]["plain_text"]
-                
-                match_found = False
-                snippet = ""
-                
-                if query in title.lower():
-                    match_found = True
-                    snippet = t["title_found"]
-                else:
-                    content = await get_page_content(page_id, token)
-                    if query in content.lower():
-                        match_found = True
-                        idx = content.lower().find(query)
-                        start = max(0, idx - 30)
-                        end = min(len(content), idx + 60)
-                        snippet = f"...{content[start:end]}..."
-                
-                if not match_found: continue
-
-                last_edited = datetime.fromisoformat(item["last_edited_time"].replace('Z', '+00:00'))
-                is_stable = (now - last_edited) > timedelta(seconds=60)
-                
-                results.append({
-                    "unique_key": f"notion:{page_id}", 
-                    "fingerprint": item["last_edited_time"], 
-                    "content": f"📄 **{title}**\n🔎 *{snippet}*",
-                    "link": item.get("url"),
-                    "is_ready": is_stable,
-                    "is_update": False 
-                })
-                await asyncio.sleep(0.1)
-
-            return results
-    except: return []
\ No newline at end of file
+        workspace = get_workspace(token)
+        await workspace.sync(client or get_client())
+        index = workspace.index
+        # Nothing was re-indexed since this workflow's last complete answer
+        stamp = f"{workspace.epoch}:{index.generation}"
+        if state is not None and state.get("index_generation") == stamp: return None
+
+        results = []
+        now = datetime.now(timezone.utc)
+        matches = sorted(index.search(query), key=lambda m: index.docs[m[0]]["version"], reverse=True)
+
+        for page_id, in_title, snippet in matches[:MAX_RESULTS]:
+            doc = index.docs[page_id]
+            last_edited = datetime.fromisoformat(doc["version"].replace('Z', '+00:00'))
+            is_stable = (now - last_edited) > timedelta(seconds=60)
+
+            results.append({
+                "unique_key": f"notion:{page_id}",
+                "fingerprint": doc["version"],
+                "content": f"📄 **{doc['title']}**\n🔎 *{t['title_found'] if in_title else snippet}*",
+                "link": doc["meta"].get("url"),
+                "timestamp": doc["version"],
+                "is_ready": is_stable,
+                "is_update": False
+            })
+
+        # A page still being edited must be looked at again next cycle
+        if state is not None:
+            if any(not r["is_ready"] for r in results): state.pop("index_generation", None)
+            else: state["index_generation"] = stamp
+        return results
+    except Exception as e:
+        print(f"[NOTION] Error: {e}")
+        return []
@@ -1,38 +1,81 @@
+import os
 import httpx
 from datetime import datetime, timezone
+from core.http_pool import get_client
 
-async def fetch(settings: dict, token: str):
+API_URL = os.environ.get("AUTONEXUS_TWITTER_API_URL", "https://api.twitter.com/2")
+PAGE_SIZE = 100  # Maximum accepted by the recent search endpoint
+MAX_PAGES = 10  # Per poll
+
+def fetch_key(settings: dict):
+    """Settings that determine fetch() output (agents sharing a key share one fetch)"""
+    return [(settings.get("query") or "").strip()]
+
+async def fetch(settings: dict, token: str, state: dict = None, client: httpx.AsyncClient = None):
     """
-    Fetches recent tweets.
+    Fetches tweets newer than state["since_id"], following next_token until exhausted.
+    The first poll only reads the latest page. A backlog longer than MAX_PAGES is read over several
+    polls: state["gap"] keeps where to resume (until_id), and since_id only moves once it is read.
+    Returns None when there is no new tweet.
     """
     query = settings.get("query")
     if not token or not query: return []
+    if state is None: state = {}
     
     headers = {"Authorization": f"Bearer {token}"}
-    url = "https://api.twitter.com/2/tweets/search/recent"
-    params = {"query": query, "max_results": 10}
+    url = f"{API_URL}/tweets/search/recent"
+    gap = state.get("gap")  # {"since_id", "until_id", "newest_id"} of a backlog still being read
+    since_id = gap["since_id"] if gap else state.get("since_id")
+    client = client or get_client()
     
     try:
-        async with httpx.AsyncClient() as client:
+        tweets = []
+        newest_id = gap["newest_id"] if gap else None
+        oldest_id = None
+        next_token = None
+        complete = False
+        for page in range(MAX_PAGES):
+            params = {"query": query, "max_results": PAGE_SIZE, "tweet.fields": "created_at"}
+            if since_id: params["since_id"] = since_id
+            if gap: params["until_id"] = gap["until_id"]
+            if next_token: params["next_token"] = next_token
             res = await client.get(url, params=params, headers=headers)
             
             if res.status_code != 200:
                 print(f"[TWITTER API ERROR] {res.text}")
-                return []
+                break
             
             data = res.json()
-            results = []
-            
-            if "data" in data:
-                for t in data["data"]:
-                    results.append({
-                        "unique_key": f"twitter:{t['id']}", 
-                        "fingerprint": t.get("created_at", ""), 
-                        "content": t["text"],
-                        "link": f"https://twitter.com/user/status/{t['id']}",
-                        "is_ready": True
-                    })
-            return results
+            meta = data.get("meta", {})
+            newest_id = newest_id or meta.get("newest_id")
+            oldest_id = meta.get("oldest_id") or oldest_id
+            tweets.extend(data.get("data", []))
+            next_token = meta.get("next_token")
+            if not next_token or not since_id:
+                complete = True
+                break
+        else:
+            # Older tweets are read on the next polls, below the oldest one read so far
+            print(f"[TWITTER] More than {MAX_PAGES} pages of new tweets for '{query}', resuming on next poll.")
+            if oldest_id: state["gap"] = {"since_id": since_id, "until_id": oldest_id, "newest_id": newest_id}
+
+        # Pages go from newest to oldest: the cursor only moves once the gap is fully read
+        if complete:
+            state.pop("gap", None)
+            if newest_id: state["since_id"] = newest_id
+        if not tweets: return None if since_id else []
+
+        results = []
+        for t in tweets:
+            results.append({
+                "unique_key": f"twitter:{t['id']}", 
+                "fingerprint": t.get("created_at", ""), 
+                "content": t["text"],
+                "timestamp": t.get("created_at"),
+                "link": f"https://twitter.com/user/status/{t['id']}",
+                "is_ready": True
+            })
+        return results
     except Exception as e:
         print(f"[TWITTER ERROR] {e}")
-        return []
\ No newline at end of file
+        return []
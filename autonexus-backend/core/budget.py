@@ -0,0 +1,315 @@
+import asyncio
+import hashlib
+import heapq
+import math
+import os
+import re
+import time
+from datetime import datetime, timezone
+from core import metrics
+from core.chunking import count_tokens, split_text
+
+# Budgets de tokens LLM (0 = illimité) :
+# - par cycle : plafond commun à tous les agents (AUTONEXUS_CYCLE_TOKENS), abaissable par agent (réglage ai_cycle_tokens) ;
+# - par jour (UTC) : par agent (réglage ai_daily_tokens, sinon AUTONEXUS_AGENT_DAILY_TOKENS)
+#   et pour l'ensemble des agents (AUTONEXUS_DAILY_TOKENS, partagé entre workers via le store).
+CYCLE_TOKENS = int(os.environ.get("AUTONEXUS_CYCLE_TOKENS", 0))
+AGENT_DAILY_TOKENS = int(os.environ.get("AUTONEXUS_AGENT_DAILY_TOKENS", 0))
+DAILY_TOKENS = int(os.environ.get("AUTONEXUS_DAILY_TOKENS", 0))
+# Un item coûte ses tokens de données en map ; prompts, réponses, reduce et synthèse s'y ajoutent
+OVERHEAD = 1.25
+
+USAGE_NS = "token_usage"
+DEFERRED_PREFIX = "deferred:"
+MAX_DEFERRED_PER_AGENT = 10_000
+
+# Priorité d'un item quand le lot dépasse le budget
+RELEVANCE_WEIGHT = 3.0  # Mots du custom_prompt retrouvés dans le chemin / lien (puis le début du contenu)
+RECENCY_WEIGHT = 1.0
+CHANGE_WEIGHT = 1.0
+AGING_PER_HOUR = 0.5  # Un item différé gagne en priorité tant qu'il attend : il finit toujours par passer
+RECENCY_HALF_LIFE = 24 * 3600
+CHANGE_SCALE = 1000  # Lignes modifiées (ou tokens) au-delà desquelles un changement compte pleinement
+RELEVANCE_SCAN_CHARS = 2000
+PART_PRIORITY_STEP = 0.001  # Écart entre deux parties successives d'un item trop gros pour un cycle
+
+STOPWORDS = {"about", "also", "what", "which", "with", "that", "this", "these", "those", "from", "into", "have",
+             "give", "list", "find", "show", "most", "more", "only", "each", "every", "their", "them", "there",
+             "they", "should", "would", "could", "please", "your", "make", "like", "than", "then", "when", "where"}
+
+def _h(value: str) -> str:
+    return hashlib.blake2b(str(value).encode("utf-8"), digest_size=8).hexdigest()
+
+def _today() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+def _int(value, default: int) -> int:
+    try: return int(value) if value not in (None, "") else default
+    except: return default
+
+def cycle_tokens(settings: dict) -> int:
+    """Plafond d'un cycle de l'agent (0 = illimité)"""
+    cycle = _int(settings.get("ai_cycle_tokens"), 0)
+    if CYCLE_TOKENS: cycle = min(cycle, CYCLE_TOKENS) if cycle else CYCLE_TOKENS
+    return cycle
+
+# --- CONSOMMATION ---
+class TokenBudget:
+    """
+    Tokens consommés aujourd'hui, par agent, persistés dans le store ("<jour>:<w_id>" -> tokens).
+    Chaque agent n'a qu'un processus propriétaire, seul à écrire son compteur ; les compteurs des
+    agents des autres workers sont relus périodiquement (load) pour le budget global.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.day = _today()
+        self._used = {}  # w_id -> tokens du jour (agents de ce processus)
+        self._others = 0  # Tokens du jour des agents tenus par d'autres processus
+        self._reserved = {}  # w_id -> tokens engagés par un cycle en cours
+
+    def _roll(self):
+        day = _today()
+        if day == self.day: return
+        for w_id in self._used: self.store.delete(USAGE_NS, f"{self.day}:{w_id}")
+        self.day, self._used, self._others = day, {}, 0
+
+    def load(self, entries: dict, local: set = None):
+        """
+        Compteurs lus dans le store. local : agents tenus par ce processus (leur compteur en mémoire
+        fait foi une fois chargé) ; None = tous (mode "all").
+        """
+        self._roll()
+        prefix = f"{self.day}:"
+        others = 0
+        for key, tokens in entries.items():
+            if not key.startswith(prefix):
+                self.store.delete(USAGE_NS, key)  # Jour passé (processus arrêté avant minuit)
+                continue
+            w_id = key[len(prefix):]
+            if local is None or w_id in local: self._used.setdefault(w_id, tokens)
+            else: others += tokens
+        self._others = others
+
+    def used(self, w_id: str = None) -> int:
+        self._roll()
+        if w_id is not None: return self._used.get(w_id, 0)
+        return sum(self._used.values()) + self._others
+
+    def allowance(self, w_id: str, settings: dict):
+        """Tokens qu'un cycle de l'agent peut encore engager (None = illimité)"""
+        self._roll()
+        limits = []
+        cycle = cycle_tokens(settings)
+        if cycle: limits.append(cycle)
+        agent_daily = _int(settings.get("ai_daily_tokens"), AGENT_DAILY_TOKENS)
+        if agent_daily: limits.append(agent_daily - self.used(w_id))
+        if DAILY_TOKENS: limits.append(DAILY_TOKENS - self.used() - sum(self._reserved.values()))
+        return max(0, min(limits)) if limits else None
+
+    def reserve(self, w_id: str, tokens: int):
+        """Engage des tokens pour un cycle en cours (les cycles simultanés ne dépassent pas le budget global)"""
+        self._reserved[w_id] = self._reserved.get(w_id, 0) + tokens
+
+    def record(self, w_id: str, used: int, reserved: int = 0):
+        """Fin de cycle : libère la réservation et ajoute la consommation réelle"""
+        self._roll()
+        if reserved:
+            left = self._reserved.get(w_id, 0) - reserved
+            if left > 0: self._reserved[w_id] = left
+            else: self._reserved.pop(w_id, None)
+        if not used: return
+        self._used[w_id] = self._used.get(w_id, 0) + used
+        self.store.put(USAGE_NS, f"{self.day}:{w_id}", self._used[w_id])
+
+    def forget(self, w_id: str):
+        """Agent passé à un autre worker : son compteur reste dans le store, relu comme celui des autres"""
+        self._used.pop(w_id, None)
+        self._reserved.pop(w_id, None)
+
+# --- PRIORITÉ ---
+def keywords(prompt: str) -> set:
+    return {w for w in re.findall(r"[a-z0-9]{4,}", (prompt or "").lower()) if w not in STOPWORDS}
+
+def _matches(words: set, wanted: set) -> int:
+    # "auth" dans un chemin correspond à "authentication" dans le prompt (et inversement)
+    return sum(1 for k in wanted if any(w.startswith(k) or k.startswith(w) for w in words))
+
+def priority(item: dict, wanted: set, cost: int, now: float = None) -> float:
+    """Pertinence du chemin / lien pour le custom_prompt, fraîcheur (item["timestamp"]) et taille du changement"""
+    now = now or time.time()
+    score = 0.0
+    if wanted:
+        path_words = set(re.findall(r"[a-z0-9]{3,}", (item.get("link") or "").lower()))
+        text = (item.get("body") or item.get("content") or "")[:RELEVANCE_SCAN_CHARS].lower()
+        text_words = set(re.findall(r"[a-z0-9]{3,}", text))
+        relevance = 0.7 * _matches(path_words, wanted) / len(wanted) + 0.3 * _matches(text_words, wanted) / len(wanted)
+        score += RELEVANCE_WEIGHT * relevance
+
+    recency = 1.0
+    if item.get("timestamp"):
+        try:
+            age = now - datetime.fromisoformat(item["timestamp"].replace("Z", "+00:00")).timestamp()
+            recency = 0.5 ** (max(0.0, age) / RECENCY_HALF_LIFE)
+        except ValueError: pass
+    score += RECENCY_WEIGHT * recency
+
+    # Lignes modifiées si le connecteur les connaît (GitHub incrémental), sinon taille de l'item
+    change = item.get("changes") or cost
+    score += CHANGE_WEIGHT * min(1.0, math.log1p(change) / math.log1p(CHANGE_SCALE))
+    return score
+
+def split_item(item: dict, max_tokens: int) -> list:
+    """Item trop gros pour un cycle -> parties coupées aux fins de ligne, chacune analysable (et différable) seule"""
+    parts = split_text(item["content"], max_tokens)
+    if len(parts) <= 1: return [item]
+    items = []
+    for i, part in enumerate(parts):
+        sub = dict(item, content=part, unique_key=f"{item['unique_key']}#part{i+1}", fingerprint=f"{item['fingerprint']}#part{i+1}")
+        sub.pop("body", None)
+        items.append(sub)
+    return items
+
+# --- DIFFÉRÉS ---
+class DeferredQueue:
+    """
+    Items dépassant le budget, repris aux cycles suivants. Contenu dans le store (un espace de noms
+    par agent), seul un index {clé: (priorité, coût, depuis)} reste en mémoire.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._index = {}  # w_id -> {hash(unique_key): (priorité, tokens, différé depuis)}
+
+    @staticmethod
+    def namespace(w_id: str) -> str:
+        return DEFERRED_PREFIX + w_id
+
+    def load(self, data: dict):
+        for ns, entries in data.items():
+            if ns.startswith(DEFERRED_PREFIX): self.load_workflow(ns[len(DEFERRED_PREFIX):], data)
+
+    def load_workflow(self, w_id: str, data: dict):
+        entries = data.get(self.namespace(w_id), {})
+        self._index[w_id] = {k: (e["priority"], e["cost"], e["since"]) for k, e in entries.items()}
+        if not self._index[w_id]: del self._index[w_id]
+        self._gauge(w_id)
+
+    def _gauge(self, w_id: str):
+        metrics.DEFERRED_ITEMS.set(self.count(w_id), agent=w_id)
+
+    def count(self, w_id: str) -> int:
+        return len(self._index.get(w_id, {}))
+
+    def total(self) -> int:
+        return sum(len(index) for index in self._index.values())
+
+    def candidates(self, w_id: str, now: float = None) -> list:
+        """[(priorité vieillie, tokens, clé)]"""
+        now = now or time.time()
+        return [(p + AGING_PER_HOUR * (now - since) / 3600, cost, k) for k, (p, cost, since) in self._index.get(w_id, {}).items()]
+
+    def put(self, w_id: str, item: dict, priority: float, cost: int):
+        index = self._index.setdefault(w_id, {})
+        key = _h(item["unique_key"])
+        since = index.get(key, (0, 0, time.time()))[2]  # Une nouvelle version garde l'ancienneté
+        index[key] = (priority, cost, since)
+        self.store.put(self.namespace(w_id), key, {"item": item, "priority": priority, "cost": cost, "since": since})
+        if len(index) > MAX_DEFERRED_PER_AGENT:
+            dropped = min(index, key=lambda k: index[k][0] + AGING_PER_HOUR * (time.time() - index[k][2]) / 3600)
+            self.discard(w_id, dropped)
+            print(f"[BUDGET] Agent {w_id}: deferred queue full, lowest-priority item dropped.")
+        self._gauge(w_id)
+
+    def discard(self, w_id: str, key: str):
+        index = self._index.get(w_id)
+        if not index or index.pop(key, None) is None: return
+        self.store.delete(self.namespace(w_id), key)
+        if not index: del self._index[w_id]
+        self._gauge(w_id)
+
+    def superseded(self, w_id: str, unique_key: str):
+        """Une nouvelle version de l'item est arrivée : l'ancienne, différée, n'a plus lieu d'être"""
+        self.discard(w_id, _h(unique_key))
+
+    def _read(self, w_id: str, keys: list) -> dict:
+        self.store.flush()  # Les différés du cycle précédent sont peut-être encore en file d'écriture
+        return self.store.get(self.namespace(w_id), keys)
+
+    async def take(self, w_id: str, keys: list) -> dict:
+        """Retire des items de la file -> {clé: item} (contenu relu sur disque)"""
+        if not keys: return {}
+        entries = await asyncio.to_thread(self._read, w_id, keys)
+        for key in keys: self.discard(w_id, key)
+        return {k: e["item"] for k, e in entries.items()}
+
+    def keys(self, w_id: str) -> list:
+        return list(self._index.get(w_id, {}))
+
+    def forget(self, w_id: str):
+        self._index.pop(w_id, None)
+        metrics.DEFERRED_ITEMS.remove(agent=w_id)
+
+    def drop(self, w_id: str):
+        """Reset ou suppression de l'agent : ses différés ne correspondent plus à ses réglages"""
+        self.forget(w_id)
+        self.store.drop(self.namespace(w_id))
+
+# --- SÉLECTION D'UN CYCLE ---
+class Selection:
+    """
+    Choix des items d'un cycle dans la limite du budget, au fil du flux : les items de plus forte
+    priorité sont gardés (au plus `limit` tokens en mémoire), les autres partent dans la file des
+    différés. Les différés des cycles précédents concourent avec leur priorité vieillie.
+    is_cached(item) (coroutine) : l'extraction de l'item est déjà en cache, il ne coûte aucun token et passe toujours.
+    """
+
+    def __init__(self, w_id: str, limit: int, prompt: str, deferred: DeferredQueue, max_item: int = None, is_cached=None):
+        self.w_id = w_id
+        self.limit = limit
+        self.max_item = max_item or limit
+        self.wanted = keywords(prompt)
+        self.deferred = deferred
+        self.is_cached = is_cached
+        self.now = time.time()
+        self._heap = []  # (priorité, n°, tokens, item ou None, clé du différé)
+        self._free = []  # Items déjà en cache
+        self._seq = 0
+        self.total = 0
+        self.new_deferred = 0
+        for p, cost, key in deferred.candidates(w_id, self.now):
+            self._push(p, cost, None, key)
+
+    async def offer(self, item: dict):
+        self.deferred.superseded(self.w_id, item["unique_key"])
+        if self.is_cached and await self.is_cached(item):
+            self._free.append(item)
+            return
+        cost = count_tokens(item["content"])
+        if not self.max_item or cost <= self.max_item:
+            self._push(priority(item, self.wanted, cost, self.now), cost, item, None)
+            return
+        # Ne tiendrait jamais dans un cycle : les parties concourent séparément, celles en trop sont différées.
+        # Elles gardent la priorité de l'item, légèrement décroissante pour passer dans l'ordre du texte
+        p = priority(item, self.wanted, cost, self.now)
+        for i, part in enumerate(split_item(item, self.max_item)):
+            self.deferred.superseded(self.w_id, part["unique_key"])
+            if self.is_cached and await self.is_cached(part):
+                self._free.append(part)
+                continue
+            self._push(p - i * PART_PRIORITY_STEP, count_tokens(part["content"]), part, None)
+
+    def _push(self, p: float, cost: int, item, key):
+        self._seq += 1
+        heapq.heappush(self._heap, (p, self._seq, cost, item, key))
+        self.total += cost
+        while self.total > self.limit and self._heap:
+            p, _, cost, item, key = heapq.heappop(self._heap)
+            self.total -= cost
+            if item is not None:
+                self.deferred.put(self.w_id, item, p, cost)
+                self.new_deferred += 1
+
+    def chosen(self) -> list:
+        """[(item ou None, clé du différé)] retenus, du plus prioritaire au moins prioritaire"""
+        return [(item, None) for item in self._free] + [(item, key) for _, _, _, item, key in sorted(self._heap, reverse=True)]
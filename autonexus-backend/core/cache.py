@@ -0,0 +1,151 @@
+import asyncio
+import os
+import hashlib
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# Dossier racine des caches persistants (partagé par tous les agents)
+CACHE_DIR = os.environ.get("AUTONEXUS_CACHE_DIR", "autonexus_cache")
+INDEX_FILE = "index.db"
+BUSY_TIMEOUT = 30  # Secondes d'attente du verrou d'écriture de l'index (plusieurs processus le partagent)
+TOUCH_GRANULARITY = 60  # La date de dernière utilisation n'est réécrite qu'au-delà (lectures sans écriture)
+
+class DiskCache:
+    """
+    Cache clé -> octets sur disque, borné en taille avec éviction LRU.
+    - Un fichier par entrée (écriture atomique via os.replace).
+    - Index des tailles et dates d'utilisation dans une base SQLite du dossier, partagée par tous les
+      processus (workers) qui utilisent le même CACHE_DIR : la borne vaut pour l'ensemble, et aucun
+      processus n'évince un fichier sans que les autres le sachent.
+    - get/put sont bloquants (disque) : depuis la boucle asyncio, passer par les variantes a* (thread).
+    """
+
+    def __init__(self, name: str, max_bytes: int):
+        self.directory = os.path.join(CACHE_DIR, name)
+        self.max_bytes = max_bytes
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _db(self):
+        """Connexion à l'index (à appeler sous self._lock), créé au premier accès depuis les fichiers présents"""
+        if self._conn is not None: return self._conn
+        os.makedirs(self.directory, exist_ok=True)
+        conn = sqlite3.connect(os.path.join(self.directory, INDEX_FILE), timeout=BUSY_TIMEOUT,
+                               isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS files (name TEXT PRIMARY KEY, size INTEGER NOT NULL, used REAL NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS files_used ON files (used)")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        with self._transaction(conn):
+            if conn.execute("SELECT value FROM meta WHERE key = 'total'").fetchone() is None: self._import(conn)
+        self._conn = conn
+        return conn
+
+    @staticmethod
+    @contextmanager
+    def _transaction(conn):
+        # Verrou d'écriture pris dès le début : lecture du total et mise à jour sans écriture concurrente
+        conn.execute("BEGIN IMMEDIATE")
+        try: yield
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _import(self, conn):
+        """Indexe les fichiers existants (cache créé avant l'index), l'ordre LRU venant de leur mtime"""
+        total = 0
+        for sub in os.listdir(self.directory):
+            sub_path = os.path.join(self.directory, sub)
+            if not os.path.isdir(sub_path): continue
+            for name in os.listdir(sub_path):
+                if name.endswith(".tmp"): continue
+                try: st = os.stat(os.path.join(sub_path, name))
+                except OSError: continue
+                conn.execute("INSERT OR REPLACE INTO files (name, size, used) VALUES (?, ?, ?)", (name, st.st_size, st.st_mtime))
+                total += st.st_size
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('total', ?)", (total,))
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name[:2], name)
+
+    @staticmethod
+    def _name(key: str) -> str:
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+    def contains(self, key: str) -> bool:
+        return os.path.exists(self._path(self._name(key)))
+
+    def get(self, key: str):
+        name = self._name(key)
+        try:
+            with open(self._path(name), "rb") as f: data = f.read()
+        except OSError:
+            return None
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._db()
+                row = conn.execute("SELECT used FROM files WHERE name = ?", (name,)).fetchone()
+                if row and now - row[0] > TOUCH_GRANULARITY:
+                    conn.execute("UPDATE files SET used = ? WHERE name = ?", (now, name))
+        except sqlite3.Error as e:
+            print(f"[CACHE ERROR] {self.directory}: {e}")
+        return data
+
+    def put(self, key: str, data: bytes):
+        if len(data) > self.max_bytes: return
+        name = self._name(key)
+        path = self._path(name)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f: f.write(data)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"[CACHE ERROR] {self.directory}: {e}")
+            return
+
+        evicted = []
+        try:
+            with self._lock:
+                conn = self._db()
+                with self._transaction(conn):
+                    row = conn.execute("SELECT size FROM files WHERE name = ?", (name,)).fetchone()
+                    total = conn.execute("SELECT value FROM meta WHERE key = 'total'").fetchone()[0]
+                    total += len(data) - (row[0] if row else 0)
+                    conn.execute("INSERT INTO files (name, size, used) VALUES (?, ?, ?) ON CONFLICT(name) DO UPDATE SET size = excluded.size, used = excluded.used",
+                                 (name, len(data), time.time()))
+                    if total > self.max_bytes:
+                        for old, size in conn.execute("SELECT name, size FROM files WHERE name != ? ORDER BY used", (name,)):
+                            if total <= self.max_bytes: break
+                            evicted.append(old)
+                            total -= size
+                        conn.executemany("DELETE FROM files WHERE name = ?", [(old,) for old in evicted])
+                    conn.execute("UPDATE meta SET value = ? WHERE key = 'total'", (total,))
+        except sqlite3.Error as e:
+            print(f"[CACHE ERROR] {self.directory}: {e}")
+            return
+        for old in evicted:
+            try: os.remove(self._path(old))
+            except OSError: pass
+
+    def get_text(self, key: str):
+        data = self.get(key)
+        return None if data is None else data.decode("utf-8", errors="ignore")
+
+    def put_text(self, key: str, text: str):
+        self.put(key, text.encode("utf-8"))
+
+    # --- Depuis la boucle asyncio ---
+    async def acontains(self, key: str) -> bool:
+        return await asyncio.to_thread(self.contains, key)
+
+    async def aget_text(self, key: str):
+        return await asyncio.to_thread(self.get_text, key)
+
+    async def aput_text(self, key: str, text: str):
+        await asyncio.to_thread(self.put_text, key, text)
@@ -0,0 +1,126 @@
+import bisect
+
+# Comptage exact avec tiktoken s'il est installé, sinon approximation ~4 caractères / token
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("o200k_base")  # Encodage de gpt-4o
+except Exception:
+    _encoding = None
+
+DEFAULT_CHUNK_TOKENS = 12000  # Budget de données par appel (hors prompt)
+DEFAULT_REDUCE_TOKENS = 30000  # Budget de notes par appel de synthèse (reduce)
+CHUNK_OVERLAP_TOKENS = 200  # Recouvrement entre les morceaux d'un fichier découpé
+
+def count_tokens(text: str) -> int:
+    if _encoding is not None: return len(_encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+def split_text(text: str, max_tokens: int, overlap_tokens: int = CHUNK_OVERLAP_TOKENS) -> list:
+    """Découpe aux fins de ligne en morceaux <= max_tokens, chaque morceau reprenant la fin du précédent"""
+    lines = []
+    for line in text.splitlines(keepends=True):
+        tokens = count_tokens(line)
+        if tokens <= max_tokens:
+            lines.append((line, tokens))
+            continue
+        # Ligne géante (minifié, données) : coupe brute à la taille approximative
+        step = max(1, len(line) * max_tokens // tokens)
+        for i in range(0, len(line), step):
+            part = line[i:i + step]
+            lines.append((part, count_tokens(part)))
+
+    parts, current, size = [], [], 0
+    for line, tokens in lines:
+        if current and size + tokens > max_tokens:
+            parts.append("".join(l for l, _ in current))
+            # Garde les dernières lignes comme contexte du morceau suivant
+            overlap, kept = [], 0
+            for l, t in reversed(current):
+                if kept + t > overlap_tokens or kept + t + tokens > max_tokens: break
+                overlap.insert(0, (l, t))
+                kept += t
+            current, size = overlap, kept
+        current.append((line, tokens))
+        size += tokens
+    if current: parts.append("".join(l for l, _ in current))
+    return parts
+
+def item_texts(item: dict, max_tokens: int, source_id=None) -> list:
+    """
+    Texte(s) d'un item pour l'IA : [(texte, tokens)], découpé s'il dépasse le budget d'un appel.
+    source_id numérote la source dans l'en-tête ("SOURCE [3]: ...") pour attribuer les réponses.
+    """
+    source = f"SOURCE [{source_id}]" if source_id is not None else "SOURCE"
+    text = f"{source}: {item['link']}\nCONTENT:\n{item['content']}\n---\n"
+    tokens = count_tokens(text)
+    if tokens <= max_tokens: return [(text, tokens)]
+
+    header_budget = count_tokens(f"{source}: {item['link']} (part 000/000)\nCONTENT:\n\n---\n")
+    parts = split_text(item["content"], max(1, max_tokens - header_budget))
+    texts = []
+    for i, part in enumerate(parts):
+        part_text = f"{source}: {item['link']} (part {i+1}/{len(parts)})\nCONTENT:\n{part}\n---\n"
+        texts.append((part_text, count_tokens(part_text)))
+    return texts
+
+def pack(texts: list, max_tokens: int) -> list:
+    """
+    Best-fit decreasing : chaque texte (du plus gros au plus petit) va dans le morceau
+    où il laisse le moins de place libre -> moins d'appels, mieux remplis.
+    texts = [(texte, tokens, ...)] -> [[(texte, tokens, ...), ...], ...]
+    """
+    chunks = []
+    free = []  # (place libre, index du morceau), trié
+    for entry in sorted(texts, key=lambda t: t[1], reverse=True):
+        tokens = entry[1]
+        pos = bisect.bisect_left(free, (tokens, -1))
+        if pos < len(free):
+            space, idx = free.pop(pos)
+        else:
+            space, idx = max_tokens, len(chunks)
+            chunks.append([])
+        chunks[idx].append(entry)
+        bisect.insort(free, (space - tokens, idx))
+    return chunks
+
+MAX_OPEN_CHUNKS = 4  # Morceaux en cours de remplissage au maximum avec StreamPacker
+FULL_CHUNK_RATIO = 0.95  # Un morceau rempli à ce point part sans attendre
+
+class StreamPacker:
+    """
+    Version en ligne de pack() pour des textes qui arrivent au fil de l'eau : best-fit parmi
+    quelques morceaux ouverts ; un morceau part dès qu'il est plein, ou (le plus rempli) quand il faut
+    en ouvrir un de trop. La mémoire reste bornée à max_open morceaux quel que soit le nombre de textes.
+    """
+
+    def __init__(self, max_tokens: int, max_open: int = MAX_OPEN_CHUNKS):
+        self.max_tokens = max_tokens
+        self.max_open = max_open
+        self._open = []  # [[place libre, [(texte, tokens, ...), ...]], ...]
+
+    def add(self, entry) -> list:
+        """Ajoute un texte (texte, tokens, ...) -> morceaux complets, prêts à partir"""
+        tokens = entry[1]
+        ready = []
+        fits = [c for c in self._open if c[0] >= tokens]
+        if fits:
+            chunk = min(fits, key=lambda c: c[0])
+        else:
+            if len(self._open) >= self.max_open:
+                fullest = min(self._open, key=lambda c: c[0])
+                self._open.remove(fullest)
+                ready.append(fullest[1])
+            chunk = [self.max_tokens, []]
+            self._open.append(chunk)
+        chunk[0] -= tokens
+        chunk[1].append(entry)
+        if chunk[0] <= self.max_tokens * (1 - FULL_CHUNK_RATIO):
+            self._open.remove(chunk)
+            ready.append(chunk[1])
+        return ready
+
+    def flush(self) -> list:
+        """Fin du flux : les morceaux encore ouverts"""
+        chunks = [entries for _, entries in self._open]
+        self._open = []
+        return chunks
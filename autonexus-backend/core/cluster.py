@@ -0,0 +1,70 @@
+import hashlib
+import os
+import time
+
+# Mode multi-processus : le processus API ne fait que gérer workflows et identifiants dans le store,
+# les agents tournent dans des workers. Chaque worker publie un battement de cœur dans le store ;
+# un agent appartient au worker vivant de plus haut score (rendezvous hashing) : l'arrivée ou la
+# disparition d'un worker ne déplace que les agents qui lui reviennent ou lui appartenaient.
+
+NS = "workers"
+HEARTBEAT_INTERVAL = 5
+HEARTBEAT_TIMEOUT = 20  # Un worker muet depuis plus longtemps est considéré mort
+HANDOFF_NS = "handoff"  # Par agent : {"worker": propriétaire, "released": bool}, écrit après la sauvegarde de son état
+HANDOFF_POLL = 1  # Secondes entre deux relectures des marqueurs par un worker qui attend une reprise
+
+def _fresh(entry: dict, now: float) -> bool:
+    return now - entry.get("heartbeat", 0) <= HEARTBEAT_TIMEOUT
+
+def _score(worker_id: str, w_id: str) -> int:
+    return int.from_bytes(hashlib.blake2b(f"{worker_id}:{w_id}".encode("utf-8"), digest_size=8).digest(), "big")
+
+def owner(w_id: str, workers: list):
+    """Worker responsable de l'agent parmi les workers vivants"""
+    return max(workers, key=lambda worker_id: _score(worker_id, w_id)) if workers else None
+
+class Membership:
+    def __init__(self, store, worker_id: str):
+        self.store = store
+        self.worker_id = worker_id
+        self.started = time.time()
+
+    def beat(self, stats: dict = None):
+        self.store.put(NS, self.worker_id, {"pid": os.getpid(), "started": self.started, "heartbeat": time.time(), "stats": stats or {}})
+
+    def alive(self, entries: dict) -> list:
+        """Workers vivants (triés) d'après les entrées lues dans le store ; on se compte toujours soi-même"""
+        now = time.time()
+        workers = {w for w, entry in entries.items() if _fresh(entry, now) and not entry.get("leaving")}
+        workers.add(self.worker_id)
+        return sorted(workers)
+
+    def leave(self):
+        """
+        Début d'arrêt propre : les autres workers reprennent nos agents sans attendre le timeout
+        (l'entrée reste, battement compris, jusqu'à gone() : ils attendent nos marqueurs de remise)
+        """
+        self.store.put(NS, self.worker_id, {"pid": os.getpid(), "started": self.started, "heartbeat": time.time(), "leaving": True})
+
+    def gone(self):
+        """Fin d'arrêt propre, une fois les agents sauvegardés et remis"""
+        self.store.delete(NS, self.worker_id)
+
+    def owned(self, w_id: str):
+        self.store.put(HANDOFF_NS, w_id, {"worker": self.worker_id, "released": False})
+
+    def released(self, w_id: str):
+        """À appeler après la sauvegarde de l'agent : la file d'écriture du store étant ordonnée, le
+        marqueur n'est visible qu'une fois l'état sur disque"""
+        self.store.put(HANDOFF_NS, w_id, {"worker": self.worker_id, "released": True})
+
+    def handed_over(self, marker, entries: dict) -> bool:
+        """L'agent peut être repris : jamais attribué, remis, ou ancien propriétaire disparu / muet"""
+        if marker is None or marker.get("released") or marker.get("worker") == self.worker_id: return True
+        entry = entries.get(marker.get("worker"))
+        return entry is None or not _fresh(entry, time.time())
+
+def workers_status(entries: dict) -> list:
+    now = time.time()
+    return [{"id": w, "alive": _fresh(e, now) and not e.get("leaving"), "pid": e.get("pid"),
+             "last_heartbeat_s": round(now - e.get("heartbeat", 0), 1), **e.get("stats", {})} for w, e in sorted(entries.items())]
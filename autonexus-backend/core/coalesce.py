@@ -0,0 +1,132 @@
+import asyncio
+import copy
+import hashlib
+import json
+import time
+from contextlib import aclosing
+from core import metrics, streaming
+
+COALESCE_WINDOW = 30  # Secondes pendant lesquelles un résultat est partagé avec les autres agents
+
+class FetchCoalescer:
+    """
+    Un seul fetch pour tous les agents qui surveillent la même source avec les mêmes réglages.
+    La clé inclut l'état du connecteur (curseur, dernier commit...) : les agents au même point
+    partagent le résultat puis reçoivent tous le nouvel état, donc ils convergent dès le premier
+    passage commun. Chaque agent applique ensuite son propre diff d'item_states.
+    """
+
+    def __init__(self, window: float = COALESCE_WINDOW):
+        self.window = window
+        self._entries = {}  # clé -> [expiration, tâche]
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(source: str, connector, settings: dict, token: str, state: dict):
+        token_hash = hashlib.sha256(token.encode("utf-8")).hexdigest()
+        state_hash = hashlib.sha1(json.dumps(state, sort_keys=True).encode("utf-8")).hexdigest()
+        return (source, token_hash, json.dumps(connector.fetch_key(settings)), state_hash)
+
+    def _purge(self, now: float):
+        for key in [k for k, (expires, task) in self._entries.items() if task.done() and expires <= now]:
+            del self._entries[key]
+
+    async def fetch(self, source: str, connector, settings: dict, token: str, state: dict, client):
+        now = time.monotonic()
+        self._purge(now)
+        key = self._key(source, connector, settings, token, state)
+        entry = self._entries.get(key)
+
+        if entry is None:
+            self.misses += 1
+            work_state = copy.deepcopy(state)
+
+            async def run():
+                try:
+                    with metrics.FETCH_SECONDS.time(source=source):
+                        items = await connector.fetch(settings, token, work_state, client)
+                except Exception:
+                    metrics.FETCH_ERRORS.inc(source=source)
+                    raise
+                metrics.ITEMS_FETCHED.inc(len(items or []), source=source)
+                return items, work_state
+
+            # Tâche indépendante : annuler l'agent qui l'a lancée ne prive pas les autres du résultat
+            entry = self._entries[key] = [float("inf"), asyncio.create_task(run())]
+            entry[1].add_done_callback(lambda task: self._on_done(key, task))
+        else:
+            self.hits += 1
+
+        items, new_state = await asyncio.shield(entry[1])
+        state.clear()
+        state.update(copy.deepcopy(new_state))
+        # Chaque agent reçoit ses propres dicts (il y écrit is_update), le contenu reste partagé
+        return None if items is None else [dict(item) for item in items]
+
+    async def stream(self, source: str, connector, settings: dict, token: str, state: dict, client):
+        """
+        Items au fil de l'eau. Le flux d'un connecteur en mode flux n'est pas mutualisé : le partager
+        obligerait à garder tous ses items pour les agents en retard, ce que le flux sert justement à éviter.
+        Le connecteur partage en revanche ses appels sous-jacents (SharedCalls : HEAD, compare, blobs...).
+        Les autres passent par fetch().
+        """
+        if not streaming.is_streaming(connector, settings):
+            for item in await self.fetch(source, connector, settings, token, state, client) or []:
+                yield item
+            return
+
+        started = time.perf_counter()
+        count = 0
+        try:
+            async with aclosing(connector.stream(settings, token, state, client)) as items:
+                async for item in items:
+                    count += 1
+                    yield item
+        except Exception:
+            metrics.FETCH_ERRORS.inc(source=source)
+            raise
+        finally:
+            # Inclut l'attente de l'aval quand la fenêtre de lecture d'avance est pleine
+            metrics.FETCH_SECONDS.observe(time.perf_counter() - started, source=source)
+            metrics.ITEMS_FETCHED.inc(count, source=source)
+
+    def _on_done(self, key, task):
+        entry = self._entries.get(key)
+        if entry is None or entry[1] is not task: return
+        if task.cancelled() or task.exception() is not None: del self._entries[key]
+        else: entry[0] = time.monotonic() + self.window
+
+class SharedCalls:
+    """
+    Appels identiques partagés entre agents : le premier lance la coroutine, les suivants attendent
+    son résultat au lieu de refaire l'appel. Avec window > 0, un résultat réussi reste servi `window`
+    secondes (à réserver aux réponses qui ne dépendent que de la clé, ex: requête conditionnelle
+    dont les validateurs font partie de la clé, ou ressource immuable).
+    """
+
+    def __init__(self, window: float = 0):
+        self.window = window
+        self._entries = {}  # clé -> [expiration, tâche]
+        self.hits = 0
+        self.misses = 0
+
+    async def run(self, key, factory):
+        now = time.monotonic()
+        for k in [k for k, (expires, task) in self._entries.items() if task.done() and expires <= now]:
+            del self._entries[k]
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            # Tâche indépendante : annuler l'agent qui l'a lancée ne prive pas les autres du résultat
+            entry = self._entries[key] = [float("inf"), asyncio.create_task(factory())]
+            entry[1].add_done_callback(lambda task: self._on_done(key, task))
+        else:
+            self.hits += 1
+        return await asyncio.shield(entry[1])
+
+    def _on_done(self, key, task):
+        entry = self._entries.get(key)
+        if entry is None or entry[1] is not task: return
+        if task.cancelled() or task.exception() is not None or not self.window: del self._entries[key]
+        else: entry[0] = time.monotonic() + self.window
@@ -0,0 +1,39 @@
+import hashlib
+
+# Requêtes conditionnelles : validateurs (ETag / Last-Modified) mémorisés dans l'état du connecteur.
+# Pour les API qui n'en renvoient pas (Discord, Twitter, Notion), on garde une empreinte du corps :
+# le réseau est payé, mais pas le parsing, la comparaison des items ni l'IA.
+
+def _slot(state: dict, key: str) -> dict:
+    return state.setdefault("validators", {}).setdefault(key, {})
+
+def with_validators(state: dict, key: str, headers: dict) -> dict:
+    """Ajoute If-None-Match / If-Modified-Since aux en-têtes si on a déjà vu cette ressource"""
+    if state is None: return headers
+    slot = state.get("validators", {}).get(key, {})
+    headers = dict(headers)
+    if slot.get("etag"): headers["If-None-Match"] = slot["etag"]
+    if slot.get("last_modified"): headers["If-Modified-Since"] = slot["last_modified"]
+    return headers
+
+def not_modified(state: dict, key: str, res) -> bool:
+    """True si la réponse est un 304 ou identique à la précédente ; mémorise les nouveaux validateurs sinon"""
+    if state is None: return False
+    if res.status_code == 304: return True
+    if res.status_code != 200: return False
+
+    slot = _slot(state, key)
+    etag, last_modified = res.headers.get("ETag"), res.headers.get("Last-Modified")
+    if etag or last_modified:
+        slot.pop("digest", None)
+        slot["etag"], slot["last_modified"] = etag, last_modified
+        return False
+
+    digest = hashlib.sha1(res.content).hexdigest()
+    if slot.get("digest") == digest: return True
+    slot["digest"] = digest
+    return False
+
+def forget(state: dict, key: str):
+    """Invalide les validateurs (ex: réponse à retraiter au prochain cycle)"""
+    if state is not None: state.get("validators", {}).pop(key, None)
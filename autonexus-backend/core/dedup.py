@@ -0,0 +1,82 @@
+import hashlib
+from array import array
+
+# Doublons avant l'IA : copies exactes (empreinte du texte normalisé) et quasi-copies (MinHash
+# sur des shingles de mots + LSH par bandes). Seul le premier item d'un groupe est analysé,
+# les suivants lui sont rattachés (leurs liens accompagnent ses notes).
+
+SHINGLE_WORDS = 5
+SIGNATURE_SIZE = 64
+BANDS = 16  # 16 bandes de 4 valeurs : deux textes à ~85 % de similarité se retrouvent presque toujours candidats
+NEAR_DUP_THRESHOLD = 0.85  # Part de la signature en commun pour confirmer un candidat
+MIN_NEAR_DUP_WORDS = 30  # En dessous, seuls les doublons exacts sont regroupés
+MAX_WORDS = 20_000  # Mots pris en compte par texte (signature d'un fichier géant)
+
+_MASK = (1 << 64) - 1
+_EMPTY = _MASK
+
+def _normalize(text: str) -> list:
+    return text.lower().split()
+
+def signature(words: list) -> array:
+    """
+    MinHash à une seule permutation : chaque shingle tombe dans l'une des SIGNATURE_SIZE cases selon
+    son hash, chaque case garde le minimum. Les cases vides reprennent la suivante (densification).
+    """
+    mins = [_EMPTY] * SIGNATURE_SIZE
+    words = words[:MAX_WORDS]
+    for i in range(max(1, len(words) - SHINGLE_WORDS + 1)):
+        h = hash(" ".join(words[i:i + SHINGLE_WORDS])) & _MASK
+        slot = h % SIGNATURE_SIZE
+        if h < mins[slot]: mins[slot] = h
+    filled = [i for i, v in enumerate(mins) if v != _EMPTY]
+    for i in range(SIGNATURE_SIZE):
+        if mins[i] != _EMPTY: continue
+        donor = next((j for j in filled if j > i), filled[0])
+        mins[i] = (mins[donor] + (i - donor) % SIGNATURE_SIZE) & _MASK
+    return array("Q", mins)
+
+def similarity(a: array, b: array) -> float:
+    return sum(x == y for x, y in zip(a, b)) / SIGNATURE_SIZE
+
+class Deduplicator:
+    """
+    Regroupe les textes d'un lot au fil de l'eau : add(id, texte) renvoie l'id du représentant
+    (id lui-même si le texte est nouveau). Les hash de shingles ne sont stables que dans le processus :
+    un Deduplicator ne vit que le temps d'un lot.
+    """
+
+    def __init__(self, threshold: float = NEAR_DUP_THRESHOLD):
+        self.threshold = threshold
+        self._exact = {}  # empreinte -> représentant
+        self._signatures = {}  # représentant -> signature
+        self._bands = {}  # (bande, valeurs) -> [représentants]
+        self.exact = 0
+        self.near = 0
+
+    def add(self, item_id, text: str):
+        words = _normalize(text)
+        digest = hashlib.sha1(" ".join(words).encode("utf-8")).digest()
+        rep = self._exact.get(digest)
+        if rep is not None:
+            self.exact += 1
+            return rep
+        self._exact[digest] = item_id
+        if len(words) < MIN_NEAR_DUP_WORDS: return item_id
+
+        sig = signature(words)
+        rows = SIGNATURE_SIZE // BANDS
+        keys = [(band, tuple(sig[band * rows:(band + 1) * rows])) for band in range(BANDS)]
+        seen = set()
+        for key in keys:
+            for candidate in self._bands.get(key, ()):
+                if candidate in seen: continue
+                seen.add(candidate)
+                if similarity(sig, self._signatures[candidate]) >= self.threshold:
+                    self._exact[digest] = candidate
+                    self.near += 1
+                    return candidate
+
+        self._signatures[item_id] = sig
+        for key in keys: self._bands.setdefault(key, []).append(item_id)
+        return item_id
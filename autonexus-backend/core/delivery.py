@@ -0,0 +1,147 @@
+import asyncio
+import itertools
+import random
+import time
+from collections import deque
+
+from core.http_pool import get_client
+from core import metrics
+
+NS = "webhook_queue"
+MAX_EMBEDS_PER_MESSAGE = 10  # Limites Discord
+MAX_CHARS_PER_MESSAGE = 6000
+MAX_ATTEMPTS = 8
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 300.0
+
+def pack_embeds(embeds: list) -> list:
+    """Regroupe les embeds en messages de 10 max / 6000 caractères max"""
+    messages, current, size = [], [], 0
+    for embed in embeds:
+        length = len(embed.get("title", "")) + len(embed.get("description", ""))
+        if current and (len(current) >= MAX_EMBEDS_PER_MESSAGE or size + length > MAX_CHARS_PER_MESSAGE):
+            messages.append(current)
+            current, size = [], 0
+        current.append(embed)
+        size += length
+    if current: messages.append(current)
+    return messages
+
+class WebhookDelivery:
+    """
+    File d'envoi des webhooks, persistée dans le Store (un message survit à un redémarrage).
+    - Une file et une tâche par URL : ordre conservé, aucun cycle d'agent n'attend l'envoi.
+    - Buckets de rate limit lus dans les réponses (X-RateLimit-Remaining / Reset-After, 429 retry_after).
+    - Retries avec backoff exponentiel sur erreurs réseau / 5xx ; abandon journalisé après MAX_ATTEMPTS.
+    """
+
+    def __init__(self, store, ns: str = NS):
+        self.store = store
+        self.ns = ns  # Un espace de noms par worker : chaque processus ne reprend que sa propre file
+        self._queues = {}  # url -> deque[(clé, message)]
+        self._workers = {}
+        self._paused_until = {}  # url -> horodatage (bucket vide ou 429)
+        self._global_pause = 0.0
+        self._seq = itertools.count()
+        self._started = False
+        self.sent = 0
+        self.failed = 0
+
+    def load(self, pending: dict):
+        """Reprend les messages non envoyés avant l'arrêt (clés triées = ordre d'arrivée)"""
+        for key in sorted(pending):
+            message = pending[key]
+            self._queues.setdefault(message["url"], deque()).append((key, message))
+        if pending: print(f"[DELIVERY] {len(pending)} pending webhook messages restored.")
+
+    def start(self):
+        self._started = True
+        for url in self._queues: self._ensure_worker(url)
+
+    async def stop(self):
+        self._started = False
+        workers = list(self._workers.values())
+        for task in workers: task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        self._workers.clear()
+
+    def pending(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def enqueue(self, url: str, username: str, embeds: list):
+        for group in pack_embeds(embeds):
+            key = f"{time.time_ns():020d}-{next(self._seq):06d}"
+            message = {"url": url, "payload": {"username": username, "embeds": group}, "attempts": 0}
+            self.store.put(self.ns, key, message)
+            self._queues.setdefault(url, deque()).append((key, message))
+        self._ensure_worker(url)
+
+    def _ensure_worker(self, url: str):
+        if not self._started: return
+        task = self._workers.get(url)
+        if task is None or task.done():
+            self._workers[url] = asyncio.create_task(self._worker(url))
+
+    async def _worker(self, url: str):
+        queue = self._queues[url]
+        while queue:
+            wait = max(self._paused_until.get(url, 0), self._global_pause) - time.time()
+            if wait > 0: await asyncio.sleep(wait)
+
+            key, message = queue[0]
+            done, retry_in, limited = await self._post(url, message)
+            if done:
+                queue.popleft()
+                self.store.delete(self.ns, key)
+                continue
+            if limited:
+                # 429 : le message n'a pas échoué, seule l'attente retry_after s'applique
+                self._paused_until[url] = max(self._paused_until.get(url, 0), time.time() + retry_in)
+                continue
+
+            message["attempts"] += 1
+            if message["attempts"] >= MAX_ATTEMPTS:
+                print(f"[DELIVERY ERROR] Giving up on webhook message after {MAX_ATTEMPTS} attempts.")
+                self.failed += 1
+                queue.popleft()
+                self.store.delete(self.ns, key)
+                continue
+            self.store.put(self.ns, key, message)
+            self._paused_until[url] = time.time() + retry_in
+        self._workers.pop(url, None)
+        if not queue: self._queues.pop(url, None)
+
+    def _backoff(self, attempts: int) -> float:
+        return min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempts) * (0.5 + random.random())
+
+    async def _post(self, url: str, message: dict):
+        """Renvoie (terminé, délai avant nouvel essai, rate limité) ; un 429 ne compte pas comme un essai"""
+        try:
+            with metrics.WEBHOOK_SECONDS.time():
+                res = await get_client().post(url, json=message["payload"])
+        except Exception as e:
+            print(f"[DELIVERY] Network error: {e}")
+            metrics.WEBHOOK_POSTS.inc(outcome="network_error")
+            return False, self._backoff(message["attempts"]), False
+        metrics.WEBHOOK_POSTS.inc(outcome=res.status_code)
+
+        headers = res.headers
+        if headers.get("X-RateLimit-Remaining") == "0":
+            try: self._paused_until[url] = time.time() + float(headers.get("X-RateLimit-Reset-After", 1))
+            except ValueError: pass
+
+        if res.status_code == 429:
+            try: retry_after = float(res.json().get("retry_after", 1))
+            except Exception: retry_after = float(headers.get("Retry-After", 1) or 1)
+            if headers.get("X-RateLimit-Global"): self._global_pause = time.time() + retry_after
+            print(f"[DELIVERY] 429 on webhook, retry in {retry_after:.1f}s")
+            return False, retry_after, True
+        if res.status_code >= 500:
+            return False, self._backoff(message["attempts"]), False
+        if res.status_code >= 400:
+            print(f"[DELIVERY ERROR] Webhook rejected message: {res.status_code} - {res.text[:200]}")
+            self.failed += 1
+            return True, 0, False
+
+        self.sent += 1
+        return True, 0, False
@@ -0,0 +1,90 @@
+import asyncio
+import httpx
+from core import metrics
+
+# HTTP/2 uniquement si le paquet 'h2' est installé (pip install httpx[http2])
+try:
+    import h2  # noqa: F401
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+MAX_CONNECTIONS = 200
+MAX_KEEPALIVE = 50
+KEEPALIVE_EXPIRY = 60
+MAX_REQUESTS_PER_HOST = 20
+TIMEOUT = httpx.Timeout(30.0, connect=10.0)
+
+_client = None
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    """Libère le créneau de l'hôte quand le corps de la réponse est fermé"""
+
+    def __init__(self, stream, semaphore, labels):
+        self._stream = stream
+        self._semaphore = semaphore
+        self._labels = labels
+        self._released = False
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            metrics.HTTP_BYTES.inc(len(chunk), **self._labels)
+            yield chunk
+
+    async def aclose(self):
+        try: await self._stream.aclose()
+        finally:
+            if not self._released:
+                self._released = True
+                self._semaphore.release()
+
+class _PerHostLimitTransport(httpx.AsyncBaseTransport):
+    """Borne le nombre de requêtes en vol par hôte (httpx ne limite que le pool global)"""
+
+    def __init__(self, transport, per_host: int):
+        self._transport = transport
+        self._per_host = per_host
+        self._semaphores = {}
+
+    async def handle_async_request(self, request):
+        host = request.url.netloc.decode("ascii")  # hôte:port (les serveurs locaux du bench ne partagent pas de créneaux)
+        semaphore = self._semaphores.get(host)
+        if semaphore is None:
+            semaphore = self._semaphores[host] = asyncio.Semaphore(self._per_host)
+        await semaphore.acquire()
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            semaphore.release()
+            metrics.HTTP_REQUESTS.inc(host=host, status="error")
+            raise
+        metrics.HTTP_REQUESTS.inc(host=host, status=response.status_code)
+        if response.is_closed:  # Corps déjà lu par le transport
+            semaphore.release()
+            metrics.HTTP_BYTES.inc(len(response.content), host=host, **metrics.cycle_labels("source"))
+            return response
+        # Labels lus à l'envoi : la source est celle du cycle qui a lancé la requête
+        response.stream = _ReleasingStream(response.stream, semaphore, {"host": host, **metrics.cycle_labels("source")})
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+def open_client() -> httpx.AsyncClient:
+    """Crée le client partagé (keep-alive, HTTP/2, limites par hôte). Appelé dans le lifespan FastAPI."""
+    global _client
+    if _client is None or _client.is_closed:
+        limits = httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_KEEPALIVE, keepalive_expiry=KEEPALIVE_EXPIRY)
+        transport = httpx.AsyncHTTPTransport(http2=HTTP2, limits=limits)
+        _client = httpx.AsyncClient(transport=_PerHostLimitTransport(transport, MAX_REQUESTS_PER_HOST), timeout=TIMEOUT)
+    return _client
+
+def get_client() -> httpx.AsyncClient:
+    """Client partagé par tous les connecteurs et l'envoi des webhooks"""
+    return _client if _client is not None and not _client.is_closed else open_client()
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,112 @@
+import hashlib
+
+# Une empreinte non revue pendant TTL_CYCLES cycles (avec résultats) est oubliée
+TTL_CYCLES = 1000
+MAX_ITEMS_PER_WORKFLOW = 50_000
+EVICT_EVERY = 20  # Cycles entre deux passes d'éviction
+# "last_seen" n'est réécrit sur disque que s'il a avancé d'au moins ce nombre de cycles
+SEEN_WRITE_GRANULARITY = max(1, TTL_CYCLES // 10)
+
+NS_PREFIX = "items:"
+NS_CYCLES = "item_cycles"
+LEGACY_NS = "item_states"
+
+def _h(value: str) -> str:
+    """Représentation compacte (16 caractères) d'une clé ou d'une empreinte"""
+    return hashlib.blake2b(str(value).encode("utf-8"), digest_size=8).hexdigest()
+
+class ItemStates:
+    """
+    Empreintes des items déjà traités, indexées par agent :
+    {w_id: {hash(unique_key): [hash(fingerprint), dernier cycle où l'item a été vu]}}
+    - Suppression d'un agent en O(1) (un espace de noms par agent dans le store).
+    - Éviction des items non revus depuis TTL_CYCLES cycles et borne de taille par agent.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._items = {}
+        self._cycles = {}
+
+    def load(self, data: dict):
+        """Reconstruit l'index depuis Store.load() (et migre l'ancien format plat 'w_id:clé')"""
+        for ns, entries in data.items():
+            if ns.startswith(NS_PREFIX): self._items[ns[len(NS_PREFIX):]] = entries
+        self._cycles = dict(data.get(NS_CYCLES, {}))
+        legacy = data.get(LEGACY_NS)
+        if legacy:
+            self.import_flat(legacy)
+            self.store.drop(LEGACY_NS)
+
+    def load_workflow(self, w_id: str, data: dict):
+        """Reprend l'historique d'un seul agent (worker qui en devient propriétaire), depuis Store.load([...])"""
+        self._items[w_id] = dict(data.get(NS_PREFIX + w_id, {}))
+        cycles = data.get(NS_CYCLES, {})
+        if w_id in cycles: self._cycles[w_id] = cycles[w_id]
+        else: self._cycles.pop(w_id, None)
+
+    def namespaces(self, w_id: str) -> list:
+        return [NS_PREFIX + w_id, NS_CYCLES]
+
+    def import_flat(self, flat: dict):
+        for full_key, fingerprint in flat.items():
+            w_id, _, key = full_key.partition(":")
+            self._set(w_id, _h(key), [_h(fingerprint), self._cycles.get(w_id, 0)])
+        print(f"[SYSTEM] {len(flat)} item states migrated.")
+
+    def _set(self, w_id: str, hkey: str, entry: list):
+        self._items.setdefault(w_id, {})[hkey] = entry
+        self.store.put(NS_PREFIX + w_id, hkey, entry)
+
+    def begin_cycle(self, w_id: str):
+        """À appeler quand le connecteur a renvoyé des items (les cycles à vide ne vieillissent rien)"""
+        self._cycles[w_id] = self._cycles.get(w_id, 0) + 1
+        self.store.put(NS_CYCLES, w_id, self._cycles[w_id])
+
+    def observe(self, w_id: str, unique_key: str, fingerprint: str):
+        """
+        Enregistre l'item vu à ce cycle.
+        Renvoie None s'il est inchangé, sinon True (mise à jour) / False (nouveau).
+        """
+        cycle = self._cycles.get(w_id, 0)
+        hkey, hfp = _h(unique_key), _h(fingerprint)
+        entry = self._items.get(w_id, {}).get(hkey)
+
+        if entry is not None and entry[0] == hfp:
+            if cycle - entry[1] >= SEEN_WRITE_GRANULARITY: self._set(w_id, hkey, [hfp, cycle])
+            else: entry[1] = cycle
+            return None
+
+        self._set(w_id, hkey, [hfp, cycle])
+        return entry is not None
+
+    def end_cycle(self, w_id: str):
+        items = self._items.get(w_id)
+        if not items: return
+        cycle = self._cycles.get(w_id, 0)
+        if cycle % EVICT_EVERY and len(items) <= MAX_ITEMS_PER_WORKFLOW: return
+
+        expired = [k for k, (_, seen) in items.items() if cycle - seen > TTL_CYCLES]
+        overflow = len(items) - len(expired) - MAX_ITEMS_PER_WORKFLOW
+        if overflow > 0:
+            alive = sorted((seen, k) for k, (_, seen) in items.items() if cycle - seen <= TTL_CYCLES)
+            expired += [k for _, k in alive[:overflow]]
+        for k in expired:
+            del items[k]
+            self.store.delete(NS_PREFIX + w_id, k)
+        if expired: print(f"[SYSTEM] Agent {w_id}: {len(expired)} item states evicted.")
+
+    def drop(self, w_id: str):
+        """Oublie tout l'historique d'un agent (reset ou suppression)"""
+        self._items.pop(w_id, None)
+        self._cycles.pop(w_id, None)
+        self.store.drop(NS_PREFIX + w_id)
+        self.store.delete(NS_CYCLES, w_id)
+
+    def forget(self, w_id: str):
+        """Libère la mémoire d'un agent passé à un autre worker (le store n'est pas touché)"""
+        self._items.pop(w_id, None)
+        self._cycles.pop(w_id, None)
+
+    def count(self) -> int:
+        return sum(len(items) for items in self._items.values())
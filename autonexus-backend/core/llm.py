@@ -0,0 +1,125 @@
+import asyncio
+import contextvars
+import os
+import random
+import re
+import time
+from core import metrics
+from openai import AsyncOpenAI, RateLimitError, APIConnectionError, APITimeoutError, InternalServerError
+
+MODEL = "gpt-4o"
+MAX_CONCURRENT_CALLS = int(os.environ.get("AUTONEXUS_LLM_CONCURRENCY", 4))
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+
+_clients = {}
+_limiters = {}
+# Tokens consommés, attribués à l'appelant (ex: le cycle d'un agent) ; hérité par les tâches qu'il lance
+usage = contextvars.ContextVar("llm_usage", default=None)
+
+def _parse_duration(value: str) -> float:
+    """Durées OpenAI ('1s', '6m0s', '20ms', '1.5s') -> secondes"""
+    if not value: return 0.0
+    total = 0.0
+    for amount, unit in re.findall(r"([\d.]+)(ms|h|m|s)", value):
+        total += float(amount) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unit]
+    return total
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+class RateLimiter:
+    """
+    Seau de jetons piloté par les en-têtes x-ratelimit-* renvoyés par OpenAI :
+    on ne lance un appel que s'il reste des requêtes et des tokens dans la fenêtre courante.
+    Un sémaphore borne en plus le nombre d'appels simultanés par clé.
+    """
+
+    def __init__(self, concurrency: int):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.requests_remaining = None
+        self.tokens_remaining = None
+        self.requests_reset_at = 0.0
+        self.tokens_reset_at = 0.0
+        self.paused_until = 0.0
+
+    async def acquire(self, tokens: int):
+        while True:
+            now = time.time()
+            if now >= self.requests_reset_at: self.requests_remaining = None
+            if now >= self.tokens_reset_at: self.tokens_remaining = None
+
+            wait = self.paused_until - now
+            if wait <= 0 and self.requests_remaining is not None and self.requests_remaining <= 0:
+                wait = self.requests_reset_at - now
+            if wait <= 0 and self.tokens_remaining is not None and self.tokens_remaining < tokens:
+                wait = self.tokens_reset_at - now
+            if wait <= 0:
+                # Réserve la capacité de cet appel avant la réponse (les appels parallèles la voient)
+                if self.requests_remaining is not None: self.requests_remaining -= 1
+                if self.tokens_remaining is not None: self.tokens_remaining -= tokens
+                return
+            await asyncio.sleep(min(wait, BACKOFF_MAX))
+
+    def update(self, headers):
+        now = time.time()
+        try:
+            if "x-ratelimit-remaining-requests" in headers:
+                self.requests_remaining = int(headers["x-ratelimit-remaining-requests"])
+                self.requests_reset_at = now + _parse_duration(headers.get("x-ratelimit-reset-requests"))
+            if "x-ratelimit-remaining-tokens" in headers:
+                self.tokens_remaining = int(headers["x-ratelimit-remaining-tokens"])
+                self.tokens_reset_at = now + _parse_duration(headers.get("x-ratelimit-reset-tokens"))
+        except ValueError: pass
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.time() + seconds)
+
+def _get(openai_key: str):
+    if openai_key not in _clients:
+        # Les retries sont gérés ici (backoff + limiter partagé), pas par le SDK
+        _clients[openai_key] = AsyncOpenAI(api_key=openai_key, max_retries=0)
+        _limiters[openai_key] = RateLimiter(MAX_CONCURRENT_CALLS)
+    return _clients[openai_key], _limiters[openai_key]
+
+def _retry_delay(error, attempt: int) -> float:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    retry_after = headers.get("retry-after-ms")
+    if retry_after:
+        try: return float(retry_after) / 1000
+        except ValueError: pass
+    retry_after = headers.get("retry-after")
+    if retry_after:
+        try: return float(retry_after)
+        except ValueError: pass
+    return min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt) * (0.5 + random.random())
+
+async def chat(openai_key: str, messages: list, **kwargs) -> str:
+    """Appel chat.completions asynchrone, throttlé par clé, avec retry/backoff sur 429 et erreurs transitoires"""
+    client, limiter = _get(openai_key)
+    model = kwargs.pop("model", MODEL)
+    tokens = sum(estimate_tokens(m.get("content", "")) for m in messages)
+
+    for attempt in range(MAX_RETRIES + 1):
+        await limiter.acquire(tokens)
+        try:
+            async with limiter.semaphore:
+                raw = await client.chat.completions.with_raw_response.create(model=model, messages=messages, **kwargs)
+            limiter.update(raw.headers)
+            completion = raw.parse()
+            if completion.usage:
+                labels = metrics.cycle_labels("agent", "source")
+                metrics.LLM_TOKENS.inc(completion.usage.prompt_tokens, model=model, kind="prompt", **labels)
+                metrics.LLM_TOKENS.inc(completion.usage.completion_tokens, model=model, kind="completion", **labels)
+                sink = usage.get()
+                if sink is not None: sink[0] += completion.usage.total_tokens
+            return completion.choices[0].message.content
+        except (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError) as e:
+            if attempt == MAX_RETRIES: raise
+            response = getattr(e, "response", None)
+            if response is not None: limiter.update(response.headers)
+            delay = _retry_delay(e, attempt)
+            if isinstance(e, RateLimitError): limiter.pause(delay)
+            print(f"[AI] {type(e).__name__}, retry {attempt+1}/{MAX_RETRIES} in {delay:.1f}s")
+            await asyncio.sleep(delay)
@@ -0,0 +1,200 @@
+import contextvars
+import os
+import time
+import threading
+
+# Métriques du processus au format texte Prometheus (sans dépendance : /metrics les rend à la demande).
+# Les séries sont identifiées par leurs labels ; tout est en mémoire et repart de zéro au redémarrage.
+
+try:
+    import psutil
+    _process = psutil.Process()
+    _process.cpu_percent(None)  # Amorce : la première mesure renvoie toujours 0
+except ImportError:
+    psutil = None
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_metrics = []
+_lock = threading.Lock()
+
+# Labels du cycle d'agent en cours ({"agent", "source"}), posés par run_agent_cycle : les tâches qu'il
+# crée en héritent, et les métriques émises loin du cycle (tokens LLM, octets HTTP) lui sont attribuées
+context = contextvars.ContextVar("metrics_context", default={})
+
+def cycle_labels(*names) -> dict:
+    """Labels du cycle en cours ("" hors cycle : même série qu'un label absent pour Prometheus)"""
+    labels = context.get()
+    return {name: labels.get(name, "") for name in names}
+
+def _key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(key: tuple) -> str:
+    if not key: return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in key) + "}"
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str):
+        self.name, self.help = name, help
+        self.values = {}
+        _metrics.append(self)
+
+    def inc(self, amount: float = 1, **labels):
+        key = _key(labels)
+        with _lock: self.values[key] = self.values.get(key, 0) + amount
+
+    def total(self, **labels) -> float:
+        """Somme des séries dont les labels contiennent ceux donnés"""
+        wanted = set(_key(labels))
+        return sum(v for k, v in self.values.items() if wanted <= set(k))
+
+    def remove(self, **labels):
+        """Supprime les séries d'un agent supprimé (évite la croissance sans fin du nombre de séries)"""
+        wanted = set(_key(labels))
+        with _lock:
+            for key in [k for k in self.values if wanted <= set(k)]: del self.values[key]
+
+    def samples(self):
+        for key, value in self.values.items(): yield self.name, key, value
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with _lock: self.values[_key(labels)] = value
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: tuple = LATENCY_BUCKETS):
+        self.name, self.help = name, help
+        self.buckets = tuple(sorted(buckets))
+        self.values = {}  # labels -> [compteurs par seuil..., somme, nombre]
+        _metrics.append(self)
+
+    def observe(self, value: float, **labels):
+        key = _key(labels)
+        with _lock:
+            series = self.values.get(key)
+            if series is None: series = self.values[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound: series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+    remove = Counter.remove
+
+    def quantile(self, q: float, **labels):
+        """Quantile approché (borne supérieure du seuil atteint) sur les séries correspondantes"""
+        wanted = set(_key(labels))
+        merged = [0] * (len(self.buckets) + 2)
+        for key, series in self.values.items():
+            if wanted <= set(key): merged = [a + b for a, b in zip(merged, series)]
+        if not merged[-1]: return None
+        for i, bound in enumerate(self.buckets):
+            if merged[i] >= q * merged[-1]: return bound
+        return float("inf")
+
+    def samples(self):
+        for key, series in self.values.items():
+            for i, bound in enumerate(self.buckets):
+                yield f"{self.name}_bucket", key + (("le", repr(float(bound))),), series[i]
+            yield f"{self.name}_bucket", key + (("le", "+Inf"),), series[-1]
+            yield f"{self.name}_sum", key, series[-2]
+            yield f"{self.name}_count", key, series[-1]
+
+class _Timer:
+    """Chronomètre (with ... / async with ...) ; les labels peuvent être complétés avant la sortie"""
+
+    def __init__(self, histogram: Histogram, labels: dict):
+        self.histogram, self.labels = histogram, labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+    async def __aenter__(self): return self.__enter__()
+    async def __aexit__(self, *exc): return self.__exit__(*exc)
+
+def render() -> str:
+    lines = []
+    with _lock:
+        for metric in _metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, key, value in metric.samples():
+                lines.append(f"{name}{_format_labels(key)} {value}")
+    return "\n".join(lines) + "\n"
+
+def forget_agent(w_id: str):
+    for metric in _metrics: metric.remove(agent=w_id)
+
+# --- PROCESSUS ---
+_last_cpu = (time.monotonic(), sum(os.times()[:2]))
+
+def process_stats() -> dict:
+    """CPU (% d'un cœur depuis l'appel précédent) et mémoire du processus ; psutil si installé, sinon os/resource"""
+    global _last_cpu
+    if psutil:
+        with _process.oneshot():
+            mem = _process.memory_info()
+            return {"cpu_percent": _process.cpu_percent(None), "rss_bytes": mem.rss, "threads": _process.num_threads()}
+
+    now, cpu = time.monotonic(), sum(os.times()[:2])
+    last_now, last_cpu = _last_cpu
+    _last_cpu = (now, cpu)
+    cpu_percent = 100 * (cpu - last_cpu) / (now - last_now) if now > last_now else 0.0
+    rss = None
+    try:
+        # /proc donne la mémoire actuelle ; ru_maxrss n'est que le pic
+        with open("/proc/self/statm") as f: rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        if resource:
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            rss = peak if os.uname().sysname == "Darwin" else peak * 1024
+    return {"cpu_percent": round(cpu_percent, 1), "rss_bytes": rss, "threads": threading.active_count()}
+
+# --- MÉTRIQUES DE L'APPLICATION ---
+CYCLE_SECONDS = Histogram("autonexus_cycle_seconds", "Duration of an agent cycle")
+CYCLE_ERRORS = Counter("autonexus_cycle_errors_total", "Agent cycles that raised")
+SCHEDULER_LAG = Histogram("autonexus_scheduler_lag_seconds", "Delay between an agent's due time and its cycle start")
+# Par agent : dernières valeurs seulement (un histogramme par agent multiplierait les séries)
+AGENT_CYCLE_SECONDS = Gauge("autonexus_agent_last_cycle_seconds", "Duration of the agent's last cycle")
+AGENT_LAG = Gauge("autonexus_agent_last_lag_seconds", "Scheduler lag of the agent's last cycle")
+FETCH_SECONDS = Histogram("autonexus_fetch_seconds", "Duration of a connector fetch (shared fetches counted once)")
+FETCH_ERRORS = Counter("autonexus_fetch_errors_total", "Connector fetches that raised")
+ITEMS_FETCHED = Counter("autonexus_items_fetched_total", "Items returned by connectors")
+ITEMS_DELIVERED = Counter("autonexus_items_delivered_total", "New or updated items passed on to the AI / notifications")
+DEFERRED_ITEMS = Gauge("autonexus_deferred_items", "Items waiting for a later cycle because of the token budget")
+ITEMS_DEDUPLICATED = Counter("autonexus_items_deduplicated_total", "Items merged into an identical or near-identical one before the AI")
+HTTP_REQUESTS = Counter("autonexus_http_requests_total", "Outgoing HTTP requests")
+HTTP_BYTES = Counter("autonexus_http_response_bytes_total", "Response body bytes received, per host and agent source")
+AI_SECONDS = Histogram("autonexus_ai_call_seconds", "Duration of one LLM call per pipeline stage")
+AI_ERRORS = Counter("autonexus_ai_errors_total", "LLM calls that failed after retries")
+LLM_TOKENS = Counter("autonexus_llm_tokens_total", "Tokens reported by the LLM API, per agent and source")
+WEBHOOK_SECONDS = Histogram("autonexus_webhook_post_seconds", "Duration of a webhook POST")
+WEBHOOK_POSTS = Counter("autonexus_webhook_posts_total", "Webhook POSTs by outcome")
+EMAIL_SECONDS = Histogram("autonexus_email_send_seconds", "Duration of an SMTP send")
+EMAIL_SENDS = Counter("autonexus_email_sends_total", "Emails by outcome")
+PROCESS_CPU = Gauge("autonexus_process_cpu_percent", "Process CPU usage (% of one core) since the previous scrape")
+PROCESS_RSS = Gauge("autonexus_process_resident_memory_bytes", "Process resident memory")
+SCHEDULED_AGENTS = Gauge("autonexus_scheduled_agents", "Agents waiting for their next cycle")
+WEBHOOKS_PENDING = Gauge("autonexus_webhooks_pending", "Webhook messages waiting for delivery")
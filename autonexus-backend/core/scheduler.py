@@ -0,0 +1,138 @@
+import asyncio
+import heapq
+import itertools
+import random
+from core import metrics
+
+JITTER_RATIO = 0.1  # ±10% sur chaque intervalle pour éviter que les agents se synchronisent
+ERROR_RETRY_DELAY = 60
+
+class Scheduler:
+    """
+    Planificateur unique pour tous les agents :
+    - un tas min (échéance, w_id) parcouru par une seule tâche de dispatch,
+    - au plus un cycle en cours par agent (une replanification pendant un cycle est différée),
+    - un plafond de cycles simultanés par source (github, notion...),
+    - pause (unschedule) : le cycle en cours va jusqu'au bout mais n'est pas relancé ; ses items sont déjà
+      marqués vus dans item_states, l'interrompre les perdrait sans qu'ils soient jamais analysés,
+    - annulation immédiate (cancel) réservée à la suppression et au changement de réglages (historique remis à zéro).
+
+    run_cycle(w_id) renvoie le délai avant le prochain passage, ou None pour ne plus replanifier.
+    """
+
+    def __init__(self, run_cycle, source_of, source_limits: dict, default_limit: int = 10):
+        self.run_cycle = run_cycle
+        self.source_of = source_of
+        self.source_limits = source_limits
+        self.default_limit = default_limit
+        self.lags = {}  # w_id -> retard (s) du dernier démarrage par rapport à l'échéance
+        self._heap = []
+        self._due = {}  # w_id -> échéance en vigueur (les entrées du tas qui ne correspondent plus sont ignorées)
+        self._running = {}
+        self._stopping = set()  # Agents retirés pendant leur cycle : pas de relance à la fin
+        self._semaphores = {}
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._dispatcher = None
+
+    def start(self):
+        if self._dispatcher is None:
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def stop(self, grace: float = 0):
+        """Arrête le dispatch ; les cycles en cours ont `grace` secondes pour se terminer avant d'être annulés"""
+        if self._dispatcher:
+            self._dispatcher.cancel()
+            await asyncio.gather(self._dispatcher, return_exceptions=True)
+            self._dispatcher = None
+        self._stopping.update(self._running)
+        tasks = list(self._running.values())
+        if tasks and grace > 0: await asyncio.wait(tasks, timeout=grace)
+        for task in tasks: task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def schedule(self, w_id: str, delay: float = 0, jitter: bool = True):
+        if jitter and delay > 0: delay *= 1 + random.uniform(-JITTER_RATIO, JITTER_RATIO)
+        due = asyncio.get_running_loop().time() + max(0, delay)
+        self._due[w_id] = due
+        self._stopping.discard(w_id)
+        heapq.heappush(self._heap, (due, next(self._seq), w_id))
+        self._wakeup.set()
+
+    def unschedule(self, w_id: str):
+        """Retire l'agent du planning ; un cycle en cours se termine normalement, sans relance"""
+        self._due.pop(w_id, None)
+        if w_id in self._running: self._stopping.add(w_id)
+
+    def cancel(self, w_id: str):
+        """Retire l'agent du planning et interrompt son cycle en cours"""
+        self.unschedule(w_id)
+        task = self._running.get(w_id)
+        if task: task.cancel()
+
+    async def wait_idle(self, w_id: str):
+        """Attend la fin du cycle en cours de l'agent (s'il y en a un)"""
+        task = self._running.get(w_id)
+        if task: await asyncio.wait([task])
+
+    def is_running(self, w_id: str) -> bool:
+        return w_id in self._running
+
+    def pending(self) -> int:
+        return len(self._due)
+
+    def running(self) -> int:
+        return len(self._running)
+
+    def _semaphore(self, source: str):
+        if source not in self._semaphores:
+            self._semaphores[source] = asyncio.Semaphore(self.source_limits.get(source, self.default_limit))
+        return self._semaphores[source]
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+            due, _, w_id = self._heap[0]
+            wait = due - loop.time()
+            if wait > 0:
+                try: await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+                except asyncio.TimeoutError: pass
+                continue
+
+            heapq.heappop(self._heap)
+            if self._due.get(w_id) != due: continue  # Entrée périmée (replanifiée ou annulée)
+            if w_id in self._running: continue  # Relancé à la fin du cycle en cours
+            del self._due[w_id]
+            self._running[w_id] = asyncio.create_task(self._run(w_id, due))
+
+    async def _run(self, w_id: str, due: float):
+        loop = asyncio.get_running_loop()
+        delay = None
+        try:
+            source = self.source_of(w_id)
+            async with self._semaphore(source):
+                self.lags[w_id] = loop.time() - due
+                metrics.SCHEDULER_LAG.observe(self.lags[w_id], source=source)
+                metrics.AGENT_LAG.set(self.lags[w_id], agent=w_id)
+                delay = await self.run_cycle(w_id)
+        except asyncio.CancelledError:
+            delay = None
+        except Exception as e:
+            print(f"[SCHEDULER ERROR] {w_id}: {e}")
+            delay = ERROR_RETRY_DELAY
+        self._running.pop(w_id, None)
+        stopping = w_id in self._stopping
+        self._stopping.discard(w_id)
+
+        if w_id in self._due:
+            # Replanifié pendant le cycle : on garde l'échéance demandée
+            heapq.heappush(self._heap, (self._due[w_id], next(self._seq), w_id))
+            self._wakeup.set()
+        elif delay is not None and not stopping:
+            self.schedule(w_id, delay)
+        else:
+            self.lags.pop(w_id, None)
@@ -0,0 +1,116 @@
+import json
+import queue
+import sqlite3
+import threading
+
+BUSY_TIMEOUT = 30  # Secondes d'attente du verrou d'écriture (plusieurs processus partagent la base)
+BATCH_WINDOW = 0.05  # Secondes d'attente pour regrouper les écritures dans une même transaction
+MAX_BATCH = 1000
+
+_STOP = object()
+
+class Store:
+    """
+    Stockage clé/valeur SQLite (mode WAL), rangé par espace de noms.
+    - Lectures : chargement complet au démarrage (load), ou quelques clés à la demande (get).
+    - Écritures : upserts/suppressions par clé, mis en file puis appliqués par un thread dédié
+      en transactions groupées -> la boucle asyncio ne touche jamais le disque.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS kv (ns TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, PRIMARY KEY (ns, key))")
+        return conn
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._writer, name="store-writer", daemon=True)
+            self._thread.start()
+
+    def load(self, namespaces: list = None) -> dict:
+        """{namespace: {clé: valeur}}, dans l'ordre d'insertion (tout, ou seulement les espaces de noms donnés)"""
+        conn = self._connect()
+        try:
+            data = {}
+            if namespaces is None:
+                rows = conn.execute("SELECT ns, key, value FROM kv ORDER BY rowid")
+            else:
+                rows = []
+                namespaces = list(namespaces)
+                for i in range(0, len(namespaces), 500):  # Limite de paramètres SQLite
+                    chunk = namespaces[i:i+500]
+                    rows.extend(conn.execute(f"SELECT ns, key, value FROM kv WHERE ns IN ({','.join('?' * len(chunk))}) ORDER BY rowid", chunk))
+            for ns, key, value in rows:
+                data.setdefault(ns, {})[key] = json.loads(value)
+            return data
+        finally:
+            conn.close()
+
+    def get(self, ns: str, keys: list) -> dict:
+        """{clé: valeur} pour quelques clés d'un espace de noms (les écritures encore en file ne sont pas vues)"""
+        conn = self._connect()
+        try:
+            data = {}
+            keys = list(keys)
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i+500]
+                for key, value in conn.execute(f"SELECT key, value FROM kv WHERE ns = ? AND key IN ({','.join('?' * len(chunk))})", [ns] + chunk):
+                    data[key] = json.loads(value)
+            return data
+        finally:
+            conn.close()
+
+    # La valeur est sérialisée tout de suite : l'appelant peut continuer à la modifier
+    def put(self, ns: str, key: str, value):
+        self._queue.put(("put", ns, key, json.dumps(value, ensure_ascii=False)))
+
+    def delete(self, ns: str, key: str):
+        self._queue.put(("delete", ns, key, None))
+
+    def drop(self, ns: str):
+        """Supprime tout un espace de noms"""
+        self._queue.put(("drop", ns, None, None))
+
+    def flush(self):
+        """Attend que toutes les écritures en file soient sur disque (bloquant)"""
+        self._queue.join()
+
+    def close(self):
+        if self._thread is None: return
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+
+    def _apply(self, conn, ops):
+        with conn:
+            for op, ns, key, value in ops:
+                if op == "put":
+                    conn.execute("INSERT INTO kv (ns, key, value) VALUES (?, ?, ?) ON CONFLICT(ns, key) DO UPDATE SET value = excluded.value", (ns, key, value))
+                elif op == "delete":
+                    conn.execute("DELETE FROM kv WHERE ns = ? AND key = ?", (ns, key))
+                elif op == "drop":
+                    conn.execute("DELETE FROM kv WHERE ns = ?", (ns,))
+
+    def _writer(self):
+        conn = self._connect()
+        stop = False
+        while not stop:
+            ops = [self._queue.get()]
+            # Regroupe les écritures arrivées pendant la fenêtre dans une seule transaction
+            try:
+                while len(ops) < MAX_BATCH:
+                    ops.append(self._queue.get(timeout=BATCH_WINDOW))
+            except queue.Empty: pass
+
+            stop = any(op is _STOP for op in ops)
+            try: self._apply(conn, [op for op in ops if op is not _STOP])
+            except Exception as e: print(f"[STORE ERROR] {e}")
+            for _ in ops: self._queue.task_done()
+        conn.close()
@@ -0,0 +1,47 @@
+import asyncio
+from contextlib import aclosing
+
+# Protocole "flux" des connecteurs : en plus de fetch() (liste complète), un connecteur peut exposer
+#   streaming(settings) -> bool          ce mode est-il diffusé ?
+#   stream(settings, token, state, client)  générateur asynchrone d'items (mêmes clés que fetch)
+# L'état du connecteur n'est mis à jour qu'une fois le flux lu jusqu'au bout.
+
+STREAM_WINDOW = 32  # Items lus d'avance au maximum (entre le connecteur et le traitement)
+
+_END = object()
+
+class _Failed:
+    def __init__(self, error: Exception):
+        self.error = error
+
+def is_streaming(connector, settings: dict) -> bool:
+    streaming = getattr(connector, "streaming", None)
+    return bool(streaming and streaming(settings))
+
+async def prefetch(items, window: int = STREAM_WINDOW):
+    """
+    Lit un flux asynchrone en tâche de fond avec au plus `window` items d'avance sur le consommateur :
+    le réseau avance pendant que l'aval traite, et s'arrête (contre-pression) quand l'aval ne suit plus.
+    """
+    queue = asyncio.Queue(maxsize=window)
+
+    async def pump():
+        try:
+            async with aclosing(items) as source:
+                async for item in source: await queue.put(item)
+        except Exception as e:
+            await queue.put(_Failed(e))
+            return
+        await queue.put(_END)
+
+    task = asyncio.create_task(pump())
+    try:
+        while True:
+            item = await queue.get()
+            if item is _END: return
+            if isinstance(item, _Failed): raise item.error
+            yield item
+    finally:
+        # Consommateur arrêté avant la fin : on ferme le flux (et ses téléchargements en cours)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
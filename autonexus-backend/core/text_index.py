@@ -0,0 +1,93 @@
+import re
+from collections import defaultdict
+
+# Index inversé en mémoire : mot -> documents qui le contiennent.
+# Une recherche garde la sémantique "sous-chaîne" (auth trouve authentication, v2.1 reste v2.1) :
+# l'index ne sert qu'à réduire les candidats (mots qui contiennent / finissent / commencent par
+# les termes de la requête), la sous-chaîne exacte est ensuite vérifiée sur ces seuls documents.
+
+WORD_RE = re.compile(r"\w+")
+SNIPPET_BEFORE = 40
+SNIPPET_AFTER = 80
+
+def tokenize(text: str) -> list:
+    return WORD_RE.findall(text.lower())
+
+class TextIndex:
+    def __init__(self):
+        self.docs = {}  # doc_id -> {"version", "title", "text", "meta"}
+        self.postings = defaultdict(set)
+        self.generation = 0  # incrémenté à chaque modification du contenu indexé
+
+    def version(self, doc_id: str):
+        doc = self.docs.get(doc_id)
+        return doc["version"] if doc else None
+
+    def update(self, doc_id: str, version: str, title: str, text: str, meta: dict = None):
+        """(Ré)indexe un document ; sans effet si la version n'a pas changé"""
+        doc = self.docs.get(doc_id)
+        if doc and doc["version"] == version:
+            if meta: doc["meta"] = meta
+            return
+        if doc: self.remove(doc_id)
+        self.docs[doc_id] = {"version": version, "title": title, "text": text, "meta": meta or {}}
+        for word in set(tokenize(title)) | set(tokenize(text)):
+            self.postings[word].add(doc_id)
+        self.generation += 1
+
+    def remove(self, doc_id: str):
+        doc = self.docs.pop(doc_id, None)
+        if not doc: return
+        for word in set(tokenize(doc["title"])) | set(tokenize(doc["text"])):
+            ids = self.postings.get(word)
+            if ids is None: continue
+            ids.discard(doc_id)
+            if not ids: del self.postings[word]
+        self.generation += 1
+
+    def _words_matching(self, word: str, first: bool, last: bool) -> set:
+        """Documents dont un mot peut porter ce terme de la requête (le premier peut être une fin de mot, le dernier un début)"""
+        if not first and not last: return self.postings.get(word, set())
+        ids = set()
+        for indexed, docs in self.postings.items():
+            if (first and last and word in indexed) or (first and not last and indexed.endswith(word)) \
+                    or (last and not first and indexed.startswith(word)):
+                ids |= docs
+        return ids
+
+    def search(self, query: str) -> list:
+        """Documents contenant la requête (sous-chaîne, sans tenir compte de la casse) -> [(doc_id, in_title, snippet)]"""
+        query = query.lower()
+        if not query.strip(): return []
+        words = tokenize(query)
+        if not words:
+            candidates = set(self.docs)  # Requête sans lettres ni chiffres : rien à chercher dans l'index
+        else:
+            candidates = None
+            terms = [(w, i == 0, i == len(words) - 1) for i, w in enumerate(words)]
+            # Termes exacts (les moins coûteux) d'abord
+            for word, first, last in sorted(terms, key=lambda t: (t[1] or t[2], len(self.postings.get(t[0], ())))):
+                ids = self._words_matching(word, first, last)
+                candidates = set(ids) if candidates is None else candidates & ids
+                if not candidates: return []
+
+        matches = []
+        for doc_id in candidates:
+            doc = self.docs[doc_id]
+            if query in doc["title"].lower():
+                matches.append((doc_id, True, ""))
+            elif query in doc["text"].lower():
+                matches.append((doc_id, False, self.snippet(doc["text"], query)))
+        return matches
+
+    @staticmethod
+    def snippet(text: str, query: str) -> str:
+        """Extrait autour de la première occurrence de la requête, coupé aux limites de mots"""
+        m = re.search(re.escape(query), text, re.IGNORECASE)
+        if not m: return ""
+        start, end = max(0, m.start() - SNIPPET_BEFORE), min(len(text), m.end() + SNIPPET_AFTER)
+        if start > 0 and " " in text[start:m.start()]: start = text.index(" ", start) + 1
+        if end < len(text) and " " in text[m.end():end]: end = text.rindex(" ", m.end(), end)
+        prefix = "..." if start > 0 else ""
+        suffix = "..." if end < len(text) else ""
+        return f"{prefix}{text[start:end].strip()}{suffix}"
@@ -1,17 +1,35 @@
 import uvicorn
 from fastapi import FastAPI, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from contextlib import asynccontextmanager
+from fastapi.responses import PlainTextResponse
+from contextlib import asynccontextmanager, aclosing
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import uuid
-import httpx 
 import asyncio
 import json
+import hashlib
 import os
+import random
+import signal
+import subprocess
+import sys
+import threading
 import time
 from datetime import datetime, timezone
-from openai import OpenAI 
+from core.http_pool import open_client, get_client, close_client
+from core.storage import Store
+from core.cache import DiskCache
+from core.item_states import ItemStates
+from core import llm, metrics
+from core.scheduler import Scheduler
+from core.coalesce import FetchCoalescer
+from core.delivery import WebhookDelivery
+from core import cluster
+from core.chunking import DEFAULT_CHUNK_TOKENS, DEFAULT_REDUCE_TOKENS, count_tokens, split_text, item_texts, pack, StreamPacker
+from core.streaming import prefetch
+from core.dedup import Deduplicator
+from core import budget
 
 # --- IMPORT CONNECTORS ---
 from connectors import twitter, notion, gmail, discord, github
@@ -29,101 +47,234 @@ TRANSLATIONS = {
     "fr": {"new": "Nouveau", "update": "Mise à jour", "link": "Lien", "footer": "via", "ai_report": "🧠 Rapport IA"}
 }
 
-DB_FILE = "autonexus_data.json"
-db = {"workflows": [], "credentials": {}, "item_states": {}}
+STARTUP_SPREAD = 10  # Secondes sur lesquelles étaler le démarrage des agents actifs
+SHUTDOWN_GRACE = 30  # Secondes laissées aux cycles en cours pour finir à l'arrêt
+
+DB_FILE = "autonexus_data.db"
+LEGACY_DB_FILE = "autonexus_data.json"  # Ancien format (réécrit en entier à chaque sauvegarde), importé une fois
+db = {"workflows": [], "credentials": {}, "connector_state": {}}
+# Rôle du processus : "all" (API + agents, un seul processus), "api" (API seule) ou "worker" (agents seuls, voir --workers)
+ROLE = os.environ.get("AUTONEXUS_ROLE", "all")
+WORKER_ID = os.environ.get("AUTONEXUS_WORKER_ID", "main")
+RUNS_AGENTS = ROLE != "api"
+WORKER_RESTART_DELAY = 2
+
+store = Store(DB_FILE)
+item_states = ItemStates(store)
+delivery = WebhookDelivery(store, "webhook_queue" if ROLE == "all" else f"webhook_queue:{WORKER_ID}")
+token_budget = budget.TokenBudget(store)
+deferred = budget.DeferredQueue(store)
+_persisted = {}  # (namespace, clé) -> dernière valeur sérialisée envoyée au store
+
+def _import_legacy_db():
+    if not os.path.exists(LEGACY_DB_FILE): return
+    try:
+        with open(LEGACY_DB_FILE, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        db["workflows"] = data.get("workflows", [])
+        db["credentials"] = data.get("credentials", {})
+        s = data.get("item_states", {})
+        if isinstance(s, dict): item_states.import_flat(s)
+        db["connector_state"] = data.get("connector_state", {})
+        save_db()
+        print(f"[SYSTEM] Legacy DB imported from {LEGACY_DB_FILE}.")
+    except Exception as e: print(f"[SYSTEM] Legacy DB import failed: {e}")
 
 def load_db():
-    global db
-    if os.path.exists(DB_FILE):
-        try:
-            with open(DB_FILE, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                db["workflows"] = data.get("workflows", [])
-                db["credentials"] = data.get("credentials", {})
-                s = data.get("item_states", {})
-                db["item_states"] = {} if isinstance(s, list) else s
-                print(f"[SYSTEM] DB Loaded: {len(db['workflows'])} agents.")
-        except: pass
+    store.start()
+    try:
+        # Hors mode "all", l'historique des agents n'est chargé qu'à leur prise en charge par un worker (acquire)
+        data = store.load(None if ROLE == "all" else ["workflows", "credentials", delivery.ns, budget.USAGE_NS])
+    except Exception as e:
+        print(f"[SYSTEM] DB load failed: {e}")
+        return
+    if not data:
+        if ROLE != "worker": _import_legacy_db()
+        return
+    db["workflows"] = list(data.get("workflows", {}).values())
+    db["credentials"] = data.get("credentials", {})
+    item_states.load(data)
+    delivery.load(data.get(delivery.ns, {}))
+    token_budget.load(data.get(budget.USAGE_NS, {}), None if ROLE == "all" else set())
+    deferred.load(data)
+    db["connector_state"] = data.get("connector_state", {})
+    for ns in ("workflows", "credentials", "connector_state"):
+        for key, value in data.get(ns, {}).items():
+            _persisted[(ns, key)] = json.dumps(value, ensure_ascii=False)
+    print(f"[SYSTEM] DB Loaded: {len(db['workflows'])} agents.")
 
 def save_db():
-    try:
-        with open(DB_FILE, "w", encoding="utf-8") as f:
-            json.dump(db, f, indent=4, ensure_ascii=False)
-    except: pass
+    """
+    Envoie au store uniquement les entrées modifiées (workflows, identifiants, états des connecteurs).
+    Les empreintes d'items sont écrites au fil de l'eau par item_states.
+    """
+    current = {}
+    for w in db["workflows"]: current[("workflows", w["id"])] = w
+    for k, v in db["credentials"].items(): current[("credentials", k)] = v
+    for k, v in db["connector_state"].items(): current[("connector_state", k)] = v
+
+    for (ns, key), value in current.items():
+        encoded = json.dumps(value, ensure_ascii=False)
+        if _persisted.get((ns, key)) != encoded:
+            store.put(ns, key, value)
+            _persisted[(ns, key)] = encoded
+    for ns, key in [k for k in _persisted if k not in current]:
+        store.delete(ns, key)
+        del _persisted[(ns, key)]
+
+def _apply_shared(data: dict):
+    """Remplace workflows et identifiants par ceux relus dans le store (écrits par un autre processus)"""
+    db["workflows"] = list(data.get("workflows", {}).values())
+    db["credentials"] = data.get("credentials", {})
+    for ns in ("workflows", "credentials"):
+        for key in [k for k in _persisted if k[0] == ns and k[1] not in data.get(ns, {})]: del _persisted[key]
+        for key, value in data.get(ns, {}).items(): _persisted[(ns, key)] = json.dumps(value, ensure_ascii=False)
+
+async def refresh_db():
+    """Mode api : relit workflows et identifiants (les workers passent les agents one-shot en pause)"""
+    if ROLE != "api": return
+    await asyncio.to_thread(store.flush)  # Nos propres écritures d'abord
+    _apply_shared(await asyncio.to_thread(store.load, ["workflows", "credentials"]))
+
+def reset_agent_state(w_id: str):
+    """Oublie curseurs et empreintes d'un agent (reset ou suppression), y compris ceux écrits par un worker"""
+    item_states.drop(w_id)
+    deferred.drop(w_id)
+    db["connector_state"].pop(w_id, None)
+    _persisted.pop(("connector_state", w_id), None)
+    store.delete("connector_state", w_id)
 
 # --- AI PROCESSOR (MAP-REDUCE PATTERN) ---
-async def process_data_with_ai(items: list, user_prompt: str, openai_key: str):
+# Extractions (map) mémorisées par item : un fichier inchangé n'est jamais ré-analysé pour le même prompt
+EXTRACTION_CACHE = DiskCache("ai_extractions", 100_000_000)
+
+def _extraction_key(item: dict, user_prompt: str) -> str:
+    prompt_hash = hashlib.sha1(user_prompt.encode("utf-8")).hexdigest()
+    return f"{llm.MODEL}:{prompt_hash}:{item['unique_key']}:{item['fingerprint']}"
+
+MAX_REDUCE_LEVELS = 6  # Au-delà (ou dès qu'un niveau ne réduit plus le texte), les notes sont coupées au budget
+SOURCE_HEADER = "--- FINDINGS FROM "  # En-tête des notes de chaque source (gardé par les fusions et la coupe finale)
+
+def cut_per_source(text: str, max_tokens: int) -> str:
     """
-    1. Découpe les données (Map).
-    2. Extrait les infos brutes de chaque morceau.
-    3. Synthétise le tout en une seule réponse finale (Reduce).
+    Coupe finale du reduce : chaque section "--- FINDINGS FROM ... ---" garde une part équitable du
+    budget (les petites sections restent entières, le reste est partagé) au lieu de ne garder que le début.
     """
-    if not items or not user_prompt or not openai_key: return None
-    
-    # 1. DÉCOUPAGE
-    SAFE_CHUNK_SIZE = 15000
-    chunks = []
-    current_chunk = []
-    current_size = 0
-    
-    for item in items:
-        item_text = f"SOURCE: {item['link']}\nCONTENT:\n{item['content']}\n---\n"
-        if len(item_text) > SAFE_CHUNK_SIZE: item_text = item_text[:SAFE_CHUNK_SIZE] + "\n[...]\n"
-        
-        if current_size + len(item_text) > SAFE_CHUNK_SIZE:
-            chunks.append(current_chunk)
-            current_chunk = []
-            current_size = 0
-        
-        current_chunk.append(item_text)
-        current_size += len(item_text)
-        
-    if current_chunk: chunks.append(current_chunk)
-    
-    print(f"[AI] Starting Analysis: {len(chunks)} chunks to process.")
-    client = OpenAI(api_key=openai_key)
-    
-    # 2. EXTRACTION (MAP)
-    raw_findings = []
-    
-    for i, chunk in enumerate(chunks):
-        print(f"[AI] Analyzing chunk {i+1}/{len(chunks)}...")
-        chunk_text = "\n".join(chunk)
-        
-        # Prompt technique : "Ne réponds pas à la demande finale, contente-toi d'extraire les infos pertinentes"
-        extraction_prompt = f"""
+    sections = []
+    for line in text.splitlines(keepends=True):
+        if line.startswith(SOURCE_HEADER) or not sections: sections.append("")
+        sections[-1] += line
+    budget_left = max_tokens
+    while True:
+        sizes = sorted(range(len(sections)), key=lambda i: count_tokens(sections[i]))
+        shares, left = {}, budget_left
+        for n, i in enumerate(sizes):
+            shares[i] = min(count_tokens(sections[i]), left // (len(sizes) - n))
+            left -= shares[i]
+        kept = [split_text(section, shares[i], 0)[0] if shares[i] < count_tokens(section) else section
+                for i, section in enumerate(sections) if shares[i] > 0]
+        cut = "".join(part if part.endswith("\n") else part + "\n" for part in kept).rstrip("\n")
+        # Les jointures peuvent coûter quelques tokens : on resserre jusqu'à tenir dans le budget
+        over = count_tokens(cut) - max_tokens
+        if over <= 0 or budget_left <= 1:
+            return cut if over <= 0 else split_text(cut, max_tokens, 0)[0]
+        budget_left -= max(over, 1)
+
+async def reduce_findings(raw_findings: list, user_prompt: str, openai_key: str, reduce_tokens: int = DEFAULT_REDUCE_TOKENS) -> str:
+    """
+    Reduce hiérarchique : tant que les notes dépassent le budget d'un appel, on les condense
+    par paquets d'au moins deux notes (en parallèle) -> profondeur logarithmique. Chaque fusion
+    classe les notes selon l'objectif, résume et écarte les plus faibles pour tenir en moitié moins
+    de tokens : chaque niveau réduit le texte. Une fusion en échec (llm.chat a déjà retenté) est refaite
+    par moitiés. Si les fusions ne réduisent plus assez, la coupe finale garde chaque source (cut_per_source).
+    """
+    # Notes d'au plus la moitié du budget : deux notes tiennent toujours dans un même appel
+    note_tokens = max(1, reduce_tokens // 2)
+
+    def split_notes(texts):
+        notes = []
+        for text in texts:
+            notes.extend(split_text(text, note_tokens) if count_tokens(text) > note_tokens else [text])
+        return notes
+
+    async def merge(group) -> list:
+        if len(group) == 1: return [group[0][0]]
+        notes = "\n".join(text for text, _ in group)
+        target = max(1, sum(tokens for _, tokens in group) // 2)
+        merge_prompt = f"""
         ROLE: Research Assistant.
         USER GOAL: "{user_prompt}"
-        
-        YOUR JOB: Analyze the code/data below. Extract ALL raw information, concepts, or candidates that are relevant to the User Goal.
-        - Do NOT apply limits (e.g. if user wants 5, but you see 20 valid ones here, list 20).
-        - Do NOT format the final output yet. Just bullet points of raw findings.
-        - If nothing relevant, return "Nothing".
-        
-        DATA:
-        {chunk_text}
+
+        YOUR JOB: Condense the notes below into ONE shorter list of findings, judged against the User Goal.
+        - Rank the findings by relevance to the User Goal, summarise them and drop the weakest ones.
+        - Your answer MUST be at most {target} tokens (about half of the notes).
+        - Keep the source of every finding you keep, grouped under "{SOURCE_HEADER}<source> ---" headers.
+        - Do NOT format the final answer yet.
+
+        NOTES:
+        {notes}
         """
-        
         try:
-            res = client.chat.completions.create(
-                model="gpt-4o",
-                messages=[{"role": "user", "content": extraction_prompt}]
-            )
-            result = res.choices[0].message.content
-            if "Nothing" not in result:
-                raw_findings.append(f"--- FINDINGS PART {i+1} ---\n{result}")
-            
-            if i < len(chunks)-1: await asyncio.sleep(1) # Pause anti-429
+            with metrics.AI_SECONDS.time(stage="reduce"):
+                return [await llm.chat(openai_key, [{"role": "user", "content": merge_prompt}]) or ""]
         except Exception as e:
-            print(f"[AI ERROR] Chunk {i+1}: {e}")
+            print(f"[AI ERROR] Merge of {len(group)} notes: {e}")
+            metrics.AI_ERRORS.inc(stage="reduce")
+        # Fusion par moitiés (au pire, deux notes restent telles quelles et le niveau suivant réessaie)
+        half = len(group) // 2
+        return [text for part in await asyncio.gather(merge(group[:half]), merge(group[half:])) for text in part]
 
-    # 3. SYNTHÈSE (REDUCE)
-    print(f"[AI] Synthesizing final answer...")
-    all_findings_text = "\n".join(raw_findings)
+    level = split_notes(raw_findings)
+    text = "\n".join(level)
+    for depth in range(MAX_REDUCE_LEVELS):
+        if count_tokens(text) <= reduce_tokens: return text
+        # Chaque note fait au plus la moitié du budget : un seul paquet au plus ne contient qu'une note
+        groups = pack([(note, count_tokens(note)) for note in level], reduce_tokens)
+        print(f"[AI] Reduce level {depth+1}: {len(level)} notes -> {len(groups)} merges...")
+        merged = await asyncio.gather(*(merge(group) for group in groups))
+        level = split_notes(note for notes in merged for note in notes)
+        before, text = count_tokens(text), "\n".join(level)
+        if count_tokens(text) >= before: break  # Les fusions ne réduisent plus rien (échecs, réponses trop longues)
+
+    if count_tokens(text) > reduce_tokens:
+        print(f"[AI] Reduce: notes still at {count_tokens(text)} tokens after {depth+1} levels, cut to {reduce_tokens} keeping every source.")
+        text = cut_per_source(text, reduce_tokens)
+    return text
+
+async def extract_chunk(n: int, chunk: list, user_prompt: str, openai_key: str):
+    """Extraction (map) d'un morceau -> {index de la source: notes brutes}, None si l'appel a échoué"""
+    print(f"[AI] Analyzing chunk {n}...")
+    chunk_text = "\n".join(text for text, _, _ in chunk)
+    
+    # Prompt technique : "Ne réponds pas à la demande finale, contente-toi d'extraire les infos pertinentes"
+    extraction_prompt = f"""
+    ROLE: Research Assistant.
+    USER GOAL: "{user_prompt}"
     
-    # Si on a trop de notes, on tronque pour la synthèse finale (rare si on extrait bien)
-    if len(all_findings_text) > 100000: 
-        all_findings_text = all_findings_text[:100000] + "\n...(notes truncated)"
+    YOUR JOB: Analyze the code/data below. Extract ALL raw information, concepts, or candidates that are relevant to the User Goal.
+    - Do NOT apply limits (e.g. if user wants 5, but you see 20 valid ones here, list 20).
+    - Do NOT format the final output yet. Just bullet points of raw findings.
+    - Each source starts with "SOURCE [n]". Answer with a JSON object mapping the source number to its findings,
+      e.g. {{"3": "- finding\\n- finding"}}. Omit sources with nothing relevant; if nothing at all, return {{}}.
+    
+    DATA:
+    {chunk_text}
+    """
+    
+    try:
+        with metrics.AI_SECONDS.time(stage="map"):
+            result = await llm.chat(openai_key, [{"role": "user", "content": extraction_prompt}], response_format={"type": "json_object"})
+        parsed = json.loads(result)
+        return {int(k): str(v).strip() for k, v in parsed.items() if str(k).isdigit()}
+    except Exception as e:
+        print(f"[AI ERROR] Chunk {n}: {e}")
+        metrics.AI_ERRORS.inc(stage="map")
+    return None
+
+async def synthesize(raw_findings: list, user_prompt: str, openai_key: str) -> str:
+    """Reduce puis rédaction de la réponse finale"""
+    all_findings_text = await reduce_findings(raw_findings, user_prompt, openai_key)
+    print(f"[AI] Synthesizing final answer...")
 
     final_system_prompt = "You are the Final Editor. Generate the final response for the user."
     final_user_prompt = f"""
@@ -141,113 +292,477 @@ async def process_data_with_ai(items: list, user_prompt: str, openai_key: str):
     """
 
     try:
-        res = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
+        with metrics.AI_SECONDS.time(stage="final"):
+            return await llm.chat(openai_key, [
                 {"role": "system", "content": final_system_prompt},
                 {"role": "user", "content": final_user_prompt}
-            ]
-        )
-        return res.choices[0].message.content
+            ])
     except Exception as e:
+        metrics.AI_ERRORS.inc(stage="final")
         return f"Error generating final summary: {e}"
 
+# Morceaux en cours d'extraction par analyse : au-delà, add() attend (contre-pression jusqu'au connecteur)
+MAX_INFLIGHT_CHUNKS = 8
+MAX_LISTED_DUPLICATES = 20  # Liens de doublons cités dans l'en-tête des notes d'un item
+
+class StreamingAnalysis:
+    """
+    Map-reduce alimenté item par item : chaque item est découpé, rangé dans un morceau (StreamPacker),
+    et chaque morceau plein part aussitôt en extraction. Seuls les morceaux ouverts ou en vol gardent
+    du texte en mémoire ; il ne reste ensuite que les notes par item, fusionnées par finish().
+    Les copies exactes ou quasi exactes d'un item déjà reçu ne sont pas analysées : leurs liens
+    sont rattachés à ses notes ; celles-ci ne servent d'extraction en cache qu'aux copies exactes.
+    """
+
+    def __init__(self, user_prompt: str, openai_key: str, chunk_tokens: int = DEFAULT_CHUNK_TOKENS, dedup: bool = True):
+        self.user_prompt = user_prompt
+        self.openai_key = openai_key
+        self.chunk_tokens = chunk_tokens
+        self.packer = StreamPacker(chunk_tokens)
+        self.slots = asyncio.Semaphore(MAX_INFLIGHT_CHUNKS)
+        self.tasks = set()
+        self.links = []  # index de l'item -> lien (en-tête des notes)
+        self.keys = {}  # index -> clé du cache d'extractions
+        self.findings = {}  # index -> notes brutes ("" = rien de pertinent)
+        self.pending = {}  # index -> morceaux de l'item pas encore analysés
+        self.notes = {}
+        self.failed = set()
+        self.chunks = 0
+        self.cached = 0
+        self.dedup = Deduplicator() if dedup else None
+        self.duplicates = {}  # index -> liens de ses doublons
+        self.aliases = {}  # index -> clés de cache de ses doublons, en attente de ses notes
+
+    async def add(self, item: dict):
+        idx = len(self.links)
+        if self.dedup:
+            # "body" : texte sans l'en-tête propre à l'item (chemin, auteur...) s'il y en a un
+            exact = self.dedup.exact
+            rep = self.dedup.add(idx, item.get("body", item["content"]))
+            if rep != idx:
+                await self._attach(rep, item, self.dedup.exact > exact)
+                return
+        self.links.append(item["link"])
+        key = _extraction_key(item, self.user_prompt)
+        cached = await EXTRACTION_CACHE.aget_text(key)
+        if cached is not None:
+            self.findings[idx] = cached
+            self.cached += 1
+            return
+
+        # Découpage par tokens ; les gros fichiers sont coupés aux fins de ligne, pas tronqués
+        self.keys[idx] = key
+        texts = item_texts(item, self.chunk_tokens, idx)
+        self.pending[idx] = len(texts)
+        for text, tokens in texts:
+            for chunk in self.packer.add((text, tokens, idx)):
+                await self._dispatch(chunk)
+
+    async def _attach(self, rep: int, item: dict, exact: bool):
+        """Doublon : son lien rejoint l'en-tête du représentant ; seule une copie exacte reprend aussi
+        ses notes en cache (une quasi-copie modifiée doit être réanalysée seule au prochain passage)"""
+        self.duplicates.setdefault(rep, []).append(item["link"])
+        if not exact: return
+        key = _extraction_key(item, self.user_prompt)
+        if rep in self.findings: await EXTRACTION_CACHE.aput_text(key, self.findings[rep])
+        elif rep in self.pending: self.aliases.setdefault(rep, []).append(key)
+
+    async def _dispatch(self, chunk: list):
+        await self.slots.acquire()
+        self.chunks += 1
+        task = asyncio.create_task(self._extract(self.chunks, chunk))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _extract(self, n: int, chunk: list):
+        try:
+            result = await extract_chunk(n, chunk, self.user_prompt, self.openai_key)
+        finally:
+            self.slots.release()
+        # Regroupe les notes par item (un gros fichier peut être réparti sur plusieurs morceaux)
+        for idx in dict.fromkeys(idx for _, _, idx in chunk):
+            if result is None: self.failed.add(idx)
+            elif result.get(idx): self.notes.setdefault(idx, []).append(result[idx])
+        for _, _, idx in chunk:
+            self.pending[idx] -= 1
+            if self.pending[idx]: continue
+            del self.pending[idx]
+            notes = self.notes.pop(idx, [])
+            aliases = self.aliases.pop(idx, [])
+            if idx in self.failed: continue
+            self.findings[idx] = "\n".join(notes)
+            for key in [self.keys.pop(idx)] + aliases: await EXTRACTION_CACHE.aput_text(key, self.findings[idx])
+
+    async def finish(self):
+        if not self.links: return None
+        for chunk in self.packer.flush():
+            await self._dispatch(chunk)
+        while self.tasks:
+            await asyncio.gather(*self.tasks)
+        duplicates = f", {self.dedup.exact} exact and {self.dedup.near} near duplicates merged" if self.dedup else ""
+        print(f"[AI] Map done: {self.chunks} chunks analysed ({self.cached} items from cache{duplicates}).")
+        if self.dedup:
+            metrics.ITEMS_DEDUPLICATED.inc(self.dedup.exact, kind="exact")
+            metrics.ITEMS_DEDUPLICATED.inc(self.dedup.near, kind="near")
+
+        raw_findings = [f"{SOURCE_HEADER}{self._source(idx)} ---\n{self.findings[idx]}" for idx in sorted(self.findings) if self.findings[idx]]
+        return await synthesize(raw_findings, self.user_prompt, self.openai_key)
+
+    def _source(self, idx: int) -> str:
+        others = self.duplicates.get(idx)
+        if not others: return self.links[idx]
+        listed = ", ".join(others[:MAX_LISTED_DUPLICATES])
+        more = f" and {len(others) - MAX_LISTED_DUPLICATES} more" if len(others) > MAX_LISTED_DUPLICATES else ""
+        return f"{self.links[idx]} (same content: {listed}{more})"
+
+    def cancel(self):
+        for task in list(self.tasks): task.cancel()
+
+async def process_data_with_ai(items: list, user_prompt: str, openai_key: str, chunk_tokens: int = DEFAULT_CHUNK_TOKENS):
+    """
+    1. Découpe les données en morceaux de chunk_tokens tokens max (Map).
+    2. Extrait les infos brutes de chaque item (ou les reprend du cache d'extractions).
+    3. Synthétise le tout en une seule réponse finale (Reduce).
+    """
+    if not items or not user_prompt or not openai_key: return None
+    analysis = StreamingAnalysis(user_prompt, openai_key, chunk_tokens)
+    try:
+        for item in items: await analysis.add(item)
+        return await analysis.finish()
+    finally:
+        analysis.cancel()
+
 # --- WORKER ---
-async def run_infinite_loop(workflow_id: str):
-    w_id = workflow_id if isinstance(workflow_id, str) else workflow_id.get("id")
-    print(f"[DAEMON] 🚀 Thread {w_id} started")
+# Cycles simultanés max par source (les autres attendent leur tour dans le scheduler)
+SOURCE_CONCURRENCY = {"github": 8, "notion": 4, "discord": 8, "twitter": 4}
 
-    while True:
+coalescer = FetchCoalescer()
+
+def get_workflow(w_id: str):
+    return next((w for w in db["workflows"] if w["id"] == w_id), None)
+
+async def run_agent_cycle(w_id: str):
+    """Un passage d'un agent. Renvoie le délai avant le prochain passage (None = ne plus planifier)."""
+    current_wf = get_workflow(w_id)
+    if not current_wf or current_wf.get("status") != "active": return None
+    refresh = 60
+    source = current_wf.get("source")
+    started = time.perf_counter()
+
+    try:
+        settings = current_wf.get("settings", {})
+        
+        prompt = settings.get("custom_prompt")
+        webhook = settings.get("webhook")
+        email = settings.get("recipient_email")
+        try: refresh = int(settings.get("refresh_interval", 60))
+        except: refresh = 60
+        lang = settings.get("agent_language", "en")
+        t = TRANSLATIONS.get(lang, TRANSLATIONS["en"])
+
+        connector = CONNECTORS.get(source)
+        token = db["credentials"].get(source)
+        openai_key = db["credentials"].get("openai")
+
+        if not connector or not token: return 60
+
+        # État propre au connecteur (ex: dernier commit traité), persisté par agent
+        state = db["connector_state"].setdefault(w_id, {})
+        state_before = json.dumps(state, sort_keys=True)
+        try: chunk_tokens = int(settings.get("ai_chunk_tokens") or DEFAULT_CHUNK_TOKENS)
+        except: chunk_tokens = DEFAULT_CHUNK_TOKENS
+        # Avec l'IA, les items sont analysés au fil de l'eau (ils ne sont jamais tous en mémoire) ;
+        # sans elle, ils sont gardés pour la notification
+        dedup = settings.get("ai_dedup") != "off"
+        analysis = StreamingAnalysis(prompt, openai_key, chunk_tokens, dedup) if prompt and openai_key else None
+        # Budget de tokens : les items partent à l'analyse au fil de l'eau tant que le lot tient dans le budget ;
+        # au-delà, les items les plus prioritaires sont analysés et les autres différés aux cycles suivants
+        # (la sélection attend alors la fin du flux)
+        limit = token_budget.allowance(w_id, settings) if analysis else None
+        selection = None
+        streamed = 0
+        if limit is not None:
+            items_limit = int(limit / budget.OVERHEAD)
+            per_item = budget.cycle_tokens(settings)
+            max_item = int(per_item / budget.OVERHEAD) if per_item else None
+            # Extraction déjà en cache : l'item ne coûte aucun token
+            is_cached = lambda item: EXTRACTION_CACHE.acontains(_extraction_key(item, prompt))
+            # Des différés attendent : ils concourent dès le début avec les nouveaux items
+            if deferred.count(w_id): selection = budget.Selection(w_id, items_limit, prompt, deferred, max_item, is_cached)
+        
+        batch = []
+        delivered = 0
+        started_cycle = False
+        spent = [0]
+        usage_token = llm.usage.set(spent)
+        labels_token = metrics.context.set({"agent": w_id, "source": source})
+        reserved = 0
         try:
-            current_wf = next((w for w in db["workflows"] if w["id"] == w_id), None)
-            if not current_wf: break
-            if current_wf.get("status") != "active":
-                await asyncio.sleep(10)
-                continue
-
-            settings = current_wf.get("settings", {})
-            source = current_wf.get("source")
-            
-            prompt = settings.get("custom_prompt")
-            webhook = settings.get("webhook")
-            email = settings.get("recipient_email")
-            try: refresh = int(settings.get("refresh_interval", 60))
-            except: refresh = 60
-            lang = settings.get("agent_language", "en")
-            t = TRANSLATIONS.get(lang, TRANSLATIONS["en"])
-
-            connector = CONNECTORS.get(source)
-            token = db["credentials"].get(source)
-            openai_key = db["credentials"].get("openai")
-
-            if not connector or not token:
-                await asyncio.sleep(60)
-                continue
-
-            items = await connector.fetch(settings, token)
-            
-            batch = []
-            changed = False
-            for item in items:
-                if not item["is_ready"]: continue
-                key = f"{w_id}:{item['unique_key']}"
-                last_ver = db["item_states"].get(key)
-                cur_ver = item["fingerprint"]
-                
-                if last_ver is None or last_ver != cur_ver:
-                    item["is_update"] = (last_ver is not None)
-                    batch.append(item)
-                    db["item_states"][key] = cur_ver
-                    changed = True
+            # 304 / réponse identique : flux vide, rien à comparer
+            async with aclosing(prefetch(coalescer.stream(source, connector, settings, token, state, get_client()))) as items:
+                async for item in items:
+                    if not started_cycle:
+                        item_states.begin_cycle(w_id)
+                        started_cycle = True
+                    if not item["is_ready"]: continue
+                    is_update = item_states.observe(w_id, item["unique_key"], item["fingerprint"])
+                    
+                    if is_update is not None:
+                        item["is_update"] = is_update
+                        delivered += 1
+                        if limit is not None and selection is None:
+                            cost = 0 if await is_cached(item) else count_tokens(item["content"])
+                            if streamed + cost > items_limit:
+                                # Budget atteint : la suite du lot passe par la sélection par priorité
+                                selection = budget.Selection(w_id, items_limit - streamed, prompt, deferred, max_item, is_cached)
+                            else:
+                                streamed += cost
+                                token_budget.reserve(w_id, int(cost * budget.OVERHEAD))
+                                reserved += int(cost * budget.OVERHEAD)
+                        if selection: await selection.offer(item)
+                        elif analysis:
+                            if delivered == 1: print("[ACTION] AI Processing items as they arrive (Map-Reduce)...")
+                            await analysis.add(item)
+                        else: batch.append(item)
+            item_states.end_cycle(w_id)
+            if delivered: metrics.ITEMS_DELIVERED.inc(delivered, source=source, agent=w_id)
+
+            if selection:
+                chosen = selection.chosen()
+                taken = await deferred.take(w_id, [key for item, key in chosen if item is None])
+                token_budget.reserve(w_id, int(selection.total * budget.OVERHEAD))
+                reserved += int(selection.total * budget.OVERHEAD)
+                if deferred.count(w_id) and (chosen or selection.new_deferred):
+                    print(f"[BUDGET] Agent {w_id}: {len(chosen)} items selected within {limit} tokens, {deferred.count(w_id)} deferred.")
+                if chosen: print("[ACTION] AI Processing selected items (Map-Reduce)...")
+                for item, key in chosen:
+                    item = item or taken.get(key)
+                    if item: await analysis.add(item)
+            elif analysis and limit is None and deferred.count(w_id):
+                # Budget levé depuis : tous les différés passent
+                keys = deferred.keys(w_id)
+                for i in range(0, len(keys), 100):
+                    for item in (await deferred.take(w_id, keys[i:i+100])).values(): await analysis.add(item)
             
             ai_result = ""
             is_ai = False
-            if batch and prompt and openai_key:
-                print(f"[ACTION] AI Processing {len(batch)} items (Map-Reduce)...")
-                ai_result = await process_data_with_ai(batch, prompt, openai_key)
+            if analysis and analysis.links:
+                ai_result = await analysis.finish()
                 is_ai = True
-            
-            if batch:
-                if webhook and webhook.startswith("http"):
-                    bot_name = settings.get("bot_name", "AutoNexus")
-                    if is_ai:
-                        parts = [ai_result[i:i+4000] for i in range(0, len(ai_result), 4000)]
-                        for p in parts:
-                            await httpx.AsyncClient().post(webhook, json={"username": bot_name, "embeds": [{"title": f"{t['ai_report']}", "description": p, "color": 0x9B59B6}]})
-                    else:
-                        for v in batch:
-                            await httpx.AsyncClient().post(webhook, json={"username": bot_name, "embeds": [{"title": v['content'][:100], "description": v['content'][:4000], "color": 0x7289DA}]})
-
-                if email:
-                    creds = db["credentials"].get("gmail")
-                    if creds:
-                        if is_ai:
-                            # Envoi du rapport final unique
-                            wrapper = [{"content": ai_result, "link": "#", "is_update": False}]
-                            await gmail.send_notification(settings, wrapper, creds, lang)
-                        else:
-                            await gmail.send_notification(settings, batch, creds, lang)
-
-            if changed: save_db()
-
-        except Exception as e: print(f"[LOOP ERROR] {e}")
+                batch = [{"content": ai_result, "link": "#", "is_update": False}]
+        finally:
+            if analysis: analysis.cancel()
+            llm.usage.reset(usage_token)
+            metrics.context.reset(labels_token)
+            token_budget.record(w_id, spent[0], reserved)
         
-        if refresh <= 0:
-            if current_wf: 
-                current_wf["status"] = "paused"
-                save_db()
-            print(f"[DAEMON] Agent {w_id} finished (One-shot).")
+        if batch:
+            if webhook and webhook.startswith("http"):
+                bot_name = settings.get("bot_name", "AutoNexus")
+                # Envoi asynchrone et durable : le cycle n'attend pas Discord
+                if is_ai:
+                    parts = [ai_result[i:i+4000] for i in range(0, len(ai_result), 4000)]
+                    delivery.enqueue(webhook, bot_name, [{"title": f"{t['ai_report']}", "description": p, "color": 0x9B59B6} for p in parts])
+                else:
+                    delivery.enqueue(webhook, bot_name, [{"title": v['content'][:100], "description": v['content'][:4000], "color": 0x7289DA} for v in batch])
+
+            if email:
+                creds = db["credentials"].get("gmail")
+                if creds:
+                    # Avec l'IA, batch ne contient que le rapport final unique
+                    gmail.queue_notification(settings, batch, creds, lang)
+
+        if delivered or json.dumps(state, sort_keys=True) != state_before: save_db()
+
+    except Exception as e:
+        print(f"[LOOP ERROR] {e}")
+        metrics.CYCLE_ERRORS.inc(source=source, agent=w_id)
+
+    elapsed = time.perf_counter() - started
+    metrics.CYCLE_SECONDS.observe(elapsed, source=source)
+    metrics.AGENT_CYCLE_SECONDS.set(elapsed, agent=w_id)
+    
+    if refresh <= 0:
+        current_wf = get_workflow(w_id) or current_wf  # La liste a pu être relue pendant le cycle (mode worker)
+        current_wf["status"] = "paused"
+        save_db()
+        print(f"[DAEMON] Agent {w_id} finished (One-shot).")
+        return None
+    return refresh
+
+scheduler = Scheduler(run_agent_cycle, lambda w_id: (get_workflow(w_id) or {}).get("source"), SOURCE_CONCURRENCY)
+
+# --- WORKERS (mode multi-processus) ---
+membership = cluster.Membership(store, WORKER_ID)
+_owned = {}  # w_id -> réglages (json) au moment de la prise en charge
+
+def _worker_stats() -> dict:
+    proc = metrics.process_stats()
+    return {"agents": len(_owned), "running": scheduler.running(), "scheduled": scheduler.pending(),
+            "webhooks_pending": delivery.pending(), "deferred_items": deferred.total(), "cpu": f"{proc['cpu_percent']:.0f}%",
+            "memory_mb": round(proc["rss_bytes"] / 1_048_576, 1) if proc["rss_bytes"] else None,
+            "cycle_p99_s": metrics.CYCLE_SECONDS.quantile(0.99)}
+
+async def acquire(w_ids: list):
+    """
+    Prend en charge des agents dès que l'ancien propriétaire les a remis (marqueur écrit après sa
+    sauvegarde) ou que son battement de cœur a expiré : charge leur historique, puis planifie
+    """
+    waiting = list(w_ids)
+    while True:
+        waiting = [w for w in waiting if w in _owned]
+        if not waiting: return
+        markers = await asyncio.to_thread(store.get, cluster.HANDOFF_NS, waiting)
+        entries = await asyncio.to_thread(store.get, cluster.NS, {m["worker"] for m in markers.values() if m.get("worker")})
+        ready = [w for w in waiting if membership.handed_over(markers.get(w), entries)]
+        if ready: await _take_over(ready)
+        waiting = [w for w in waiting if w not in ready]
+        if not waiting: return
+        await asyncio.sleep(cluster.HANDOFF_POLL)
+
+async def _take_over(w_ids: list):
+    namespaces = ["connector_state", budget.USAGE_NS] + [ns for w in w_ids for ns in item_states.namespaces(w) + [deferred.namespace(w)]]
+    data = await asyncio.to_thread(store.load, namespaces)
+    token_budget.load(data.get(budget.USAGE_NS, {}), set(_owned))
+    for w_id in w_ids:
+        if w_id not in _owned: continue
+        membership.owned(w_id)
+        item_states.load_workflow(w_id, data)
+        deferred.load_workflow(w_id, data)
+        state = data.get("connector_state", {}).get(w_id)
+        if state is not None:
+            db["connector_state"][w_id] = state
+            _persisted[("connector_state", w_id)] = json.dumps(state, ensure_ascii=False)
+        scheduler.schedule(w_id, random.uniform(0, STARTUP_SPREAD), jitter=False)
+    print(f"[WORKER] {WORKER_ID} took over {len(w_ids)} agents ({len(_owned)} owned).")
+
+async def release(w_id: str, deleted: bool = False):
+    """Rend un agent (passé à un autre worker, en pause ou supprimé) après avoir sauvegardé son état"""
+    _owned.pop(w_id, None)
+    if deleted:
+        scheduler.cancel(w_id)
+        store.delete(cluster.HANDOFF_NS, w_id)
+    else:
+        # Le cycle en cours va jusqu'au bout : ses items sont déjà marqués vus, l'interrompre les perdrait
+        scheduler.unschedule(w_id)
+        await scheduler.wait_idle(w_id)
+        if w_id in _owned: return  # Repris entre-temps : l'état reste en mémoire
+        save_db()
+        membership.released(w_id)
+    item_states.forget(w_id)
+    deferred.forget(w_id)
+    token_budget.forget(w_id)
+    db["connector_state"].pop(w_id, None)
+    _persisted.pop(("connector_state", w_id), None)
+    metrics.forget_agent(w_id)
+
+async def sync_shard():
+    """Battement de cœur, relecture des workflows et (ré)attribution des agents entre workers vivants"""
+    membership.beat(_worker_stats())
+    data = await asyncio.to_thread(store.load, ["workflows", "credentials", cluster.NS, budget.USAGE_NS])
+    _apply_shared(data)
+    workers = membership.alive(data.get(cluster.NS, {}))
+
+    acquired = []
+    for wf in db["workflows"]:
+        w_id = wf["id"]
+        mine = wf.get("status") == "active" and cluster.owner(w_id, workers) == WORKER_ID
+        settings = json.dumps(wf.get("settings", {}), sort_keys=True)
+        if mine and w_id not in _owned:
+            _owned[w_id] = settings
+            acquired.append(w_id)
+        elif mine and _owned[w_id] != settings:
+            # Réglages modifiés depuis l'API : même reset qu'en mode "all"
+            _owned[w_id] = settings
+            scheduler.cancel(w_id)
+            reset_agent_state(w_id)
+            scheduler.schedule(w_id, 0)
+        elif not mine and w_id in _owned:
+            asyncio.create_task(release(w_id))
+    for w_id in [w for w in _owned if get_workflow(w) is None]: await release(w_id, deleted=True)
+    token_budget.load(data.get(budget.USAGE_NS, {}), set(_owned))  # Budget global : consommation des autres workers
+    if acquired: asyncio.create_task(acquire(acquired))
+
+async def run_worker():
+    load_db()
+    open_client()
+    delivery.start()
+    scheduler.start()
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try: loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError: pass  # Windows
+    print(f"[WORKER] {WORKER_ID} started (pid {os.getpid()}).")
+
+    # Un premier battement puis une période d'attente : les autres workers sont visibles avant la répartition
+    membership.beat(_worker_stats())
+    delay = cluster.HEARTBEAT_INTERVAL
+    while True:
+        try:
+            await asyncio.wait_for(stop.wait(), delay)
             break
-        else:
-            await asyncio.sleep(refresh)
+        except asyncio.TimeoutError: pass
+        try: await sync_shard()
+        except Exception as e: print(f"[WORKER ERROR] {e}")
+
+    membership.leave()
+    await scheduler.stop(SHUTDOWN_GRACE)
+    await delivery.stop()
+    await gmail.flush_all()
+    save_db()
+    for w_id in _owned: membership.released(w_id)
+    membership.gone()
+    await asyncio.to_thread(store.close)
+    await close_client()
+    print(f"[WORKER] {WORKER_ID} stopped.")
+
+def run_cluster(workers: int):
+    """Processus API (sans reload) + workers supervisés : un worker qui s'arrête est relancé"""
+    procs = {}
+    stopping = threading.Event()
+
+    def spawn(i: int):
+        env = {**os.environ, "AUTONEXUS_ROLE": "worker", "AUTONEXUS_WORKER_ID": f"worker-{i}"}
+        procs[i] = subprocess.Popen([sys.executable, os.path.abspath(__file__)], env=env)
+
+    def supervise():
+        while not stopping.wait(WORKER_RESTART_DELAY):
+            for i, proc in list(procs.items()):
+                if proc.poll() is not None and not stopping.is_set():
+                    print(f"[CLUSTER] worker-{i} exited ({proc.returncode}), restarting.")
+                    spawn(i)
+
+    for i in range(workers): spawn(i)
+    threading.Thread(target=supervise, name="worker-supervisor", daemon=True).start()
+    os.environ["AUTONEXUS_ROLE"] = "api"  # Lu par le module "main" importé par uvicorn
+    try:
+        uvicorn.run("main:app", host="0.0.0.0", port=8000)
+    finally:
+        stopping.set()
+        for proc in procs.values(): proc.terminate()
+        for proc in procs.values():
+            try: proc.wait(timeout=60)
+            except subprocess.TimeoutExpired: proc.kill()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     load_db()
-    for wf in db["workflows"]:
-        if wf.get("status") == "active": asyncio.create_task(run_infinite_loop(wf["id"]))
+    open_client()
+    if RUNS_AGENTS:
+        delivery.start()
+        scheduler.start()
+        for wf in db["workflows"]:
+            # Démarrages étalés pour ne pas lancer tous les agents dans la même seconde
+            if wf.get("status") == "active": scheduler.schedule(wf["id"], random.uniform(0, STARTUP_SPREAD), jitter=False)
     yield
+    if RUNS_AGENTS:
+        await scheduler.stop(SHUTDOWN_GRACE)
+        await delivery.stop()
+        await gmail.flush_all()
     save_db()
+    await asyncio.to_thread(store.close)
+    await close_client()
 
 app = FastAPI(title="AutoNexus API", version="38.0.0 - Map Reduce", lifespan=lifespan)
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
@@ -258,11 +773,10 @@ class WorkflowConfig(BaseModel): serviceSource: str; serviceDest: str; settings:
 class WorkflowUpdate(BaseModel): status: Optional[str] = None; settings: Optional[Dict[str, Any]] = None
 class AgentResponse(BaseModel): role: str="agent"; content: str; type: str="text"; formData: Optional[Dict[str, Any]]=None
 
-def analyze_intent_with_llm(user_input: str):
+async def analyze_intent_with_llm(user_input: str):
     openai_key = db["credentials"].get("openai")
     if openai_key:
         try:
-            client = OpenAI(api_key=openai_key)
             prompt = """
             AutoNexus Architect.
             RULES:
@@ -286,8 +800,8 @@ def analyze_intent_with_llm(user_input: str):
                 }
             }
             """
-            res = client.chat.completions.create(model="gpt-4o", messages=[{"role": "system", "content": prompt}, {"role": "user", "content": user_input}], response_format={"type": "json_object"})
-            return json.loads(res.choices[0].message.content)
+            res = await llm.chat(openai_key, [{"role": "system", "content": prompt}, {"role": "user", "content": user_input}], response_format={"type": "json_object"})
+            return json.loads(res)
         except: pass
     return {"type": "text", "content": "Connect OpenAI."}
 
@@ -301,39 +815,89 @@ async def save_creds(c: CredentialInput):
 @app.get("/api/credentials/check/{sid}")
 async def check_creds(sid: str): return {"configured": sid in db["credentials"]}
 @app.get("/api/workflows")
-async def get_wfs(): return db["workflows"]
+async def get_wfs():
+    await refresh_db()
+    return db["workflows"]
 @app.delete("/api/agent/{aid}")
 async def delete_agent(aid: str):
+    await refresh_db()
+    if RUNS_AGENTS: scheduler.cancel(aid)
     db["workflows"] = [w for w in db["workflows"] if w["id"] != aid]
+    reset_agent_state(aid)
+    metrics.forget_agent(aid)
     save_db()
     return {"status": "success"}
 @app.patch("/api/agent/{aid}")
 async def update_agent(aid: str, u: WorkflowUpdate):
+    await refresh_db()
     w = next((x for x in db["workflows"] if x["id"] == aid), None)
     if w:
+        # En mode api, les workers voient le changement à leur prochaine synchronisation (sync_shard)
         if u.status: 
             w["status"] = u.status
-            if u.status == "active": asyncio.create_task(run_infinite_loop(aid))
+            if u.status != "active" and RUNS_AGENTS: scheduler.unschedule(aid)
         if u.settings: 
+            if RUNS_AGENTS: scheduler.cancel(aid)
             w["settings"].update(u.settings)
-            prefix = f"{aid}:"
-            keys = [k for k in db["item_states"].keys() if k.startswith(prefix)]
-            for k in keys: del db["item_states"][k]
+            reset_agent_state(aid)
             print(f"[SYSTEM] Agent {aid} reset. Relaunching...")
-            asyncio.create_task(run_infinite_loop(aid))
+        if RUNS_AGENTS and w["status"] == "active" and (u.settings or u.status == "active"): scheduler.schedule(aid, 0)
         save_db()
     return {"status": "success"}
 @app.post("/api/agent/chat", response_model=AgentResponse)
-async def chat(r: ChatRequest): return analyze_intent_with_llm(r.message)
+async def chat(r: ChatRequest): return await analyze_intent_with_llm(r.message)
 @app.post("/api/agent/deploy")
 async def deploy(c: WorkflowConfig, bg: BackgroundTasks):
     wf = {"id": str(uuid.uuid4())[:8], "name": c.settings.get("bot_name"), "source": c.serviceSource.lower(), "settings": c.settings, "status": "active"}
     db["workflows"].append(wf)
     save_db()
-    asyncio.create_task(run_infinite_loop(wf["id"]))
+    if RUNS_AGENTS: scheduler.schedule(wf["id"], 0)
     return {"status": "success", "message": f"Agent deployed!"}
 @app.get("/api/system/stats")
-async def stats(): return {"cpu": "12%", "active_agents": len(db["workflows"])}
+async def stats():
+    proc = metrics.process_stats()
+    slowest = sorted(metrics.AGENT_CYCLE_SECONDS.values.items(), key=lambda kv: kv[1], reverse=True)[:5]
+    if ROLE == "api":
+        # Les agents tournent dans les workers : leurs chiffres viennent de leurs battements de cœur
+        await refresh_db()
+        data = await asyncio.to_thread(store.load, [cluster.NS])
+        return {
+            "cpu": f"{proc['cpu_percent']:.0f}%",
+            "memory_mb": round(proc["rss_bytes"] / 1_048_576, 1) if proc["rss_bytes"] else None,
+            "active_agents": len(db["workflows"]),
+            "workers": cluster.workers_status(data.get(cluster.NS, {})),
+        }
+    return {
+        "cpu": f"{proc['cpu_percent']:.0f}%",
+        "memory_mb": round(proc["rss_bytes"] / 1_048_576, 1) if proc["rss_bytes"] else None,
+        "threads": proc["threads"],
+        "active_agents": len(db["workflows"]),
+        "running_cycles": scheduler.running(),
+        "scheduled": scheduler.pending(),
+        "webhooks_pending": delivery.pending(),
+        "llm_tokens_today": token_budget.used(),
+        "deferred_items": deferred.total(),
+        "cycle_p50_s": metrics.CYCLE_SECONDS.quantile(0.5),
+        "cycle_p99_s": metrics.CYCLE_SECONDS.quantile(0.99),
+        "slowest_agents": {dict(key)["agent"]: round(seconds, 3) for key, seconds in slowest},
+        "fetch_coalescing": {"hits": coalescer.hits, "misses": coalescer.misses},
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    proc = metrics.process_stats()
+    metrics.PROCESS_CPU.set(proc["cpu_percent"])
+    if proc["rss_bytes"]: metrics.PROCESS_RSS.set(proc["rss_bytes"])
+    metrics.SCHEDULED_AGENTS.set(scheduler.pending())
+    metrics.WEBHOOKS_PENDING.set(delivery.pending())
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="AutoNexus backend")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("AUTONEXUS_WORKERS", 0)),
+                        help="run the agents in N worker processes; this process only serves the API")
+    args = parser.parse_args()
+    if ROLE == "worker": asyncio.run(run_worker())
+    elif args.workers > 0: run_cluster(args.workers)
+    else: uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
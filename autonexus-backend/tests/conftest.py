@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Les modules du backend s'importent depuis son dossier (core, connectors), comme au lancement de main.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,94 @@
+import asyncio
+from core import budget
+from core.budget import DeferredQueue, Selection, TokenBudget
+from core.chunking import count_tokens
+from core.storage import Store
+
+def store(tmp_path):
+    s = Store(str(tmp_path / "test.db"))
+    s.start()
+    return s
+
+def item(key: str, path: str, lines: int = 50) -> dict:
+    content = "\n".join(f"{key} line {i} " + "x" * 40 for i in range(lines))
+    return {"unique_key": key, "fingerprint": "1", "link": f"https://x/{path}", "content": content}
+
+def offer(selection, items):
+    async def run():
+        for it in items: await selection.offer(it)
+    asyncio.run(run())
+
+def chosen_keys(selection):
+    return [it["unique_key"] if it else key for it, key in selection.chosen()]
+
+def test_relevant_items_first_rest_deferred(tmp_path):
+    deferred = DeferredQueue(store(tmp_path))
+    items = [item(f"misc{i}", f"src/misc_{i}.py") for i in range(6)] + [item("login", "src/authentication/login.py")]
+    cost = count_tokens(items[0]["content"])
+    selection = Selection("w", 3 * cost, "Find problems in the authentication code", deferred)
+    offer(selection, items)
+    chosen = chosen_keys(selection)
+    assert chosen[0] == "login" and len(chosen) == 3
+    assert selection.total <= 3 * cost
+    assert deferred.count("w") == 4 == selection.new_deferred
+
+def test_deferred_items_come_back_and_are_taken(tmp_path):
+    deferred = DeferredQueue(store(tmp_path))
+    items = [item(f"k{i}", f"f{i}.py") for i in range(4)]
+    cost = count_tokens(items[0]["content"])
+    first = Selection("w", 2 * cost, "", deferred)
+    offer(first, items)
+    assert deferred.count("w") == 2
+
+    # Cycle suivant sans nouvel item : les différés concourent et sont relus sur disque
+    selection = Selection("w", 10 * cost, "", deferred)
+    keys = [key for it, key in selection.chosen() if it is None]
+    assert len(keys) == 2
+    taken = asyncio.run(deferred.take("w", keys))
+    assert {it["unique_key"] for it in taken.values()} == {f"k{i}" for i in range(4)} - set(chosen_keys(first))
+    assert deferred.count("w") == 0
+
+def test_new_version_supersedes_deferred_one(tmp_path):
+    deferred = DeferredQueue(store(tmp_path))
+    cost = count_tokens(item("a", "a.py")["content"])
+    offer(Selection("w", cost, "", deferred), [item("a", "a.py"), item("b", "b.py")])
+    assert deferred.count("w") == 1
+    offer(Selection("w", 10 * cost, "", deferred), [item("a", "a.py"), item("b", "b.py")])
+    assert deferred.count("w") == 0
+
+def test_oversized_item_parts_are_deferred_not_dropped(tmp_path):
+    deferred = DeferredQueue(store(tmp_path))
+    big = item("big", "big.py", lines=400)
+    selection = Selection("w", 1000, "", deferred, max_item=1000)
+    offer(selection, [big])
+    chosen = chosen_keys(selection)
+    assert chosen[0] == "big#part1"
+    assert selection.total <= 1000
+    assert len(chosen) + deferred.count("w") >= count_tokens(big["content"]) // 1000
+
+def test_cached_items_cost_nothing(tmp_path):
+    deferred = DeferredQueue(store(tmp_path))
+
+    async def cached(it): return it["unique_key"] == "cached"
+
+    items = [item("cached", "c.py"), item("a", "a.py")]
+    selection = Selection("w", count_tokens(items[1]["content"]), "", deferred, is_cached=cached)
+    offer(selection, items)
+    assert chosen_keys(selection) == ["cached", "a"]
+    assert deferred.count("w") == 0
+
+def test_token_budget_daily_limits(tmp_path, monkeypatch):
+    monkeypatch.setattr(budget, "DAILY_TOKENS", 1000)
+    tokens = TokenBudget(store(tmp_path))
+    settings = {"ai_daily_tokens": "600", "ai_cycle_tokens": "400"}
+    assert tokens.allowance("w", settings) == 400
+    tokens.record("w", 300)
+    assert tokens.allowance("w", settings) == 300
+    tokens.reserve("other", 500)
+    assert tokens.allowance("w", settings) == 200
+    tokens.record("other", 450, 500)
+    assert tokens.used() == 750 and tokens.allowance("w", settings) == 250
+    assert tokens.allowance("w", {}) == 250
+
+def test_token_budget_unlimited_by_default(tmp_path):
+    assert TokenBudget(store(tmp_path)).allowance("w", {}) is None
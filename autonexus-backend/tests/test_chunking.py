@@ -0,0 +1,47 @@
+from core.chunking import CHUNK_OVERLAP_TOKENS, count_tokens, pack, split_text, StreamPacker
+
+TEXT = "".join(f"line {i} " + "word " * (i % 13) + "\n" for i in range(2000))
+
+def test_split_text_parts_fit():
+    for max_tokens in (50, 200, 1000):
+        parts = split_text(TEXT, max_tokens)
+        assert len(parts) > 1
+        assert all(count_tokens(part) <= max_tokens + 1 for part in parts)
+
+def test_split_text_overlap_is_bounded():
+    parts = split_text(TEXT, 500)
+    for previous, part in zip(parts, parts[1:]):
+        prev_lines, lines = previous.splitlines(keepends=True), part.splitlines(keepends=True)
+        overlap = max(k for k in range(min(len(prev_lines), len(lines)) + 1) if k == 0 or prev_lines[-k:] == lines[:k])
+        # Chaque morceau reprend la fin du précédent, sans dépasser le recouvrement prévu
+        assert overlap >= 1
+        assert count_tokens("".join(lines[:overlap])) <= CHUNK_OVERLAP_TOKENS + overlap
+
+def test_split_text_keeps_every_line():
+    parts = split_text(TEXT, 300)
+    seen = set(line for part in parts for line in part.splitlines())
+    assert seen == set(TEXT.splitlines())
+
+def test_split_text_cuts_giant_lines():
+    parts = split_text("x" * 40_000, 1000, overlap_tokens=0)
+    assert "".join(parts) == "x" * 40_000
+    assert all(count_tokens(part) <= 1001 for part in parts)
+
+def test_split_text_without_overlap():
+    parts = split_text(TEXT, 400, overlap_tokens=0)
+    assert "".join(parts) == TEXT
+
+def test_pack_respects_budget_and_keeps_everything():
+    texts = [(f"t{i}", 10 + (i * 37) % 90) for i in range(200)]
+    chunks = pack(texts, 300)
+    assert all(sum(tokens for _, tokens in chunk) <= 300 for chunk in chunks)
+    assert sorted(entry for chunk in chunks for entry in chunk) == sorted(texts)
+    # Best-fit : au plus un morceau à moitié vide
+    assert sum(1 for chunk in chunks if sum(t for _, t in chunk) <= 150) <= 1
+
+def test_stream_packer_matches_budget():
+    packer = StreamPacker(300, max_open=2)
+    texts = [(f"t{i}", 10 + (i * 37) % 90, i) for i in range(200)]
+    chunks = [chunk for entry in texts for chunk in packer.add(entry)] + packer.flush()
+    assert all(sum(tokens for _, tokens, _ in chunk) <= 300 for chunk in chunks)
+    assert sorted(entry for chunk in chunks for entry in chunk) == sorted(texts)
@@ -0,0 +1,33 @@
+import time
+from core import cluster
+from core.cluster import Membership
+
+class Store:
+    def __init__(self):
+        self.data = {}
+
+    def put(self, ns, key, value): self.data.setdefault(ns, {})[key] = value
+    def delete(self, ns, key): self.data.get(ns, {}).pop(key, None)
+
+def test_leaving_worker_is_not_alive_but_still_owns_until_release():
+    store = Store()
+    old, new = Membership(store, "w0"), Membership(store, "w1")
+    old.beat()
+    old.owned("agent")
+    old.leave()
+    entries = store.data[cluster.NS]
+    assert new.alive(entries) == ["w1"]
+    assert not new.handed_over(store.data[cluster.HANDOFF_NS]["agent"], entries)
+
+    old.released("agent")
+    assert new.handed_over(store.data[cluster.HANDOFF_NS]["agent"], entries)
+
+def test_handover_after_heartbeat_timeout():
+    store = Store()
+    old, new = Membership(store, "w0"), Membership(store, "w1")
+    old.owned("agent")
+    marker = store.data[cluster.HANDOFF_NS]["agent"]
+    assert not new.handed_over(marker, {"w0": {"heartbeat": time.time()}})
+    assert new.handed_over(marker, {"w0": {"heartbeat": time.time() - cluster.HEARTBEAT_TIMEOUT - 1}})
+    assert new.handed_over(marker, {})
+    assert new.handed_over(None, {})
@@ -0,0 +1,86 @@
+import asyncio
+from core.coalesce import FetchCoalescer, SharedCalls
+
+class Connector:
+    def __init__(self, fail: bool = False):
+        self.calls = 0
+        self.fail = fail
+
+    @staticmethod
+    def fetch_key(settings):
+        return [settings["query"]]
+
+    async def fetch(self, settings, token, state, client):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        if self.fail: raise RuntimeError("down")
+        state["cursor"] = state.get("cursor", 0) + 1
+        return [{"unique_key": "k", "content": settings["query"]}]
+
+def test_identical_fetches_share_one_call():
+    async def scenario():
+        connector, coalescer = Connector(), FetchCoalescer()
+        states = [{} for _ in range(5)]
+        results = await asyncio.gather(*(coalescer.fetch("src", connector, {"query": "q"}, "t", s, None) for s in states))
+        return connector, coalescer, states, results
+
+    connector, coalescer, states, results = asyncio.run(scenario())
+    assert connector.calls == 1
+    assert (coalescer.hits, coalescer.misses) == (4, 1)
+    assert all(s == {"cursor": 1} for s in states)
+    # Chaque agent a ses propres dicts d'items
+    results[0][0]["is_update"] = True
+    assert "is_update" not in results[1][0]
+
+def test_key_includes_settings_token_and_state():
+    async def scenario():
+        connector, coalescer = Connector(), FetchCoalescer()
+        await coalescer.fetch("src", connector, {"query": "q"}, "t", {}, None)
+        await coalescer.fetch("src", connector, {"query": "other"}, "t", {}, None)
+        await coalescer.fetch("src", connector, {"query": "q"}, "t2", {}, None)
+        await coalescer.fetch("src", connector, {"query": "q"}, "t", {"cursor": 5}, None)
+        await coalescer.fetch("src", connector, {"query": "q"}, "t", {}, None)  # Dans la fenêtre : partagé
+        return connector
+
+    assert asyncio.run(scenario()).calls == 4
+
+def test_failures_are_not_shared_afterwards():
+    async def scenario():
+        connector, coalescer = Connector(fail=True), FetchCoalescer()
+        for _ in range(2):
+            try: await coalescer.fetch("src", connector, {"query": "q"}, "t", {}, None)
+            except RuntimeError: pass
+        return connector
+
+    assert asyncio.run(scenario()).calls == 2
+
+def test_cancelled_caller_does_not_cancel_others():
+    async def scenario():
+        connector, coalescer = Connector(), FetchCoalescer()
+        first = asyncio.create_task(coalescer.fetch("src", connector, {"query": "q"}, "t", {}, None))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(coalescer.fetch("src", connector, {"query": "q"}, "t", {}, None))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second, connector
+
+    items, connector = asyncio.run(scenario())
+    assert items and connector.calls == 1
+
+def test_shared_calls_in_flight_only():
+    async def scenario():
+        calls = []
+
+        async def download(sha):
+            calls.append(sha)
+            await asyncio.sleep(0.01)
+            return sha.upper()
+
+        shared = SharedCalls()
+        first = await asyncio.gather(*(shared.run(sha, lambda sha=sha: download(sha)) for sha in ["a", "a", "b", "a"]))
+        again = await shared.run("a", lambda: download("a"))  # Terminé, sans fenêtre : relancé
+        return calls, first, again
+
+    calls, first, again = asyncio.run(scenario())
+    assert first == ["A", "A", "B", "A"] and again == "A"
+    assert calls == ["a", "b", "a"]
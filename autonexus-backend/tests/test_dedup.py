@@ -0,0 +1,74 @@
+import asyncio
+import random
+import main
+from core.cache import DiskCache
+from core.dedup import Deduplicator, MIN_NEAR_DUP_WORDS, signature, similarity
+
+def document(seed: int, words: int = 300) -> list:
+    rng = random.Random(seed)
+    return [f"w{rng.randrange(5000)}" for _ in range(words)]
+
+def edited(words: list, changes: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    words = list(words)
+    for _ in range(changes): words[rng.randrange(len(words))] = f"x{rng.randrange(10**6)}"
+    return words
+
+def test_exact_duplicates_ignore_case_and_spacing():
+    dedup = Deduplicator()
+    assert dedup.add(1, "Hello   World\nagain") == 1
+    assert dedup.add(2, "hello world again") == 1
+    assert dedup.exact == 1
+
+def test_near_duplicates_are_grouped():
+    # 2 mots changés sur 1000 : ~99 % de shingles communs, bien au-dessus du seuil quel que soit le hash du processus
+    base = document(1, 1000)
+    dedup = Deduplicator()
+    assert dedup.add("a", " ".join(base)) == "a"
+    assert dedup.add("b", " ".join(edited(base, 2))) == "a"
+    assert dedup.near == 1
+
+def test_different_documents_stay_apart():
+    dedup = Deduplicator()
+    reps = [dedup.add(i, " ".join(document(i))) for i in range(50)]
+    assert reps == list(range(50))
+    assert dedup.near == 0
+
+def test_heavily_edited_document_is_not_grouped():
+    base = document(2)
+    dedup = Deduplicator()
+    dedup.add("a", " ".join(base))
+    assert dedup.add("b", " ".join(edited(base, 120))) == "b"
+
+def test_short_texts_only_group_exact_copies():
+    words = document(3, MIN_NEAR_DUP_WORDS - 1)
+    dedup = Deduplicator()
+    dedup.add("a", " ".join(words))
+    assert dedup.add("b", " ".join(edited(words, 1))) == "b"
+
+def test_signature_similarity_tracks_overlap():
+    base = document(4, 1000)
+    same = similarity(signature(base), signature(base))
+    close = similarity(signature(base), signature(edited(base, 10)))
+    far = similarity(signature(base), signature(document(5, 1000)))
+    assert same == 1.0
+    assert close > 0.7
+    assert far < 0.2
+
+def test_only_exact_duplicates_reuse_cached_notes(tmp_path, monkeypatch):
+    cache = DiskCache("extractions", 10**6)
+    cache.directory = str(tmp_path)
+    monkeypatch.setattr(main, "EXTRACTION_CACHE", cache)
+    analysis = main.StreamingAnalysis("goal", "key")
+    analysis.findings[0] = "notes"
+    exact = {"unique_key": "a", "fingerprint": "1", "link": "https://x/a"}
+    near = {"unique_key": "b", "fingerprint": "1", "link": "https://x/b"}
+
+    async def attach():
+        await analysis._attach(0, exact, True)
+        await analysis._attach(0, near, False)
+
+    asyncio.run(attach())
+    assert analysis.duplicates[0] == ["https://x/a", "https://x/b"]
+    assert cache.get_text(main._extraction_key(exact, "goal")) == "notes"
+    assert not cache.contains(main._extraction_key(near, "goal"))
@@ -0,0 +1,64 @@
+import asyncio
+from core import delivery
+from core.delivery import WebhookDelivery, pack_embeds
+
+class Response:
+    def __init__(self, status_code: int, body: dict = None):
+        self.status_code = status_code
+        self.headers = {}
+        self._body = body or {}
+        self.text = ""
+
+    def json(self):
+        return self._body
+
+class Client:
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        self.posts = []
+
+    async def post(self, url, json):
+        self.posts.append(json)
+        status = self.statuses.pop(0) if self.statuses else 204
+        return Response(status, {"retry_after": 0.01} if status == 429 else None)
+
+class Store:
+    def __init__(self):
+        self.data = {}
+
+    def put(self, ns, key, value): self.data[key] = dict(value)
+    def delete(self, ns, key): self.data.pop(key, None)
+
+def deliver(monkeypatch, statuses):
+    client = Client(statuses)
+    monkeypatch.setattr(delivery, "get_client", lambda: client)
+    monkeypatch.setattr(delivery, "BACKOFF_BASE", 0.001)
+    store = Store()
+    queue = WebhookDelivery(store)
+
+    async def run():
+        queue.start()
+        queue.enqueue("https://hook", "bot", [{"title": "t", "description": "d"}])
+        await asyncio.gather(*queue._workers.values())
+
+    asyncio.run(run())
+    return queue, client, store
+
+def test_rate_limits_do_not_use_up_attempts(monkeypatch):
+    queue, client, store = deliver(monkeypatch, [429] * (delivery.MAX_ATTEMPTS + 2))
+    assert queue.sent == 1 and queue.failed == 0
+    assert len(client.posts) == delivery.MAX_ATTEMPTS + 3
+    assert store.data == {}
+
+def test_server_errors_give_up_after_max_attempts(monkeypatch):
+    queue, client, store = deliver(monkeypatch, [500] * delivery.MAX_ATTEMPTS)
+    assert queue.sent == 0 and queue.failed == 1
+    assert len(client.posts) == delivery.MAX_ATTEMPTS
+    assert store.data == {}
+
+def test_pack_embeds_limits():
+    embeds = [{"title": "t", "description": "x" * 1000} for _ in range(25)]
+    messages = pack_embeds(embeds)
+    assert sum(len(m) for m in messages) == 25
+    assert all(len(m) <= delivery.MAX_EMBEDS_PER_MESSAGE for m in messages)
+    assert all(sum(len(e["description"]) + len(e["title"]) for e in m) <= delivery.MAX_CHARS_PER_MESSAGE for m in messages)
@@ -0,0 +1,50 @@
+from core import item_states
+from core.item_states import ItemStates
+from core.storage import Store
+
+def states(tmp_path):
+    # Store non démarré : les écritures restent en file, l'index en mémoire suffit ici
+    return ItemStates(Store(str(tmp_path / "test.db")))
+
+def cycle(states, w_id, keys):
+    states.begin_cycle(w_id)
+    results = [states.observe(w_id, key, "v1") for key in keys]
+    states.end_cycle(w_id)
+    return results
+
+def test_observe_new_unchanged_updated(tmp_path):
+    s = states(tmp_path)
+    s.begin_cycle("w")
+    assert s.observe("w", "k", "v1") is False
+    assert s.observe("w", "k", "v1") is None
+    assert s.observe("w", "k", "v2") is True
+
+def test_ttl_eviction(tmp_path, monkeypatch):
+    monkeypatch.setattr(item_states, "TTL_CYCLES", 5)
+    monkeypatch.setattr(item_states, "EVICT_EVERY", 1)
+    s = states(tmp_path)
+    cycle(s, "w", ["old", "kept"])
+    for _ in range(5): cycle(s, "w", ["kept"])
+    assert s.count() == 2
+    cycle(s, "w", ["kept"])
+    assert s.count() == 1
+    # Oublié : l'item revient comme nouveau
+    assert cycle(s, "w", ["old"]) == [False]
+
+def test_size_eviction_keeps_most_recent(tmp_path, monkeypatch):
+    monkeypatch.setattr(item_states, "MAX_ITEMS_PER_WORKFLOW", 3)
+    monkeypatch.setattr(item_states, "EVICT_EVERY", 1000)
+    s = states(tmp_path)
+    for key in ["a", "b", "c", "d", "e"]: cycle(s, "w", [key])
+    assert s.count() == 3
+    assert cycle(s, "w", ["c", "d", "e"]) == [None, None, None]
+    assert cycle(s, "w", ["a"]) == [False]
+
+def test_eviction_is_per_agent(tmp_path, monkeypatch):
+    monkeypatch.setattr(item_states, "MAX_ITEMS_PER_WORKFLOW", 2)
+    s = states(tmp_path)
+    cycle(s, "w1", ["a", "b", "c"])
+    cycle(s, "w2", ["a"])
+    assert s.count() == 3
+    s.drop("w1")
+    assert s.count() == 1
@@ -0,0 +1,40 @@
+import asyncio
+import main
+from core import llm
+from core.chunking import count_tokens
+
+def findings(sources: int, lines: int) -> list:
+    return [f"{main.SOURCE_HEADER}src{i} ---\n" + "\n".join(f"- finding {j} of src{i} with some words" for j in range(lines))
+            for i in range(sources)]
+
+def test_cut_keeps_every_source():
+    big = findings(1, 300)[0].replace("src0", "big")
+    cut = main.cut_per_source("\n".join([big] + findings(3, 2)), 300)
+    assert count_tokens(cut) <= 300
+    assert all(f"src{i} ---" in cut and f"finding 1 of src{i}" in cut for i in range(3))
+    assert "big ---" in cut
+
+def test_reduce_shrinks_every_level(monkeypatch):
+    calls = []
+
+    async def chat(key, messages):
+        prompt = messages[0]["content"]
+        calls.append(prompt)
+        # Condense : garde la première ligne de chaque source
+        notes = prompt.split("NOTES:", 1)[1].strip().splitlines()
+        return "\n".join(line for n, line in enumerate(notes) if line.strip().startswith(main.SOURCE_HEADER) or (n and notes[n-1].strip().startswith(main.SOURCE_HEADER)))
+
+    monkeypatch.setattr(llm, "chat", chat)
+    text = asyncio.run(main.reduce_findings(findings(20, 40), "goal", "key", reduce_tokens=800))
+    assert calls and all("drop the weakest" in prompt for prompt in calls)
+    assert count_tokens(text) <= 800
+    assert all(f"src{i} ---" in text for i in range(20))
+
+def test_reduce_cuts_per_source_when_merges_fail(monkeypatch):
+    async def chat(key, messages):
+        raise RuntimeError("down")
+
+    monkeypatch.setattr(llm, "chat", chat)
+    text = asyncio.run(main.reduce_findings(findings(6, 60), "goal", "key", reduce_tokens=600))
+    assert count_tokens(text) <= 600
+    assert all(f"src{i} ---" in text for i in range(6))
@@ -0,0 +1,119 @@
+import asyncio
+from core.scheduler import Scheduler
+
+class Cycles:
+    """run_cycle de test : compte les cycles simultanés par agent"""
+
+    def __init__(self, duration: float = 0.05, delay: float = 0.01):
+        self.duration = duration
+        self.delay = delay
+        self.running = {}
+        self.max_running = 0
+        self.started = 0
+        self.finished = 0
+
+    async def __call__(self, w_id: str):
+        self.running[w_id] = self.running.get(w_id, 0) + 1
+        self.max_running = max(self.max_running, self.running[w_id])
+        self.started += 1
+        try:
+            await asyncio.sleep(self.duration)
+            self.finished += 1
+        finally:
+            self.running[w_id] -= 1
+        return self.delay
+
+def run(coro):
+    return asyncio.run(coro)
+
+def test_reschedule_during_cycle_never_overlaps():
+    async def scenario():
+        cycles = Cycles()
+        scheduler = Scheduler(cycles, lambda w_id: "github", {})
+        scheduler.start()
+        scheduler.schedule("a", 0)
+        for _ in range(20):
+            await asyncio.sleep(0.005)
+            scheduler.schedule("a", 0)
+        await asyncio.sleep(0.2)
+        await scheduler.stop()
+        return cycles
+
+    cycles = run(scenario())
+    assert cycles.max_running == 1
+    assert cycles.started >= 2
+
+def test_cancel_then_reschedule_keeps_one_cycle():
+    async def scenario():
+        cycles = Cycles(duration=0.1)
+        scheduler = Scheduler(cycles, lambda w_id: "github", {})
+        scheduler.start()
+        for _ in range(5):
+            scheduler.schedule("a", 0)
+            await asyncio.sleep(0.02)
+            scheduler.cancel("a")
+            scheduler.schedule("a", 0)
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)
+        running = scheduler.running()
+        await scheduler.stop()
+        return cycles, running
+
+    cycles, running = run(scenario())
+    assert cycles.max_running == 1
+    assert running <= 1
+
+def test_unschedule_lets_the_cycle_finish_without_rescheduling():
+    async def scenario():
+        cycles = Cycles(duration=0.05)
+        scheduler = Scheduler(cycles, lambda w_id: "github", {})
+        scheduler.start()
+        scheduler.schedule("a", 0)
+        await asyncio.sleep(0.01)
+        scheduler.unschedule("a")
+        await scheduler.wait_idle("a")
+        await asyncio.sleep(0.05)
+        state = (scheduler.running(), scheduler.pending())
+        await scheduler.stop()
+        return cycles, state
+
+    cycles, state = run(scenario())
+    assert (cycles.started, cycles.finished) == (1, 1)
+    assert state == (0, 0)
+
+def test_unschedule_then_schedule_resumes_after_the_cycle():
+    async def scenario():
+        cycles = Cycles(duration=0.05, delay=10)
+        scheduler = Scheduler(cycles, lambda w_id: "github", {})
+        scheduler.start()
+        scheduler.schedule("a", 0)
+        await asyncio.sleep(0.01)
+        scheduler.unschedule("a")
+        scheduler.schedule("a", 0)
+        await asyncio.sleep(0.15)
+        await scheduler.stop()
+        return cycles
+
+    cycles = run(scenario())
+    assert cycles.max_running == 1
+    assert cycles.finished == 2
+
+def test_source_limit():
+    async def scenario():
+        active = [0, 0]
+
+        async def cycle(w_id):
+            active[0] += 1
+            active[1] = max(active[1], active[0])
+            await asyncio.sleep(0.02)
+            active[0] -= 1
+            return None
+
+        scheduler = Scheduler(cycle, lambda w_id: "notion", {"notion": 2})
+        scheduler.start()
+        for i in range(6): scheduler.schedule(f"w{i}", 0)
+        await asyncio.sleep(0.15)
+        await scheduler.stop()
+        return active[1]
+
+    assert run(scenario()) == 2
@@ -0,0 +1,45 @@
+from core.storage import Store
+
+def store(tmp_path):
+    s = Store(str(tmp_path / "test.db"))
+    s.start()
+    return s
+
+def test_put_load_in_insertion_order(tmp_path):
+    s = store(tmp_path)
+    s.put("ns", "b", {"v": 1})
+    s.put("ns", "a", [1, "é"])
+    s.put("other", "x", 3)
+    s.flush()
+    assert list(s.load()["ns"].items()) == [("b", {"v": 1}), ("a", [1, "é"])]
+    assert s.load(["other"]) == {"other": {"x": 3}}
+    s.close()
+
+def test_value_is_serialised_at_put(tmp_path):
+    s = store(tmp_path)
+    value = {"n": 1}
+    s.put("ns", "k", value)
+    value["n"] = 2
+    s.flush()
+    assert s.get("ns", ["k"]) == {"k": {"n": 1}}
+    s.close()
+
+def test_upsert_delete_drop(tmp_path):
+    s = store(tmp_path)
+    for i in range(1200): s.put("ns", f"k{i}", i)  # Plus d'un lot, plus que la limite de paramètres SQLite
+    s.put("ns", "k0", "updated")
+    s.delete("ns", "k1")
+    s.put("keep", "k", 1)
+    s.flush()
+    data = s.get("ns", [f"k{i}" for i in range(1200)])
+    assert len(data) == 1199 and data["k0"] == "updated" and "k1" not in data
+    s.drop("ns")
+    s.flush()
+    assert s.load() == {"keep": {"k": 1}}
+    s.close()
+
+def test_close_flushes_and_reopens(tmp_path):
+    s = store(tmp_path)
+    s.put("ns", "k", "v")
+    s.close()
+    assert Store(str(tmp_path / "test.db")).load() == {"ns": {"k": "v"}}
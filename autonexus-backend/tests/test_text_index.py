@@ -0,0 +1,50 @@
+from core.text_index import TextIndex
+
+def index():
+    ix = TextIndex()
+    ix.update("a", "1", "Authentication guide", "How we handle OAuth tokens in API v2.1 and later.")
+    ix.update("b", "1", "Release notes", "Version v2.10 ships the new reauthorization flow.")
+    ix.update("c", "1", "Misc", "Nothing here.")
+    return ix
+
+def ids(matches):
+    return sorted(doc_id for doc_id, _, _ in matches)
+
+def test_substring_inside_words():
+    ix = index()
+    assert ids(ix.search("auth")) == ["a", "b"]
+    assert ids(ix.search("thent")) == ["a"]
+
+def test_punctuated_query_is_not_split():
+    ix = index()
+    assert ids(ix.search("v2.1")) == ["a", "b"]  # "v2.10" contient "v2.1"
+    assert ids(ix.search("v2.1 and")) == ["a"]
+
+def test_phrase_across_words():
+    ix = index()
+    assert ids(ix.search("tokens in api")) == ["a"]
+    assert ids(ix.search("in api v2")) == ["a"]
+    assert ix.search("tokens api") == []
+
+def test_title_match_and_snippet():
+    ix = index()
+    [(doc_id, in_title, snippet)] = ix.search("Authentication Guide")
+    assert (doc_id, in_title, snippet) == ("a", True, "")
+    [(_, in_title, snippet)] = ix.search("reauthorization")
+    assert not in_title and "reauthorization" in snippet
+
+def test_update_and_remove():
+    ix = index()
+    generation = ix.generation
+    ix.update("c", "1", "Misc", "Changed without a new version")
+    assert ix.generation == generation and ix.search("changed") == []
+    ix.update("c", "2", "Misc", "Now about authentication")
+    assert ids(ix.search("auth")) == ["a", "b", "c"]
+    ix.remove("a")
+    assert ids(ix.search("auth")) == ["b", "c"]
+    assert "guide" not in ix.postings
+
+def test_empty_or_unknown_query():
+    ix = index()
+    assert ix.search("") == []
+    assert ix.search("zzz") == []